@@ -0,0 +1,361 @@
+# e2e.py
+import argparse
+import array
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import platform
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+#
+# 알림 경로 종단간 벤치마크.
+#
+# 가짜 BlueZ(bench/mock_bluez.py)를 띄우고 서버를 별도 프로세스로 실행해서
+# 생산자 publish -> 서버 알림 -> central 수신까지를 잰다.
+#
+#   - 서버 프로세스(--serve)의 생산자 스레드는 rate Hz 로 프레임을 게시하고,
+#     모든 채널 값을 프레임 번호(seq)로 채운다. 게시 시각(monotonic_ns)은
+#     프레임마다 기록해 두었다가 끝날 때 파일로 넘긴다.
+#   - 가짜 central 은 받은 값의 첫 float 로 seq 를 알아내서
+#     지연 = 수신 시각 - 게시 시각 을 구한다 (CLOCK_MONOTONIC 은 프로세스 간 공통).
+#   - 측정 구간에 게시되고 어느 알림으로도 나가지 않은 프레임은 dropped.
+#     이벤트 모드의 합치기(최소 간격)나 타이머 폴링으로 건너뛴 것도 포함된다.
+#   - CPU/알림 = 측정 구간의 서버 프로세스 CPU 시간(/proc) / 보낸 알림 수.
+#     (central 수만큼의 전달은 bluetoothd 몫이므로 보낸 알림은 채널당 1 번)
+#
+# 조합: --servers x --rates x --payloads x --channels x --centrals
+#   v3, v4 는 기본 센서 구성(IMU/Laser/Weight)만 있어서 payload/channels 는
+#   무시되고 실제 값이 기록된다. v2 이하는 자체 난수 데이터를 import 때
+#   바로 서버로 돌리므로 측정할 수 없다.
+#
+#   $ python -m bench.e2e --servers v5,aio --rates 10,50,100 --payloads 16,144 \
+#         --output results.json
+#
+
+SERVERS = {
+    "v3": "bluetooth_server_v3",
+    "v4": "bluetooth_server_v4",
+    "v5": "bluetooth_server_v5",
+    "aio": "bluetooth_server_aio",
+}
+FIXED_SCHEMA_SERVERS = ("v3", "v4")
+
+CHANNEL_UUID = "%08x-736c-4645-b520-7127aadf8c47"
+CHANNEL_UUID_BASE = 0x100
+MAX_SEQ = 1 << 24   # float32 로 정확히 표현되는 정수 범위
+
+
+def bench_schema(channels, payload, rate):
+    from utils.codec import ATT_MAX_VALUE, FRAME_HEADER_FORMAT
+    from utils.sensor_schema import Channel, SensorSchema
+    size = max(1, payload // 4)
+    # 통합 프레임이 속성 하나에 안 들어가면 Frame Characteristic 은 뺀다
+    frame = struct.calcsize(FRAME_HEADER_FORMAT) + channels * size * 4 <= ATT_MAX_VALUE
+    return SensorSchema([
+        Channel("ch%d" % i, (size,), CHANNEL_UUID % (CHANNEL_UUID_BASE + i),
+                "Bench Channel %d" % i, rate=rate)
+        for i in range(channels)], frame=frame)
+
+
+#
+# 서버 프로세스
+#
+def serve(args):
+    from utils.sensor_data import SensorData
+    from utils.rate_clock import RateClock
+
+    module = importlib.import_module(SERVERS[args.server])
+    if args.server in FIXED_SCHEMA_SERVERS:
+        schema = None
+        # 타이머 폴링 서버: 알림 주기를 생산자 주기에 맞춘다
+        module.NOTIFY_TIMEOUT = max(1, int(1000 / args.rate))
+    else:
+        schema = bench_schema(args.channels, args.payload, args.rate)
+    sensor_data = SensorData(schema=schema)
+    sensor_data.set_device_id("BENCH")
+    schema = sensor_data.schema
+
+    publish_ns = array.array("q")
+    stop = threading.Event()
+
+    def produce():
+        clock = RateClock.from_rate(args.rate)
+        seq = 0
+        while clock.wait(stop) and seq < MAX_SEQ - 1:
+            seq += 1
+            channels = {c.name: [float(seq)] * c.size for c in schema}
+            publish_ns.append(time.monotonic_ns())
+            sensor_data.publish(**channels)
+
+    def finish():
+        # 하네스가 stdin 을 닫으면 생산을 멈추고 게시 기록을 남긴 뒤 종료
+        sys.stdin.read()
+        stop.set()
+        producer.join()
+        tmp = args.log + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"publish_ns": publish_ns.tolist(),
+                       "payloads": {c.name: c.size * 4 for c in schema},
+                       "uuids": {c.uuid: c.name for c in schema}}, f)
+        os.replace(tmp, args.log)
+        os._exit(0)
+
+    producer = threading.Thread(target=produce, name="bench-producer", daemon=True)
+    producer.start()
+    threading.Thread(target=finish, name="bench-finish", daemon=True).start()
+    module.start_ble_server(sensor_data)
+
+
+#
+# 하네스
+#
+def _cpu_seconds(pid):
+    """ 프로세스의 user+sys CPU 시간 (초), /proc 이 없으면 None """
+    try:
+        with open("/proc/%d/stat" % pid) as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+async def run_case(case, args, log_path):
+    from bench.mock_bluez import PrivateBus, MockBluez
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with PrivateBus() as bus:
+        mock = await MockBluez.connect(bus.address, centrals=case["centrals"],
+                                       mode=args.mode, mtu=args.mtu, auto_subscribe=False)
+        cmd = [sys.executable, "-m", "bench.e2e", "--serve", "--server", case["server"],
+               "--rate", str(case["rate"]), "--payload", str(case["payload"] or 0),
+               "--channels", str(case["channels"]), "--log", log_path]
+        proc = subprocess.Popen(cmd, cwd=root, env=bus.env(), stdin=subprocess.PIPE,
+                                stdout=subprocess.DEVNULL if args.quiet else None)
+        try:
+            await _wait_registered(mock, proc, args.timeout)
+            uuids = _channel_uuids(case)
+            paths = {}
+            for uuid, name in uuids.items():
+                path = mock.find_characteristic(uuid)
+                if path is None:
+                    raise RuntimeError("%s: characteristic %s not found" % (case["server"], uuid))
+                paths[path] = name
+                await mock.subscribe(path)
+
+            await asyncio.sleep(args.warmup)
+            for central in mock.centrals:
+                central.clear()
+            cpu0, t0 = _cpu_seconds(proc.pid), time.monotonic_ns()
+            await asyncio.sleep(args.duration)
+            cpu1, t1 = _cpu_seconds(proc.pid), time.monotonic_ns()
+            received = [list(central.received) for central in mock.centrals]
+        finally:
+            if proc.stdin is not None:
+                proc.stdin.close()
+            try:
+                proc.wait(args.timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+            mock.stop()
+
+    with open(log_path) as f:
+        log = json.load(f)
+    os.unlink(log_path)
+    cpu = cpu1 - cpu0 if cpu0 is not None and cpu1 is not None else None
+    return summarize(case, log, paths, received, t0, t1, cpu)
+
+
+async def _wait_registered(mock, proc, timeout):
+    """ RegisterApplication 을 기다린다. 서버가 먼저 죽으면 바로 실패. """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await mock.wait_registered(0.1)
+            return
+        except asyncio.TimeoutError:
+            pass
+        if proc.poll() is not None:
+            raise RuntimeError("server exited with %d" % proc.returncode)
+        if time.monotonic() > deadline:
+            raise RuntimeError("server did not register within %.0fs" % timeout)
+
+
+def _channel_uuids(case):
+    if case["server"] in FIXED_SCHEMA_SERVERS:
+        from utils.sensor_schema import DEFAULT_SCHEMA
+        return {c.uuid: c.name for c in DEFAULT_SCHEMA}
+    return {CHANNEL_UUID % (CHANNEL_UUID_BASE + i): "ch%d" % i
+            for i in range(case["channels"])}
+
+
+def summarize(case, log, paths, received, t0, t1, cpu):
+    publish_ns = log["publish_ns"]
+    # 구간 끝에 게시된 프레임은 아직 전달 중일 수 있으므로 dropped 에서 뺀다
+    tail = max(200 * 10 ** 6, int(2e9 / case["rate"]))
+    window = [seq for seq, t in enumerate(publish_ns, 1) if t0 <= t < t1 - tail]
+
+    latencies = []
+    notifications = 0
+    dropped = 0
+    for records in received:
+        seen = {name: set() for name in paths.values()}
+        for t_ns, path, value in records:
+            name = paths.get(path)
+            if name is None or len(value) < 4:
+                continue
+            seq = int(struct.unpack_from("<f", value)[0])
+            if not 0 < seq <= len(publish_ns):
+                continue
+            seen[name].add(seq)
+            notifications += 1
+            latencies.append(t_ns - publish_ns[seq - 1])
+        for s in seen.values():
+            dropped += sum(1 for seq in window if seq not in s)
+    latencies.sort()
+
+    centrals = max(1, len(received))
+    seconds = (t1 - t0) / 1e9
+    # 같은 값의 반복 알림(타이머 폴링)도 보낸 알림으로 센다.
+    # 채널당 한 번 (central 전달은 bluez 몫)
+    sent = notifications / centrals
+    expected = len(window) * len(paths) * centrals
+    result = dict(case)
+    result.update({
+        "payloads": log["payloads"],
+        "duration_s": seconds,
+        "published": len(window),
+        "notifications": int(sent),
+        "notifications_per_s": sent / seconds,
+        "dropped": dropped // centrals,
+        "drop_ratio": dropped / expected if expected else None,
+        "latency_us": {
+            "p50": _us(_percentile(latencies, 50)),
+            "p90": _us(_percentile(latencies, 90)),
+            "p99": _us(_percentile(latencies, 99)),
+            "max": _us(latencies[-1] if latencies else None),
+        },
+        "cpu_percent": 100.0 * cpu / seconds if cpu is not None else None,
+        "cpu_us_per_notification": 1e6 * cpu / sent if cpu is not None and sent else None,
+    })
+    return result
+
+
+def _us(ns):
+    return ns / 1000.0 if ns is not None else None
+
+
+def _cases(args):
+    for server, rate, payload, channels, centrals in itertools.product(
+            args.servers, args.rates, args.payloads, args.channels, args.centrals):
+        if server in FIXED_SCHEMA_SERVERS:
+            # 기본 구성 고정: payload/channels 조합을 반복하지 않는다
+            if (payload, channels) != (args.payloads[0], args.channels[0]):
+                continue
+            payload, channels = None, 3
+        yield {"server": server, "rate": rate, "payload": payload,
+               "channels": channels, "centrals": centrals, "mode": args.mode}
+
+
+def _meta(args):
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True,
+                                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "duration_s": args.duration,
+        "warmup_s": args.warmup,
+        "mtu": args.mtu,
+    }
+
+
+def _print_result(r):
+    lat = r["latency_us"]
+    print("%-4s rate=%-5s payload=%-5s ch=%-2d centrals=%-2d  %8.1f notif/s  "
+          "drop=%5.1f%%  p50=%s p99=%s us  cpu/notif=%s us" % (
+              r["server"], r["rate"], r["payload"], r["channels"], r["centrals"],
+              r["notifications_per_s"], 100.0 * (r["drop_ratio"] or 0.0),
+              _fmt(lat["p50"]), _fmt(lat["p99"]), _fmt(r["cpu_us_per_notification"])),
+          flush=True)
+
+
+def _fmt(value):
+    return "-" if value is None else "%.0f" % value
+
+
+async def run(args):
+    results = []
+    log_path = os.path.abspath(args.output + ".publish")
+    for case in _cases(args):
+        try:
+            result = await run_case(case, args, log_path)
+        except Exception as e:
+            print("%s: failed: %r" % (case, e), flush=True)
+            result = dict(case, error=repr(e))
+        else:
+            _print_result(result)
+        results.append(result)
+    with open(args.output, "w") as f:
+        json.dump({"meta": _meta(args), "results": results}, f, indent=2)
+    print("results written to %s" % args.output)
+
+
+def _int_list(text):
+    return [int(v) for v in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BLE 알림 종단간 벤치마크")
+    parser.add_argument("--servers", type=lambda s: s.split(","), default=["v5"],
+                        help="쉼표로 구분 (%s)" % ", ".join(SERVERS))
+    parser.add_argument("--rates", type=_int_list, default=[10, 50, 100], help="Hz")
+    parser.add_argument("--payloads", type=_int_list, default=[16, 144], help="bytes")
+    parser.add_argument("--channels", type=_int_list, default=[1, 3])
+    parser.add_argument("--centrals", type=_int_list, default=[1])
+    parser.add_argument("--mode", choices=("notify", "acquire"), default="notify")
+    parser.add_argument("--mtu", type=int, default=517)
+    parser.add_argument("--duration", type=float, default=5.0, help="측정 구간 (초)")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=15.0)
+    parser.add_argument("--output", default="bench_e2e.json")
+    parser.add_argument("--quiet", action="store_true", help="서버 출력 숨김")
+    # 서버 프로세스용 (하네스가 사용)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--server", default="v5", help=argparse.SUPPRESS)
+    parser.add_argument("--rate", type=int, default=50, help=argparse.SUPPRESS)
+    parser.add_argument("--payload", type=int, default=16, help=argparse.SUPPRESS)
+    parser.add_argument("--log", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        args.channels = args.channels[0]
+        serve(args)
+        return
+    for server in args.servers:
+        if server not in SERVERS:
+            parser.error("unknown server: %s" % server)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+# micro.py
+import argparse
+import json
+import platform
+import random
+import statistics
+import struct
+import sys
+import timeit
+
+from utils.codec import (
+    StructCodec, ScaledInt16Codec, DeltaVarintEncoder, IMU_SCALES,
+)
+from utils.sensor_data import SensorData
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import dbus
+except ImportError:
+    dbus = None
+
+#
+# 인코딩/SensorData/Characteristic 핫패스 마이크로 벤치마크 (timeit).
+#
+# 각 항목은 timeit 으로 자동 반복 횟수를 정한 뒤 --repeat 번 재서
+# 호출 한 번당 최소/중앙값(ns)을 낸다. 같은 group 의 항목은 같은 입력
+# (IMU 4x9 float 등)을 다른 방법으로 처리하므로 나란히 비교할 수 있다.
+#
+# numpy, dbus(dbus-python)가 없으면 해당 항목은 건너뛴다. Characteristic
+# 항목은 버스에 내보내지 않은 객체로 재므로 bluetoothd 나 시스템 버스가
+# 필요 없다.
+#
+#   $ python -m bench.micro                         # 전체
+#   $ python -m bench.micro -k encode --save base.json
+#   $ python -m bench.micro --compare base.json     # 기준보다 느려지면 exit 1
+#
+
+IMU_ROWS = [[random.uniform(-10, 10) for _ in range(9)] for _ in range(4)]
+IMU_FLAT = tuple(v for row in IMU_ROWS for v in row)
+LASER = [random.uniform(0, 5) for _ in range(4)]
+
+BENCHMARKS = []   # (group, name, setup) ; setup() 은 잴 함수를 돌려준다 (None 이면 건너뜀)
+
+
+def benchmark(group, name):
+    def register(setup):
+        BENCHMARKS.append((group, name, setup))
+        return setup
+    return register
+
+
+#
+# encode: IMU 36 floats -> bytes
+#
+@benchmark("encode", "list_flatten_struct_pack")
+def _():
+    # v3/v4 방식: 중첩 리스트 평탄화 + 매번 포맷 문자열로 pack
+    rows = IMU_ROWS
+    def run():
+        flat = [val for row in rows for val in row]
+        return struct.pack(f"{len(flat)}f", *flat)
+    return run
+
+
+@benchmark("encode", "struct_pack_into")
+def _():
+    # StructCodec: 컴파일된 Struct + 미리 할당한 버퍼, 평탄 튜플 입력 (v5)
+    codec = StructCodec("<36f")
+    values = IMU_FLAT
+    return lambda: codec.encode(*values)
+
+
+@benchmark("encode", "struct_pack_into_bytes")
+def _():
+    codec = StructCodec("<36f")
+    values = IMU_FLAT
+    return lambda: bytes(codec.encode(*values))
+
+
+@benchmark("encode", "numpy_tobytes")
+def _():
+    if np is None:
+        return None
+    array = np.array(IMU_FLAT, dtype="<f4")
+    return array.tobytes
+
+
+@benchmark("encode", "numpy_from_list_tobytes")
+def _():
+    if np is None:
+        return None
+    rows = IMU_ROWS
+    return lambda: np.asarray(rows, dtype="<f4").tobytes()
+
+
+@benchmark("encode", "numpy_encode_buffer")
+def _():
+    # NumpySensorData 스냅샷: 배열 메모리를 그대로 memoryview 로
+    if np is None:
+        return None
+    codec = StructCodec("<36f")
+    array = np.array(IMU_FLAT, dtype="<f4")
+    return lambda: codec.encode_buffer(array)
+
+
+@benchmark("encode", "scaled_int16")
+def _():
+    codec = ScaledInt16Codec(IMU_SCALES)
+    values = IMU_FLAT
+    return lambda: codec.encode(*values)
+
+
+@benchmark("encode", "delta_varint_row")
+def _():
+    encoder = DeltaVarintEncoder(IMU_SCALES)
+    rows = [IMU_FLAT]
+    return lambda: encoder.encode(rows, 244)
+
+
+#
+# dbus: 144 바이트 -> D-Bus 값
+#
+@benchmark("dbus", "ByteArray")
+def _():
+    if dbus is None:
+        return None
+    value = bytes(StructCodec("<36f").encode(*IMU_FLAT))
+    return lambda: dbus.ByteArray(value)
+
+
+@benchmark("dbus", "Array_of_ints")
+def _():
+    # v3/v4 방식: dbus.Array(bytes) 는 바이트마다 원소 하나
+    if dbus is None:
+        return None
+    value = bytes(StructCodec("<36f").encode(*IMU_FLAT))
+    return lambda: dbus.Array(value)
+
+
+@benchmark("dbus", "list_of_Byte")
+def _():
+    if dbus is None:
+        return None
+    value = bytes(StructCodec("<36f").encode(*IMU_FLAT))
+    return lambda: [dbus.Byte(b) for b in value]
+
+
+#
+# sensor_data
+#
+@benchmark("sensor_data", "set_imu_data")
+def _():
+    data = SensorData()
+    rows = IMU_ROWS
+    return lambda: data.set_imu_data(rows)
+
+
+@benchmark("sensor_data", "publish_all")
+def _():
+    data = SensorData()
+    rows, laser = IMU_ROWS, LASER
+    return lambda: data.publish(imu=rows, laser=laser, weight=70.0)
+
+
+@benchmark("sensor_data", "get_imu_data")
+def _():
+    data = SensorData()
+    data.set_imu_data(IMU_ROWS)
+    return data.get_imu_data
+
+
+@benchmark("sensor_data", "get_snapshot")
+def _():
+    data = SensorData()
+    data.set_imu_data(IMU_ROWS)
+    return data.get_snapshot
+
+
+@benchmark("sensor_data", "numpy_publish_all")
+def _():
+    if np is None:
+        return None
+    from utils.sensor_data import NumpySensorData
+    data = NumpySensorData()
+    rows, laser = np.asarray(IMU_ROWS, dtype="<f4"), LASER
+    return lambda: data.publish(imu=rows, laser=laser, weight=70.0)
+
+
+@benchmark("sensor_data", "shared_publish_all")
+def _():
+    from utils.shared_ring import SharedSensorData
+    data = SharedSensorData()
+    _cleanup.append(data.close)
+    rows, laser = IMU_ROWS, LASER
+    return lambda: data.publish(imu=rows, laser=laser, weight=70.0)
+
+
+#
+# characteristic: bluetooth_server_v5 (버스에 내보내지 않은 객체)
+#
+_service = None
+
+
+def _sensor_service():
+    global _service
+    if _service is None:
+        from utils.bletools import BleTools
+        # dbus.service.Object 는 연결 없이 만들면 내보내지 않는다
+        BleTools.get_bus = classmethod(lambda cls: None)
+        import bluetooth_server_v5
+        data = SensorData()
+        data.publish(imu=IMU_ROWS, laser=LASER, weight=70.0)
+        data.set_device_id("NEURALOAD-0001")
+        _service = bluetooth_server_v5.SensorService(0, data)
+    return _service
+
+
+@benchmark("characteristic", "imu_get_imu_data_cached")
+def _():
+    if dbus is None:
+        return None
+    return _sensor_service().imu_characteristic.get_imu_data
+
+
+@benchmark("characteristic", "imu_get_imu_data_uncached")
+def _():
+    if dbus is None:
+        return None
+    chrc = _sensor_service().imu_characteristic
+    def run():
+        chrc._cache.clear()
+        return chrc.get_imu_data()
+    return run
+
+
+@benchmark("characteristic", "laser_get_laser_data_uncached")
+def _():
+    if dbus is None:
+        return None
+    chrc = _sensor_service().laser_characteristic
+    def run():
+        chrc._cache.clear()
+        return chrc.get_laser_data()
+    return run
+
+
+@benchmark("characteristic", "imu_ReadValue")
+def _():
+    if dbus is None:
+        return None
+    chrc = _sensor_service().imu_characteristic
+    options = {"mtu": 247}
+    return lambda: chrc.ReadValue(options)
+
+
+@benchmark("characteristic", "descriptor_ReadValue")
+def _():
+    if dbus is None:
+        return None
+    desc = _sensor_service().imu_characteristic.get_descriptors()[0]
+    options = {}
+    return lambda: desc.ReadValue(options)
+
+
+_cleanup = []
+
+
+#
+# 실행
+#
+def measure(func, repeat):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = [t / number * 1e9 for t in timer.repeat(repeat, number)]
+    return {"min_ns": min(times), "median_ns": statistics.median(times), "loops": number}
+
+
+def run(args):
+    results = {}
+    for group, name, setup in BENCHMARKS:
+        key = "%s.%s" % (group, name)
+        if args.filter and not any(f in key for f in args.filter):
+            continue
+        try:
+            func = setup()
+            if func is None:
+                print("%-48s skipped" % key)
+                continue
+            results[key] = measure(func, args.repeat)
+        except Exception as e:
+            print("%-48s failed: %r" % (key, e))
+            continue
+        print("%-48s %10.0f ns  (median %.0f)" % (
+            key, results[key]["min_ns"], results[key]["median_ns"]), flush=True)
+    for close in _cleanup:
+        close()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ 기준 결과와 비교해서 threshold 배 넘게 느려진 항목 목록 """
+    regressions = []
+    print("\n%-48s %10s %10s %7s" % ("benchmark", "base ns", "now ns", "ratio"))
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        ratio = result["min_ns"] / base["min_ns"]
+        mark = "  <-- slower" if ratio > threshold else ""
+        print("%-48s %10.0f %10.0f %7.2f%s" % (key, base["min_ns"], result["min_ns"], ratio, mark))
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="핫패스 마이크로 벤치마크")
+    parser.add_argument("-k", dest="filter", action="append",
+                        help="이름에 이 문자열이 들어간 항목만 (여러 번 가능)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="결과 JSON 저장")
+    parser.add_argument("--compare", help="기준 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="--compare 때 이 배율보다 느려지면 실패 (기본 1.2)")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"meta": {"python": platform.python_version(),
+                                "machine": platform.machine(),
+                                "platform": platform.platform()},
+                       "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+# mock_bluez.py
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import time
+
+from dbus_next import Message, MessageType, Variant
+from dbus_next.aio import MessageBus
+from dbus_next.constants import RequestNameReply
+from dbus_next.errors import DBusError
+from dbus_next.service import ServiceInterface, method, dbus_property, PropertyAccess
+
+#
+# bluetoothd 없이 BLE 서버를 돌려 보기 위한 가짜 org.bluez 서비스.
+#
+# 전용 dbus-daemon(PrivateBus)을 띄우고 그 위에서 org.bluez 이름을 얻어
+# 어댑터 하나(/org/bluez/hci0)를 흉내 낸다.
+#   - Adapter1, GattManager1.RegisterApplication, LEAdvertisingManager1
+#   - 등록된 애플리케이션의 GATT 트리를 GetManagedObjects 로 읽어 둔다
+#   - 가짜 central 이 notify Characteristic 을 구독한다
+#       notify  : StartNotify 후 PropertiesChanged 시그널 수신
+#       acquire : AcquireNotify 로 받은 소켓에서 수신
+#     받은 값은 time.monotonic_ns() 시각과 함께 central 마다 전달된다
+#     (bluetoothd 처럼 구독은 Characteristic 당 한 번, 전달은 central 수만큼)
+#
+# 서버 프로세스는 DBUS_SYSTEM_BUS_ADDRESS 를 PrivateBus 주소로 두고 띄우면
+# dbus-python(BleTools.get_bus)과 dbus-next 모두 이 버스를 시스템 버스로 쓴다.
+#
+#   $ python -m bench.mock_bluez --centrals 2
+#   DBUS_SYSTEM_BUS_ADDRESS=unix:path=/tmp/dbus-...
+#   $ DBUS_SYSTEM_BUS_ADDRESS=unix:path=/tmp/dbus-... python main.py
+#
+
+BLUEZ_SERVICE_NAME = "org.bluez"
+ADAPTER_IFACE = "org.bluez.Adapter1"
+GATT_MANAGER_IFACE = "org.bluez.GattManager1"
+LE_ADVERTISING_MANAGER_IFACE = "org.bluez.LEAdvertisingManager1"
+LE_ADVERTISEMENT_IFACE = "org.bluez.LEAdvertisement1"
+DBUS_OM_IFACE = "org.freedesktop.DBus.ObjectManager"
+DBUS_PROP_IFACE = "org.freedesktop.DBus.Properties"
+GATT_SERVICE_IFACE = "org.bluez.GattService1"
+GATT_CHRC_IFACE = "org.bluez.GattCharacteristic1"
+
+
+class PrivateBus:
+    """ 테스트용 dbus-daemon (session 설정, 같은 사용자에게 모두 허용) """
+
+    def __init__(self):
+        self.process = None
+        self.address = None
+
+    def start(self):
+        daemon = shutil.which("dbus-daemon")
+        if daemon is None:
+            raise RuntimeError("dbus-daemon not found")
+        self.process = subprocess.Popen(
+            [daemon, "--session", "--nofork", "--print-address=1"],
+            stdout=subprocess.PIPE, text=True)
+        self.address = self.process.stdout.readline().strip()
+        if not self.address:
+            self.stop()
+            raise RuntimeError("dbus-daemon failed to start")
+        return self.address
+
+    def env(self, base=None):
+        """ 서버 프로세스용 환경 변수 (시스템 버스 = 이 버스) """
+        env = dict(os.environ if base is None else base)
+        env["DBUS_SYSTEM_BUS_ADDRESS"] = self.address
+        return env
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.process.terminate()
+        self.process.wait()
+        self.process.stdout.close()
+        self.process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+#
+# 어댑터 인터페이스
+#
+class _Adapter1(ServiceInterface):
+    def __init__(self, mock):
+        super().__init__(ADAPTER_IFACE)
+        self.mock = mock
+        self._powered = True
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Address(self) -> "s":
+        return self.mock.address
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Name(self) -> "s":
+        return "mock-bluez"
+
+    @dbus_property()
+    def Powered(self) -> "b":
+        return self._powered
+
+    @Powered.setter
+    def Powered(self, value: "b"):
+        self._powered = value
+
+
+class _GattManager1(ServiceInterface):
+    def __init__(self, mock):
+        super().__init__(GATT_MANAGER_IFACE)
+        self.mock = mock
+
+    @method()
+    def RegisterApplication(self, application: "o", options: "a{sv}"):
+        self.mock.on_register_application(self.mock.current_sender, application)
+
+    @method()
+    def UnregisterApplication(self, application: "o"):
+        self.mock.applications.pop((self.mock.current_sender, application), None)
+
+
+class _LEAdvertisingManager1(ServiceInterface):
+    def __init__(self, mock):
+        super().__init__(LE_ADVERTISING_MANAGER_IFACE)
+        self.mock = mock
+
+    @dbus_property(access=PropertyAccess.READ)
+    def ActiveInstances(self) -> "y":
+        return len(self.mock.advertisements)
+
+    @dbus_property(access=PropertyAccess.READ)
+    def SupportedInstances(self) -> "y":
+        return 4
+
+    @method()
+    def RegisterAdvertisement(self, advertisement: "o", options: "a{sv}"):
+        self.mock.on_register_advertisement(self.mock.current_sender, advertisement)
+
+    @method()
+    def UnregisterAdvertisement(self, advertisement: "o"):
+        self.mock.advertisements.pop((self.mock.current_sender, advertisement), None)
+
+
+#
+# 가짜 central
+#
+class FakeCentral:
+    """ 알림을 받는 central 하나. Characteristic 경로별 수신 기록. """
+
+    def __init__(self, name, keep=True):
+        self.name = name
+        self.keep = keep
+        self.counts = {}      # 경로 -> 받은 알림 수
+        self.received = []    # (monotonic_ns, 경로, bytes), keep 일 때만
+
+    def on_value(self, t_ns, path, value):
+        self.counts[path] = self.counts.get(path, 0) + 1
+        if self.keep:
+            self.received.append((t_ns, path, value))
+
+    def clear(self):
+        self.counts = {}
+        self.received = []
+
+
+class _Subscription:
+    __slots__ = ("path", "mode", "sock", "mtu")
+
+    def __init__(self, path, mode, sock=None, mtu=None):
+        self.path = path
+        self.mode = mode
+        self.sock = sock
+        self.mtu = mtu
+
+
+class MockBluez:
+    """
+    가짜 bluetoothd. start() 뒤 서버가 RegisterApplication 을 부르면
+    GATT 트리를 읽고, auto_subscribe 이면 notify Characteristic 을 모두
+    구독한다. wait_registered() 로 기다릴 수 있다.
+
+    mode   : "notify" (StartNotify + PropertiesChanged) 또는 "acquire"
+             (AcquireNotify 소켓). acquire 는 NotifyAcquired 속성이 있는
+             Characteristic 에만 쓰고 나머지는 notify 로 한다.
+    mtu    : ReadValue/AcquireNotify options 로 넘기는 ATT MTU
+    """
+    ADAPTER_PATH = "/org/bluez/hci0"
+
+    def __init__(self, bus, centrals=1, mode="notify", mtu=247,
+                 address="00:00:5E:00:53:00", auto_subscribe=True, keep=True):
+        if mode not in ("notify", "acquire"):
+            raise ValueError("unknown mode: %r" % mode)
+        self.bus = bus
+        self.mode = mode
+        self.mtu = mtu
+        self.address = address
+        self.auto_subscribe = auto_subscribe
+        self.centrals = [FakeCentral("central%d" % i, keep) for i in range(centrals)]
+        self.applications = {}     # (sender, 경로) -> GetManagedObjects 결과
+        self.advertisements = {}   # (sender, 경로) -> LEAdvertisement1 속성
+        self.characteristics = {}  # 경로 -> GattCharacteristic1 속성
+        self.app_sender = None
+        self.subscriptions = {}    # 경로 -> _Subscription
+        self.current_sender = None
+        self._registered = asyncio.Event()
+        self._tasks = set()
+
+    @classmethod
+    async def connect(cls, address, **kwargs):
+        bus = await MessageBus(bus_address=address, negotiate_unix_fd=True).connect()
+        mock = cls(bus, **kwargs)
+        await mock.start()
+        return mock
+
+    async def start(self):
+        self.bus.add_message_handler(self._on_message)
+        self.bus.export(self.ADAPTER_PATH, _Adapter1(self))
+        self.bus.export(self.ADAPTER_PATH, _GattManager1(self))
+        self.bus.export(self.ADAPTER_PATH, _LEAdvertisingManager1(self))
+        reply = await self.bus.request_name(BLUEZ_SERVICE_NAME)
+        if reply != RequestNameReply.PRIMARY_OWNER:
+            raise RuntimeError("org.bluez is already owned")
+
+    def stop(self):
+        for sub in list(self.subscriptions.values()):
+            self._close_subscription(sub)
+        self.subscriptions = {}
+        for task in self._tasks:
+            task.cancel()
+        self.bus.disconnect()
+
+    async def wait_registered(self, timeout=10.0):
+        await asyncio.wait_for(self._registered.wait(), timeout)
+
+    # -----------------------
+    # 등록 (서버 -> bluez)
+    # -----------------------
+    def on_register_application(self, sender, path):
+        self._spawn(self._load_application(sender, path))
+
+    def on_register_advertisement(self, sender, path):
+        self._spawn(self._load_advertisement(sender, path))
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print("mock_bluez: %r" % task.exception())
+
+    async def _load_application(self, sender, path):
+        reply = await self.call(sender, path, DBUS_OM_IFACE, "GetManagedObjects")
+        objects = reply.body[0]
+        self.applications[(sender, path)] = objects
+        self.app_sender = sender
+        for obj_path, interfaces in sorted(objects.items()):
+            if GATT_CHRC_IFACE in interfaces:
+                props = {k: v.value for k, v in interfaces[GATT_CHRC_IFACE].items()}
+                self.characteristics[obj_path] = props
+        if self.auto_subscribe:
+            for chrc_path in self.get_notify_paths():
+                await self.subscribe(chrc_path)
+        self._registered.set()
+
+    async def _load_advertisement(self, sender, path):
+        reply = await self.call(sender, path, DBUS_PROP_IFACE, "GetAll",
+                                "s", [LE_ADVERTISEMENT_IFACE])
+        self.advertisements[(sender, path)] = {k: v.value for k, v in reply.body[0].items()}
+
+    # -----------------------
+    # GATT 클라이언트 동작 (bluez -> 서버)
+    # -----------------------
+    async def call(self, destination, path, interface, member, signature="", body=()):
+        reply = await self.bus.call(Message(
+            destination=destination, path=path, interface=interface,
+            member=member, signature=signature, body=list(body)))
+        if reply.message_type == MessageType.ERROR:
+            raise DBusError._from_message(reply)
+        return reply
+
+    def get_notify_paths(self):
+        return [path for path, props in self.characteristics.items()
+                if "notify" in props.get("Flags", ())]
+
+    def find_characteristic(self, uuid):
+        for path, props in self.characteristics.items():
+            if props.get("UUID") == uuid:
+                return path
+        return None
+
+    async def read_value(self, path, offset=0):
+        options = {"offset": Variant("q", offset), "mtu": Variant("q", self.mtu),
+                   "device": Variant("o", self.ADAPTER_PATH + "/dev_mock")}
+        reply = await self.call(self.app_sender, path, GATT_CHRC_IFACE,
+                                "ReadValue", "a{sv}", [options])
+        return reply.body[0]
+
+    async def write_value(self, path, value):
+        options = {"type": Variant("s", "request"), "mtu": Variant("q", self.mtu)}
+        await self.call(self.app_sender, path, GATT_CHRC_IFACE,
+                        "WriteValue", "aya{sv}", [bytes(value), options])
+
+    async def subscribe(self, path, mode=None):
+        if path in self.subscriptions:
+            return
+        mode = mode or self.mode
+        if mode == "acquire" and "NotifyAcquired" not in self.characteristics.get(path, {}):
+            mode = "notify"
+
+        if mode == "acquire":
+            options = {"mtu": Variant("q", self.mtu),
+                       "device": Variant("o", self.ADAPTER_PATH + "/dev_mock"),
+                       "link": Variant("s", "LE")}
+            reply = await self.call(self.app_sender, path, GATT_CHRC_IFACE,
+                                    "AcquireNotify", "a{sv}", [options])
+            sock = socket.socket(fileno=reply.unix_fds[reply.body[0]])
+            sock.setblocking(False)
+            sub = _Subscription(path, mode, sock, reply.body[1])
+            asyncio.get_event_loop().add_reader(sock.fileno(), self._sock_ready, sub)
+        else:
+            rule = ("type='signal',sender='%s',interface='%s',member='PropertiesChanged',"
+                    "path='%s'" % (self.app_sender, DBUS_PROP_IFACE, path))
+            await self.bus.call(Message(
+                destination="org.freedesktop.DBus", path="/org/freedesktop/DBus",
+                interface="org.freedesktop.DBus", member="AddMatch",
+                signature="s", body=[rule]))
+            await self.call(self.app_sender, path, GATT_CHRC_IFACE, "StartNotify")
+            sub = _Subscription(path, mode)
+        self.subscriptions[path] = sub
+
+    async def unsubscribe(self, path):
+        sub = self.subscriptions.pop(path, None)
+        if sub is None:
+            return
+        if sub.mode == "notify":
+            await self.call(self.app_sender, path, GATT_CHRC_IFACE, "StopNotify")
+        self._close_subscription(sub)
+
+    def _close_subscription(self, sub):
+        if sub.sock is not None:
+            asyncio.get_event_loop().remove_reader(sub.sock.fileno())
+            sub.sock.close()
+            sub.sock = None
+
+    # -----------------------
+    # 수신
+    # -----------------------
+    def _on_message(self, msg):
+        t_ns = time.monotonic_ns()
+        if msg.message_type == MessageType.METHOD_CALL:
+            # 동기 메서드 처리기(RegisterApplication 등)가 호출자를 알 수 있게
+            self.current_sender = msg.sender
+            return None
+        if (msg.message_type == MessageType.SIGNAL
+                and msg.member == "PropertiesChanged"
+                and msg.path in self.subscriptions
+                and msg.body[0] == GATT_CHRC_IFACE):
+            value = msg.body[1].get("Value")
+            if value is not None:
+                self.deliver(t_ns, msg.path, bytes(value.value))
+            return True
+        return None
+
+    def _sock_ready(self, sub):
+        while sub.sock is not None:
+            try:
+                value = sub.sock.recv(sub.mtu or self.mtu)
+            except BlockingIOError:
+                return
+            except OSError:
+                value = b""
+            if not value:
+                # 서버가 소켓을 닫음
+                self.subscriptions.pop(sub.path, None)
+                self._close_subscription(sub)
+                return
+            self.deliver(time.monotonic_ns(), sub.path, value)
+
+    def deliver(self, t_ns, path, value):
+        for central in self.centrals:
+            central.on_value(t_ns, path, value)
+
+    def get_stats(self):
+        """ Characteristic 경로별 central 당 수신 수 """
+        stats = {}
+        for central in self.centrals:
+            for path, count in central.counts.items():
+                stats.setdefault(path, []).append(count)
+        return stats
+
+
+#
+# 단독 실행: 버스를 띄우고 수신 현황을 1초마다 출력
+#
+async def _run(args):
+    bus = None
+    address = args.address
+    if address is None:
+        bus = PrivateBus()
+        address = bus.start()
+    print("DBUS_SYSTEM_BUS_ADDRESS=%s" % address, flush=True)
+    mock = await MockBluez.connect(address, centrals=args.centrals, mode=args.mode,
+                                   mtu=args.mtu, keep=False)
+    try:
+        await mock.wait_registered(timeout=None)
+        for path, props in sorted(mock.characteristics.items()):
+            print("%s %s %s" % (path, props.get("UUID"), ",".join(props.get("Flags", []))))
+        started = time.monotonic()
+        while args.duration is None or time.monotonic() - started < args.duration:
+            before = mock.get_stats()
+            await asyncio.sleep(1.0)
+            after = mock.get_stats()
+            rates = ["%s=%d/s" % (path.rsplit("/", 1)[-1], counts[0] - before.get(path, [0])[0])
+                     for path, counts in sorted(after.items())]
+            print(" ".join(rates) or "(no notifications)", flush=True)
+    finally:
+        mock.stop()
+        if bus is not None:
+            bus.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 org.bluez 서비스")
+    parser.add_argument("--address", help="이미 떠 있는 버스 주소 (생략하면 새로 띄움)")
+    parser.add_argument("--centrals", type=int, default=1)
+    parser.add_argument("--mode", choices=("notify", "acquire"), default="notify")
+    parser.add_argument("--mtu", type=int, default=247)
+    parser.add_argument("--duration", type=float)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# bluetooth_server_aio.py
+import asyncio
+import time
+
+from utils.aio_service import Application, Service, Characteristic, Descriptor, Advertisement
+from utils.deadband import Deadband
+from utils.codec import StructCodec
+
+NOTIFY_MIN_INTERVAL = 20  # ms, 알림 사이의 최소 간격 (채널 rate 가 없을 때)
+
+#
+# bluetooth_server_v5.py 와 같은 서비스/UUID 를 asyncio 백엔드(utils/aio_service.py)
+# 로 제공하는 서버. 채널 Characteristic 은 float32 read/notify 와 deadband 를
+# 지원한다 (int16/delta 인코딩, Frame/Control Characteristic 은 v5 에만 있음).
+#
+# 센서 생산자 스레드의 publish hook 은 loop.call_soon_threadsafe 로 이벤트
+# 루프를 깨우고, 구독 중인 Characteristic 마다 하나씩 있는 알림 코루틴이
+# 새 프레임을 보낸다. 다른 asyncio 작업과 같은 루프에서 돈다.
+#
+
+class SensorAdvertisement(Advertisement):
+    def __init__(self, index):
+        Advertisement.__init__(self, index, "peripheral")
+        self.add_local_name("NeuraLoad")
+        self.include_tx_power = True
+
+class SensorService(Service):
+    SENSOR_SVC_UUID = "00000001-736c-4645-b520-7127aadf8c47"
+
+    def __init__(self, index, sensor_data, loop):
+        super().__init__(index, self.SENSOR_SVC_UUID, True)
+        self.sensor_data = sensor_data
+        self.loop = loop
+        sensor_data.add_publish_hook(self.on_sensor_publish)
+
+        self.channel_characteristics = {}
+        for channel in sensor_data.schema:
+            chrc = ChannelCharacteristic(self, channel)
+            self.channel_characteristics[channel.name] = chrc
+            self.add_characteristic(chrc)
+        self.add_characteristic(DeviceIDCharacteristic(self))
+
+    def on_sensor_publish(self, frame):
+        # 생산자 스레드에서 불림
+        try:
+            self.loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # 이벤트 루프가 이미 닫혔다 (종료 중)
+            pass
+
+    def close(self):
+        self.sensor_data.remove_publish_hook(self.on_sensor_publish)
+
+    def _wake(self):
+        for chrc in self.channel_characteristics.values():
+            chrc.data_ready.set()
+
+#
+# 스키마 채널 하나
+#
+class ChannelCharacteristic(Characteristic):
+    ACQUIRE_NOTIFY = True
+
+    def __init__(self, service, channel):
+        super().__init__(channel.uuid, ["notify", "read"], service)
+        self.channel = channel
+        self.codec = StructCodec(channel.format)
+        self.deadband = Deadband(**channel.deadband) if channel.deadband is not None else None
+        self.notify_interval = (max(1, int(1000 / channel.rate)) if channel.rate
+                                else NOTIFY_MIN_INTERVAL)  # ms
+        self.data_ready = asyncio.Event()
+        self._notify_task = None
+        self._cache = None  # (generation, bytes)
+        self.add_descriptor(SensorDescriptor(self, channel.description))
+
+    def get_sensor_values(self, snapshot):
+        return getattr(snapshot, self.channel.name)
+
+    def get_value(self, snapshot=None):
+        sensor_data = self.service.sensor_data
+        if snapshot is None:
+            snapshot = sensor_data.get_snapshot()
+        cached = self._cache
+        if cached is not None and cached[0] == snapshot.seq:
+            return cached[1]
+        while True:
+            values = self.get_sensor_values(snapshot)
+            if isinstance(values, tuple):
+                value = bytes(self.codec.encode(*values))
+            else:
+                value = bytes(self.codec.encode_buffer(values))
+            if sensor_data.snapshot_valid(snapshot):
+                break
+            snapshot = sensor_data.get_snapshot()
+        self._cache = (snapshot.seq, value)
+        return value
+
+    async def notify_value(self):
+        snapshot = self.service.sensor_data.get_snapshot()
+        if self.deadband is not None:
+            if not self.deadband.should_send(self.get_sensor_values(snapshot)):
+                return
+        await self.send_notification(self.get_value(snapshot))
+
+    async def notify_loop(self):
+        interval = self.notify_interval / 1000.0
+        await self.notify_value()
+        last = time.monotonic()
+        while True:
+            await self.data_ready.wait()
+            self.data_ready.clear()
+            # 최소 간격 (그 사이 들어온 프레임은 한 번으로 합쳐진다)
+            delay = last + interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            last = time.monotonic()
+            await self.notify_value()
+
+    def StartNotify(self):
+        if self._notify_task is not None:
+            return
+        if self.deadband is not None:
+            self.deadband.reset()
+        self._notify_task = asyncio.ensure_future(self.notify_loop())
+
+    def StopNotify(self):
+        if self._notify_task is not None:
+            self._notify_task.cancel()
+            self._notify_task = None
+
+    def ReadValue(self, options):
+        self.update_mtu(options)
+        return self.get_value()
+
+#
+# Device ID Characteristic (문자열)
+#
+class DeviceIDCharacteristic(Characteristic):
+    DEVICE_ID_CHARACTERISTIC_UUID = "00000005-736c-4645-b520-7127aadf8c47"
+
+    def __init__(self, service):
+        super().__init__(self.DEVICE_ID_CHARACTERISTIC_UUID, ["read"], service)
+        self.add_descriptor(SensorDescriptor(self, "Device ID"))
+
+    def ReadValue(self, options):
+        return self.service.sensor_data.get_device_id().encode('utf-8')
+
+#
+# Descriptor
+#
+class SensorDescriptor(Descriptor):
+    DESCRIPTOR_UUID = "2901"
+
+    def __init__(self, characteristic, description):
+        super().__init__(self.DESCRIPTOR_UUID, ["read"], characteristic)
+        self.description = description
+
+    def ReadValue(self, options):
+        return self.description.encode()
+
+#
+# 메인 함수
+#
+async def serve(sensor_data, bus=None):
+    app = Application(bus)
+    await app.connect()
+    sensor_service = SensorService(0, sensor_data, asyncio.get_running_loop())
+    try:
+        app.add_service(sensor_service)
+        await app.register()
+
+        adv = SensorAdvertisement(0)
+        await adv.register(app.bus)
+
+        print("BLE Server (asyncio) is running. Press Ctrl+C to stop.")
+        await app.run()
+    finally:
+        # 루프가 닫힌 뒤에는 생산자 스레드가 루프를 깨우지 않도록
+        sensor_service.close()
+
+def start_ble_server(sensor_data):
+    """
+    BLE 서버를 asyncio 이벤트 루프에서 실행하는 함수.
+    """
+    try:
+        asyncio.run(serve(sensor_data))
+    except KeyboardInterrupt:
+        print("\nGATT application terminated")
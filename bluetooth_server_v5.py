@@ -1,11 +1,25 @@
 # ble_server.py
 import dbus
-import struct
+from array import array
 from utils.advertisement import Advertisement
-from utils.service import Application, Service, Characteristic, Descriptor
+from utils.service import (
+    Application, Service, Characteristic, Descriptor, NotifyScheduler,
+    InvalidArgsException,
+)
+from utils.deadband import Deadband
+from utils.metrics import METRICS
+from utils.codec import (
+    StructCodec, FRAME_VERSION, frame_format, frame_size,
+    ENCODING_FLOAT32, ENCODING_DELTA_VARINT, ENCODING_INT16,
+    DeltaVarintEncoder, ScaledInt16Codec,
+)
 
 GATT_CHRC_IFACE = "org.bluez.GattCharacteristic1"
-NOTIFY_TIMEOUT = 1000  # ms
+NOTIFY_TIMEOUT = 1000  # ms, 주기 알림 모드의 주기
+NOTIFY_MIN_INTERVAL = 20  # ms, 이벤트 알림 모드의 최소 간격 (최대 50Hz, 채널 rate 가 없을 때)
+
+# 채널별 알림 억제(deadband) 설정은 SensorSchema 의 Channel.deadband 로 옮겼다
+# (utils/sensor_schema.py 의 DEFAULT_SCHEMA 참고).
 
 class SensorAdvertisement(Advertisement):
     def __init__(self, index):
@@ -19,161 +33,459 @@ class SensorService(Service):
     def __init__(self, index, sensor_data):
         super().__init__(index, self.SENSOR_SVC_UUID, True)
         self.sensor_data = sensor_data  # 다른 Characteristic에서도 접근
-
-        self.add_characteristic(IMUCharacteristic(self))
-        self.add_characteristic(LaserCharacteristic(self))
-        self.add_characteristic(WeightCharacteristic(self))
+        # 새 프레임이 게시되면 메인 루프를 깨워 이벤트 알림을 보낸다
+        sensor_data.add_publish_hook(self.on_sensor_publish)
+
+        # 스키마의 채널마다 Characteristic 하나 (이름 -> Characteristic)
+        self.channel_characteristics = {}
+        for channel in sensor_data.schema:
+            chrc_class = CHANNEL_CHARACTERISTICS.get(channel.name, ChannelCharacteristic)
+            chrc = chrc_class(self, channel)
+            self.channel_characteristics[channel.name] = chrc
+            self.add_characteristic(chrc)
+        self.imu_characteristic = self.channel_characteristics.get("imu")
+        self.laser_characteristic = self.channel_characteristics.get("laser")
         self.add_characteristic(DeviceIDCharacteristic(self))
+        if sensor_data.schema.frame:
+            self.add_characteristic(FrameCharacteristic(self))
+        self.add_characteristic(ControlCharacteristic(self))
+        self.add_characteristic(DiagnosticsCharacteristic(self))
+
+    def on_sensor_publish(self, frame):
+        # 생산자 스레드에서 불림
+        NotifyScheduler.default().wake()
+
+    def get_notify_stats(self):
+        """ Characteristic 별 알림 전송/억제 횟수 (deadband 튜닝용) """
+        stats = {}
+        for chrc in self.characteristics:
+            if getattr(chrc, "deadband", None) is not None:
+                stats[chrc.uuid] = chrc.deadband.get_stats()
+        return stats
 
 #
-# IMU
+# 센서 Characteristic 공통 부분
 #
-class IMUCharacteristic(Characteristic):
-    IMU_CHARACTERISTIC_UUID = "00000002-736c-4645-b520-7127aadf8c47"
+class SensorCharacteristic(Characteristic):
+    """
+    SensorData 스냅샷의 한 항목을 read/notify 로 제공하는 Characteristic.
+    하위 클래스는 get_sensor_values() 로 스냅샷에서 보낼 값만 골라 준다.
 
-    def __init__(self, service):
-        super().__init__(
-            self.IMU_CHARACTERISTIC_UUID,
-            ["notify", "read"],
-            service
-        )
+    인코딩 결과(dbus.ByteArray)는 스냅샷의 세대(seq)와 함께 캐시해 두고,
+    세대가 바뀌었을 때만 다시 인코딩한다. 같은 프레임에 대해 여러
+    central 이 읽거나 알림이 반복되어도 패킹 비용은 한 번뿐이다.
+
+    EVENT_DRIVEN 이면 주기 폴링 대신 SensorData 에 새 프레임이 게시될 때마다
+    알림을 보낸다. 이때 notify_interval 은 알림 사이의 최소 간격이며,
+    그 사이에 들어온 프레임들은 한 번의 알림으로 합쳐진다.
+    EVENT_DRIVEN 이 False 이면 notify_interval 주기로 알림을 보낸다.
+
+    scales 를 주면 float32 외에 채널별 scale/offset 을 적용한 int16 알림
+    모드(ENCODING_INT16)를 지원하고, 그 메타데이터를 ScaleDescriptor 로
+    한 번 내보낸다. 알림 인코딩은 set_encoding() 으로 바꾸며 ReadValue 는
+    항상 float32 레이아웃이다.
+
+    deadband 가 있으면 인코딩 전에 스냅샷 값으로 변화량을 판정해서
+    변화가 없는 알림은 보내지 않는다 (utils/deadband.py).
+
+    bluetoothd 가 AcquireNotify 를 지원하면 알림은 D-Bus 시그널 대신
+    넘겨받은 소켓으로 바로 나간다 (Characteristic.send_notification).
+    """
+    ACQUIRE_NOTIFY = True
+    EVENT_DRIVEN = True
+    # 지원하는 알림 인코딩 (ControlCharacteristic 으로 선택)
+    ENCODINGS = (ENCODING_FLOAT32,)
+
+    def __init__(self, uuid, service, fmt, description, deadband=None,
+                 scales=None, offsets=None):
+        super().__init__(uuid, ["notify", "read"], service)
         self.notifying = False
-        self.add_descriptor(SensorDescriptor(self, "IMU Sensor Data"))
+        self.notify_interval = NOTIFY_MIN_INTERVAL if self.EVENT_DRIVEN else NOTIFY_TIMEOUT  # ms
+        self._notify_handle = None
+        self.encodings = self.ENCODINGS
+        self.encoding = ENCODING_FLOAT32
+        self.codec = StructCodec(fmt)
+        self.codecs = {ENCODING_FLOAT32: self.codec}
+        if scales is not None:
+            self.codecs[ENCODING_INT16] = ScaledInt16Codec(scales, offsets)
+        self._cache = {}  # encoding -> (generation, dbus.ByteArray)
+        self.deadband = deadband
+        self.add_descriptor(SensorDescriptor(self, description))
+        if scales is not None:
+            self.add_descriptor(ScaleDescriptor(self, self.codecs[ENCODING_INT16]))
+
+    def get_sensor_values(self, snapshot):
+        raise NotImplementedError
+
+    def get_value(self, snapshot=None, encoding=ENCODING_FLOAT32):
+        sensor_data = self.service.sensor_data
+        if snapshot is None:
+            snapshot = sensor_data.get_snapshot()
+        cached = self._cache.get(encoding)
+        if cached is not None and cached[0] == snapshot.seq:
+            return cached[1]
+
+        codec = self.codecs[encoding]
+        while True:
+            values = self.get_sensor_values(snapshot)
+            if encoding == ENCODING_FLOAT32 and not isinstance(values, tuple):
+                # NumPy 스냅샷: 배열 메모리를 그대로 사용 (패킹 없음)
+                encoded = codec.encode_buffer(values)
+            else:
+                encoded = codec.encode(*values)
+            value = dbus.ByteArray(encoded)
+            # NumPy 더블 버퍼가 인코딩 도중 재사용됐으면 다시 읽는다
+            if sensor_data.snapshot_valid(snapshot):
+                break
+            snapshot = sensor_data.get_snapshot()
+        self._cache[encoding] = (snapshot.seq, value)
+        return value
 
-    def get_imu_data(self):
-        """
-        IMU 데이터를 [4 x 9 floats] = 36 floats 라고 가정.
-        예) [[a1,a2,...,a9], [b1,b2,...,b9], ...] 형태
-        """
-        imu_data = self.service.sensor_data.get_imu_data()  # 2차원 리스트
-        flat_data = [val for row in imu_data for val in row]
-        return struct.pack(f"{len(flat_data)}f", *flat_data)  # bytes
+    def set_encoding(self, encoding):
+        if encoding not in self.encodings:
+            raise ValueError("unsupported encoding: %r" % encoding)
+        self.encoding = encoding
 
-    def set_imu_callback(self):
+    def notify_value(self):
+        snapshot = self.service.sensor_data.get_snapshot()
+        if self.deadband is not None:
+            if not self.deadband.should_send(self.get_sensor_values(snapshot)):
+                self.note_suppressed()
+                return
+        self.send_notification(self.get_value(snapshot, self.encoding))
+
+    def notify_callback(self):
         if self.notifying:
-            value = self.get_imu_data()
-            # 바이트 배열을 제대로 넘기기 위해 dbus.ByteArray(...) 사용
-            self.PropertiesChanged(
-                GATT_CHRC_IFACE,
-                {"Value": dbus.ByteArray(value)},
-                []
-            )
+            self.notify_value()
         return self.notifying
 
+    def set_notify_interval(self, interval_ms):
+        """ 알림 주기(이벤트 모드는 최소 간격, ms) 변경. 구독 중이면 바로 반영된다. """
+        self.notify_interval = interval_ms
+        if self._notify_handle is not None:
+            NotifyScheduler.default().set_interval(self._notify_handle, interval_ms)
+
     def StartNotify(self):
         if self.notifying:
             return
         self.notifying = True
-        value = self.get_imu_data()
-        self.PropertiesChanged(
-            GATT_CHRC_IFACE,
-            {"Value": dbus.ByteArray(value)},
-            []
-        )
-        self.add_timeout(NOTIFY_TIMEOUT, self.set_imu_callback)
+        if self.deadband is not None:
+            self.deadband.reset()
+        self.notify_value()
+        if self.EVENT_DRIVEN:
+            self._notify_handle = NotifyScheduler.default().add_event(
+                self.notify_interval, self.notify_callback, self)
+        else:
+            self._notify_handle = self.add_timeout(self.notify_interval, self.notify_callback)
 
     def StopNotify(self):
         self.notifying = False
+        if self._notify_handle is not None:
+            self.remove_timeout(self._notify_handle)
+            self._notify_handle = None
 
     def ReadValue(self, options):
-        value = self.get_imu_data()
-        return dbus.ByteArray(value)
+        self.update_mtu(options)
+        return self.get_value()
 
 #
-# Laser
+# 스키마 채널 하나
 #
-class LaserCharacteristic(Characteristic):
-    LASER_CHARACTERISTIC_UUID = "00000003-736c-4645-b520-7127aadf8c47"
+class ChannelCharacteristic(SensorCharacteristic):
+    """
+    SensorSchema 의 채널 하나를 내보내는 Characteristic.
+    UUID, 설명, 레이아웃, 지원 인코딩, deadband, 알림 간격(rate)이 모두
+    Channel 선언에서 정해진다.
+
+    알림 인코딩은 ControlCharacteristic 으로 고른다 (self.encoding).
+      - ENCODING_FLOAT32      : 최신 샘플 하나, float32 배열 (기본)
+      - ENCODING_INT16        : 최신 샘플 하나, int16 배열 (Channel.scales)
+      - ENCODING_DELTA_VARINT : history 의 연속 샘플을 delta + varint 로
+                                MTU 가 허용하는 만큼 묶어서 보냄 (Channel.stream)
+    ReadValue 는 인코딩 모드와 관계없이 항상 float32 레이아웃이다.
+    """
+    # 스트림 모드에서 한 번에 history 에서 꺼내 볼 최대 샘플 수
+    STREAM_WINDOW = 32
 
-    def __init__(self, service):
+    def __init__(self, service, channel):
         super().__init__(
-            self.LASER_CHARACTERISTIC_UUID,
-            ["notify", "read"],
-            service
+            channel.uuid,
+            service,
+            channel.format,
+            channel.description,
+            Deadband(**channel.deadband) if channel.deadband is not None else None,
+            channel.scales,
+            channel.offsets
         )
-        self.notifying = False
-        self.add_descriptor(SensorDescriptor(self, "Laser Sensor Data"))
+        self.channel = channel
+        self.encodings = channel.encodings
+        self.encoding = channel.default_encoding
+        if channel.rate:
+            self.notify_interval = max(1, int(1000 / channel.rate))
+
+        # history 한 행에서 이 채널이 차지하는 열과, 행 mask 에서의 비트
+        self.columns = service.sensor_data.schema.columns[channel.name]
+        self.bit = service.sensor_data.schema.bits[channel.name]
+        self.stream_encoder = None
+        if channel.stream:
+            self.stream_encoder = DeltaVarintEncoder(channel.scales)
+            history = service.sensor_data.history
+            self._rows = array('f', bytes(4 * history.width * self.STREAM_WINDOW))
+            self._rows_view = memoryview(self._rows)
+            self._timestamps = array('d', bytes(8 * self.STREAM_WINDOW))
+            self._masks = array('B', bytes(self.STREAM_WINDOW))
+        self._last_sent_timestamp = None
+        self.dropped_samples = 0
+
+    def get_sensor_values(self, snapshot):
+        # 스냅샷의 채널 값은 이미 평탄화된 float 튜플 (또는 NumPy view)
+        return getattr(snapshot, self.channel.name)
+
+    def set_encoding(self, encoding):
+        super().set_encoding(encoding)
+        if self.stream_encoder is not None:
+            self.stream_encoder.force_keyframe()
+        self._last_sent_timestamp = None
+
+    def notify_value(self):
+        if self.encoding == ENCODING_DELTA_VARINT:
+            self.notify_stream()
+        else:
+            super().notify_value()
+
+    def notify_stream(self):
+        history = self.service.sensor_data.history
+        from_history = len(history) > 0
+        if not from_history:
+            rows = (self.get_sensor_values(self.service.sensor_data.get_snapshot()),)
+        else:
+            if self._last_sent_timestamp is None:
+                count = history.window(1, self._rows, self._timestamps, None, self._masks)
+                # 첫 알림은 최신 값 하나 (다른 채널의 행이어도 값은 최신이다)
+                self._masks[0] = self.bit
+                pending = None
+            else:
+                pending = history.count_since(self._last_sent_timestamp, self.bit)
+                count = history.since(self._last_sent_timestamp, self._rows,
+                                      self._timestamps, None, self.STREAM_WINDOW, self._masks)
+            if count == 0:
+                return
+            # 다른 채널만 바뀐 행은 이 채널 값의 복사본이므로 건너뛴다
+            selected = [i for i in range(count) if self._masks[i] & self.bit]
+            if pending is not None:
+                self.dropped_samples += max(0, pending - len(selected))
+            if not selected:
+                self._last_sent_timestamp = self._timestamps[count - 1]
+                return
+            width = history.width
+            start = self.columns.start
+            stop = self.columns.stop
+            view = self._rows_view
+            rows = (view[i * width + start:i * width + stop] for i in selected)
+
+        packet, sent = self.stream_encoder.encode(rows, self.get_max_notify_size())
+        if sent == 0:
+            return
+        if from_history:
+            # 못 보낸 샘플은 다음 알림에서 이어서 보낸다
+            if sent == len(selected):
+                self._last_sent_timestamp = self._timestamps[count - 1]
+            else:
+                self._last_sent_timestamp = self._timestamps[selected[sent - 1]]
+        if not self.send_notification(dbus.ByteArray(packet)):
+            # 패킷을 잃었으면 delta 체인이 끊겼으므로 다음은 keyframe
+            self.stream_encoder.force_keyframe()
+
+    def StartNotify(self):
+        if not self.notifying:
+            if self.stream_encoder is not None:
+                self.stream_encoder.force_keyframe()
+            self._last_sent_timestamp = None
+        super().StartNotify()
+
+#
+# IMU
+#
+class IMUCharacteristic(ChannelCharacteristic):
+    def get_imu_data(self):
+        """
+        IMU 데이터를 [4 x 9 floats] = 36 floats 라고 가정.
+        예) [[a1,a2,...,a9], [b1,b2,...,b9], ...] 형태
+        """
+        return self.get_value()
+
+    def set_imu_callback(self):
+        return self.notify_callback()
 
+#
+# Laser
+#
+class LaserCharacteristic(ChannelCharacteristic):
     def get_laser_data(self):
-        laser_data = self.service.sensor_data.get_laser_data()  # 예) 4 floats
-        return struct.pack(f"{len(laser_data)}f", *laser_data)
+        return self.get_value()
 
     def set_laser_callback(self):
-        if self.notifying:
-            value = self.get_laser_data()
-            self.PropertiesChanged(
-                GATT_CHRC_IFACE,
-                {"Value": dbus.ByteArray(value)},
-                []
-            )
-        return self.notifying
+        return self.notify_callback()
 
-    def StartNotify(self):
-        if self.notifying:
-            return
-        self.notifying = True
-        value = self.get_laser_data()
-        self.PropertiesChanged(
-            GATT_CHRC_IFACE,
-            {"Value": dbus.ByteArray(value)},
-            []
-        )
-        self.add_timeout(NOTIFY_TIMEOUT, self.set_laser_callback)
+#
+# Weight
+#
+class WeightCharacteristic(ChannelCharacteristic):
+    def get_weight_data(self):
+        return self.get_value()
 
-    def StopNotify(self):
-        self.notifying = False
+    def set_weight_callback(self):
+        return self.notify_callback()
 
-    def ReadValue(self, options):
-        value = self.get_laser_data()
-        return dbus.ByteArray(value)
+# 채널 이름별 Characteristic 클래스 (없으면 ChannelCharacteristic)
+CHANNEL_CHARACTERISTICS = {
+    "imu": IMUCharacteristic,
+    "laser": LaserCharacteristic,
+    "weight": WeightCharacteristic,
+}
 
 #
-# Weight
+# Frame (모든 채널 통합)
 #
-class WeightCharacteristic(Characteristic):
-    WEIGHT_CHARACTERISTIC_UUID = "00000004-736c-4645-b520-7127aadf8c47"
+class FrameCharacteristic(SensorCharacteristic):
+    """
+    한 스냅샷의 모든 채널(기본 구성은 IMU / Laser / Weight)을 하나의 알림으로
+    보내는 Characteristic. 레이아웃은 utils/codec.py 의 통합 프레임 설명과
+    SensorSchema.frame_format 참고 (헤더 + 채널 순서대로의 본문).
+    기존 센서별 Characteristic 은 호환을 위해 그대로 둔다.
+
+    알림은 협상된 MTU 에 들어가는 만큼 SensorData.history 의 연속 프레임을
+    이어 붙여 보낸다. history 한 행은 publish 한 번이므로, 배치의 각 프레임은
+    그 publish 가 실제로 쓴 채널만 담고 헤더의 field mask 로 표시한다
+    (드라이버별 게시에서 다른 채널 값을 매번 중복해 보내지 않도록). 그래서
+    프레임 길이가 제각각이며, 클라이언트는 decode_frames(value,
+    schema.frame_fields) 로 푼다. 구독 후 첫 알림과 ReadValue 는 모든 채널이
+    든 최신 프레임 하나다.
+    """
+    FRAME_CHARACTERISTIC_UUID = "00000006-736c-4645-b520-7127aadf8c47"
+    MAX_MTU = 517
 
     def __init__(self, service):
+        schema = service.sensor_data.schema
         super().__init__(
-            self.WEIGHT_CHARACTERISTIC_UUID,
-            ["notify", "read"],
-            service
+            self.FRAME_CHARACTERISTIC_UUID,
+            service,
+            schema.frame_format,
+            "Sensor Frame (%s)" % " + ".join(c.description for c in schema)
         )
-        self.notifying = False
-        self.add_descriptor(SensorDescriptor(self, "Estimated Weight"))
+        self.names = schema.names
+        self.field_mask = schema.field_all
+        self.fields = schema.frame_fields
+        # (bit, history 열) 채널 순서대로
+        self.field_columns = tuple((schema.bits[n], schema.columns[n]) for n in schema.names)
+        self._codecs = {self.field_mask: self.codec}   # field mask -> StructCodec
+        # 배치 인코딩용 버퍼 (최대 MTU 기준으로 한 번만 할당, 가장 작은
+        # 프레임(채널 하나)으로 채웠을 때의 개수만큼 행을 꺼내 본다)
+        history = service.sensor_data.history
+        max_size = self.MAX_MTU - self.ATT_NOTIFY_OVERHEAD
+        smallest = min(frame_size(bit, self.fields) for bit, _ in self.field_columns)
+        self.max_batch = max(1, max_size // smallest)
+        self._batch_buffer = bytearray(max(max_size, self.codec.size))
+        self._batch_view = memoryview(self._batch_buffer)
+        self._rows = array('f', bytes(4 * history.width * self.max_batch))
+        self._rows_view = memoryview(self._rows)
+        self._timestamps = array('d', bytes(8 * self.max_batch))
+        self._seqs = array('Q', bytes(8 * self.max_batch))
+        self._masks = array('B', bytes(self.max_batch))
+        self._last_sent_timestamp = None
+        self.dropped_samples = 0
+
+    def get_sensor_values(self, snapshot):
+        values = (
+            FRAME_VERSION,
+            self.field_mask,
+            snapshot.seq & 0xFFFFFFFF,
+            int(snapshot.timestamp * 1000000),
+        )
+        for name in self.names:
+            values += tuple(getattr(snapshot, name))
+        return values
 
-    def get_weight_data(self):
-        weight = self.service.sensor_data.get_weight_data()  # float 1개
-        return struct.pack("f", weight)
+    def get_frame_codec(self, mask):
+        codec = self._codecs.get(mask)
+        if codec is None:
+            codec = self._codecs[mask] = StructCodec(frame_format(mask, self.fields))
+        return codec
 
-    def set_weight_callback(self):
-        if self.notifying:
-            value = self.get_weight_data()
-            self.PropertiesChanged(
-                GATT_CHRC_IFACE,
-                {"Value": dbus.ByteArray(value)},
-                []
+    def get_batch(self):
+        """
+        마지막으로 보낸 뒤 쌓인 프레임을 MTU 에 맞게 묶어 인코딩한다.
+        새 프레임이 없으면 None. 한 번에 다 못 보내는 오래된 프레임은
+        버리고 dropped_samples 에 센다.
+        """
+        history = self.service.sensor_data.history
+        if len(history) == 0:
+            return self.get_value()
+
+        masks = self._masks
+        if self._last_sent_timestamp is None:
+            count = history.window(1, self._rows, self._timestamps, self._seqs, masks)
+            masks[0] = self.field_mask
+        else:
+            pending = history.count_since(self._last_sent_timestamp)
+            count = history.since(self._last_sent_timestamp, self._rows,
+                                  self._timestamps, self._seqs, self.max_batch, masks)
+            self.dropped_samples += max(0, pending - count)
+        if count == 0:
+            return None
+
+        # 가장 최근 프레임부터 MTU 에 들어가는 만큼 (최소 하나).
+        # 바뀐 채널이 없는 행(mask 0)은 건너뛴다.
+        max_size = self.get_max_notify_size()
+        first = count
+        size = 0
+        for i in range(count - 1, -1, -1):
+            mask = masks[i] & self.field_mask
+            if not mask:
+                continue
+            frame_bytes = self.get_frame_codec(mask).size
+            if size and size + frame_bytes > max_size:
+                self.dropped_samples += sum(1 for j in range(i + 1) if masks[j])
+                break
+            size += frame_bytes
+            first = i
+        self._last_sent_timestamp = self._timestamps[count - 1]
+        if size == 0:
+            return None
+
+        width = history.width
+        view = self._rows_view
+        offset = 0
+        for i in range(first, count):
+            mask = masks[i] & self.field_mask
+            if not mask:
+                continue
+            row = i * width
+            if mask == self.field_mask:
+                values = view[row:row + width]
+            else:
+                values = ()
+                for bit, columns in self.field_columns:
+                    if mask & bit:
+                        values += tuple(view[row + columns.start:row + columns.stop])
+            offset = self.get_frame_codec(mask).encode_into(
+                self._batch_buffer, offset,
+                FRAME_VERSION, mask,
+                self._seqs[i] & 0xFFFFFFFF,
+                int(self._timestamps[i] * 1000000),
+                *values
             )
-        return self.notifying
+        return dbus.ByteArray(self._batch_view[:offset])
 
-    def StartNotify(self):
-        if self.notifying:
+    def notify_value(self):
+        value = self.get_batch()
+        if value is None:
             return
-        self.notifying = True
-        value = self.get_weight_data()
-        self.PropertiesChanged(
-            GATT_CHRC_IFACE,
-            {"Value": dbus.ByteArray(value)},
-            []
-        )
-        self.add_timeout(NOTIFY_TIMEOUT, self.set_weight_callback)
+        self.send_notification(value)
 
     def StopNotify(self):
-        self.notifying = False
-
-    def ReadValue(self, options):
-        value = self.get_weight_data()
-        return dbus.ByteArray(value)
+        super().StopNotify()
+        self._last_sent_timestamp = None
 
 #
 # Device ID Characteristic (문자열)
@@ -199,6 +511,73 @@ class DeviceIDCharacteristic(Characteristic):
         # 문자열도 ByteArray로 전달
         return dbus.ByteArray(device_id_bytes)
 
+#
+# Control Characteristic (스트림 인코딩 협상)
+#
+class ControlCharacteristic(Characteristic):
+    """
+    클라이언트가 알림 인코딩을 고르는 Characteristic.
+    값: 인코딩을 고를 수 있는 채널마다 u8 하나, 스키마 순서대로
+        (기본 구성은 [IMU 인코딩, Laser 인코딩], utils/codec.py 의 ENCODING_*)
+    뒤쪽 바이트는 생략할 수 있다.
+    """
+    CONTROL_CHARACTERISTIC_UUID = "00000007-736c-4645-b520-7127aadf8c47"
+
+    def __init__(self, service):
+        super().__init__(
+            self.CONTROL_CHARACTERISTIC_UUID,
+            ["read", "write"],
+            service
+        )
+        self.add_descriptor(SensorDescriptor(self, "Stream Control"))
+
+    def get_targets(self):
+        return tuple(chrc for chrc in self.service.channel_characteristics.values()
+                     if len(chrc.encodings) > 1)
+
+    def ReadValue(self, options):
+        return dbus.ByteArray(bytes([chrc.encoding for chrc in self.get_targets()]))
+
+    def WriteValue(self, value, options):
+        targets = self.get_targets()
+        if not 1 <= len(value) <= len(targets):
+            raise InvalidArgsException()
+        for chrc, encoding in zip(targets, value):
+            if int(encoding) not in chrc.encodings:
+                raise InvalidArgsException()
+        for chrc, encoding in zip(targets, value):
+            chrc.set_encoding(int(encoding))
+
+#
+# Diagnostics Characteristic (계측값)
+#
+class DiagnosticsCharacteristic(Characteristic):
+    """
+    utils/metrics.py 의 계측값을 짧은 JSON 으로 읽는 Characteristic.
+    카운터는 숫자, 히스토그램은 [count, p50_us, p99_us, max_us].
+    계측이 꺼져 있으면 {"enabled":false,...} 만 온다. 512 바이트에 다
+    들어가지 않으면 항목을 통째로 빼고 "truncated":true 를 붙인다.
+    MTU 보다 길면 bluetoothd 가 offset 을 올려 가며 여러 번 읽으므로
+    offset 0 일 때만 새로 만들어서 한 번의 긴 읽기 안에서는 값이 같다.
+    """
+    DIAGNOSTICS_CHARACTERISTIC_UUID = "000000f0-736c-4645-b520-7127aadf8c47"
+    MAX_VALUE = 512   # ATT 속성 값 최대 길이
+
+    def __init__(self, service):
+        super().__init__(
+            self.DIAGNOSTICS_CHARACTERISTIC_UUID,
+            ["read"],
+            service
+        )
+        self.value = b""
+        self.add_descriptor(SensorDescriptor(self, "Diagnostics"))
+
+    def ReadValue(self, options):
+        offset = int(options.get("offset", 0))
+        if offset == 0:
+            self.value = METRICS.render_compact(self.MAX_VALUE)
+        return dbus.ByteArray(self.value[offset:])
+
 #
 # Descriptor
 #
@@ -215,6 +594,24 @@ class SensorDescriptor(Descriptor):
             value.append(dbus.Byte(c.encode()))
         return value
 
+class ScaleDescriptor(Descriptor):
+    """
+    int16 모드의 채널별 scale/offset 메타데이터 (읽기 전용).
+    값: [원소 수 (u16)] + [항목 수 k (u16)] + 항목마다 (scale f32, offset f32),
+    little-endian. 원소 i 는 항목 i % k 를 쓴다 (축마다 같은 단위면 k 는 축 수).
+    물리량 = 정수값 * scale + offset  (utils/codec.py decode_scale_descriptor)
+    정수값 -32768 은 "값 없음"(센서가 NaN 을 낸 경우)이다.
+    """
+    DESCRIPTOR_UUID = "00000100-736c-4645-b520-7127aadf8c47"
+
+    def __init__(self, characteristic, codec):
+        super().__init__(self.DESCRIPTOR_UUID, ["read"], characteristic)
+        # 바뀌지 않는 값이므로 한 번만 만든다
+        self.value = dbus.ByteArray(codec.get_descriptor_value())
+
+    def ReadValue(self, options):
+        return self.value
+
 #
 # 메인 함수
 #
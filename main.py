@@ -1,68 +1,91 @@
-import threading
-import time
-import random
+import argparse
 
-from utils.sensor_data import SensorData
-from bluetooth_server_v5 import start_ble_server
+from utils.sensor_data import SensorData, NumpySensorData
+from utils.sensor_schema import SensorSchema, DEFAULT_SCHEMA
+from utils.acquisition import AcquisitionManager, ProcessAcquisitionManager
+from utils.shared_ring import SharedSensorData
+from utils.metrics import serve_metrics
+from utils.drivers import (
+    I2CIMUDriver, SerialLaserDriver, HX711Driver, simulated_drivers, check_drivers,
+)
 
-def update_loop(sensor_data):
-    while True:
-        '''
-        # 예시 IMU 데이터 (센서4개, 각 9개 값)
-        new_imu = [
-            [1.0, 0.5, 9.8, 0.01, 0.0, -0.02, 10.0,  5.0,  -8.0],  # 센서1
-            [0.9, 0.2, 9.7, 0.02, 0.1,  0.01,  15.0, -3.2,  12.0], # 센서2
-            [ ... ],  # 센서3
-            [ ... ],  # 센서4
-        ]
-        sensor_data.set_imu_data(new_imu)
+def hardware_drivers():
+    """
+    실제 센서 드라이버 (기본 구성: IMU 4개, Laser 4개, Weight 1개).
+    --schema 와 같이 쓰면 시작할 때 check_drivers() 로 채널 이름/값 수를 맞춰 본다.
+    """
+    return [
+        # IMU 마다 I2C 버스 하나 (AK8963 주소가 고정이라)
+        I2CIMUDriver("imu", 100, buses=((1, 0x68), (3, 0x68), (4, 0x68), (5, 0x68))),
+        SerialLaserDriver("laser", 20, port="/dev/ttyS0", sensors=4),
+        HX711Driver("weight", 10, dout_pin=5, sck_pin=6),
+    ]
 
-        new_laser = [2.1, 3.2, 4.5, 5.0]
-        sensor_data.set_laser_data(new_laser)
-
-        new_weight = 73.2
-        sensor_data.set_weight_data(new_weight)
-        '''
-        # 랜덤 IMU 데이터 (센서4개, 각 9개 값: AccelX, AccelY, AccelZ, GyroX, GyroY, GyroZ, MagX, MagY, MagZ)
-        new_imu = [
-            [
-                random.uniform(-1.0, 1.0),  # AccelX
-                random.uniform(-1.0, 1.0),  # AccelY
-                random.uniform(9.5, 9.8),   # AccelZ (중력가속도 근사값)
-                random.uniform(-0.1, 0.1),  # GyroX
-                random.uniform(-0.1, 0.1),  # GyroY
-                random.uniform(-0.1, 0.1),  # GyroZ
-                random.uniform(-50.0, 50.0),  # MagX
-                random.uniform(-50.0, 50.0),  # MagY
-                random.uniform(-50.0, 50.0),  # MagZ
-            ]
-            for _ in range(4)  # 센서4개
-        ]
-        #print(new_imu)
-        sensor_data.set_imu_data(new_imu)
-
-        # 랜덤 Laser 데이터 (센서4개, 거리값 0.5~5.0m)
-        new_laser = [random.uniform(0.5, 5.0) for _ in range(4)]
-        sensor_data.set_laser_data(new_laser)
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schema", help="센서 구성 JSON 파일 (생략하면 기본 구성)")
+    parser.add_argument("--hardware", action="store_true",
+                        help="실제 센서 드라이버 사용 (생략하면 시뮬레이션)")
+    parser.add_argument("--processes", action="store_true",
+                        help="드라이버를 별도 프로세스로 실행 (공유 메모리 링)")
+    parser.add_argument("--numpy", action="store_true",
+                        help="NumPy 버퍼 SensorData 사용, 드라이버가 float32 배열에 직접 씀 (numpy 필요)")
+    parser.add_argument("--adapter",
+                        help="사용할 BLE 어댑터 (hci1, 객체 경로 또는 주소, 생략하면 첫 번째)")
+    parser.add_argument("--metrics",
+                        help="계측을 켜고 내보낼 주소 (127.0.0.1:9100 = HTTP, /경로 = Unix 소켓)")
+    parser.add_argument("--watchdog", type=int, metavar="MS", nargs="?", const=250,
+                        help="GLib 메인 루프 지연 감시, MS 넘게 멈추면 스택 출력 (기본 250)")
+    parser.add_argument("--aio", action="store_true",
+                        help="asyncio(dbus-next) GATT 백엔드 사용 (생략하면 GLib/dbus-python)")
+    args = parser.parse_args()
+    if args.numpy and args.processes:
+        parser.error("--numpy 는 --processes 와 같이 쓸 수 없습니다 (공유 메모리 링 사용)")
+    schema = SensorSchema.load(args.schema) if args.schema else DEFAULT_SCHEMA
 
-        # 랜덤 Weight 데이터 (무게 50~100kg)
-        new_weight = random.uniform(50.0, 100.0)
-        sensor_data.set_weight_data(new_weight)
+    # 드라이버마다 스레드 하나로 각자의 주기에 맞춰 읽어서 게시
+    if args.hardware:
+        drivers = hardware_drivers()
+        try:
+            check_drivers(schema, drivers)
+        except ValueError as e:
+            parser.error("--hardware 드라이버가 스키마와 맞지 않습니다: %s" % e)
+    else:
+        drivers = simulated_drivers(schema)
 
-        # 1초마다 업데이트
-        time.sleep(1.0)
+    if args.metrics:
+        serve_metrics(args.metrics)
 
-def main():
     # 공용 SensorData 객체 생성
-    sensor_data = SensorData()
+    if args.processes:
+        sensor_data = SharedSensorData(schema=schema)
+    elif args.numpy:
+        sensor_data = NumpySensorData(schema=schema)
+    else:
+        sensor_data = SensorData(schema=schema)
     sensor_data.set_device_id("NEURALOAD-0001")
-    # update_loop를 스레드로 동작시킴 (데몬 스레드로 설정도 가능)
-    updater_thread = threading.Thread(target=update_loop, args=(sensor_data,))
-    updater_thread.daemon = True
-    updater_thread.start()
+    if args.processes:
+        acquisition = ProcessAcquisitionManager(sensor_data, drivers)
+    else:
+        acquisition = AcquisitionManager(sensor_data, drivers)
+    acquisition.start()
 
     # BLE 서버 실행 (메인 스레드에서)
+    if args.aio:
+        from utils.aio_service import select_adapter
+        from bluetooth_server_aio import start_ble_server
+    else:
+        from utils.bletools import BleTools
+        from bluetooth_server_v5 import start_ble_server
+        if args.watchdog:
+            from utils.loop_monitor import LoopMonitor
+            LoopMonitor.configure(threshold_ms=args.watchdog)
+        select_adapter = BleTools.select_adapter
+    select_adapter(args.adapter)
     start_ble_server(sensor_data)
+    acquisition.stop(1.0)
+    if args.processes:
+        sensor_data.close()
 
 if __name__ == "__main__":
     main()
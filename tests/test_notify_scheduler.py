@@ -0,0 +1,44 @@
+import select
+
+import pytest
+
+pytest.importorskip("dbus")
+pytest.importorskip("gi")
+
+from utils import service
+from utils.service import NotifyScheduler
+
+
+def _readable(fd):
+    return bool(select.select([fd], [], [], 0)[0])
+
+
+@pytest.mark.parametrize("inject", ["before", "after"])
+def test_wake_during_drain_is_not_lost(monkeypatch, inject):
+    """ _on_wakeup 가 fd 를 비우는 동안 들어온 wake() 때문에 이후 깨우기가 멈추면 안 된다 """
+    sched = NotifyScheduler()
+    calls = []
+    sched.add_event(0, lambda: calls.append(1) or True)
+
+    sched.wake()
+    assert _readable(sched._wake_read_fd)
+
+    real_read = service.os.read
+
+    def racing_read(fd, n):
+        if inject == "before":
+            sched.wake()
+        data = real_read(fd, n)
+        if inject == "after":
+            sched.wake()
+        return data
+
+    monkeypatch.setattr(service.os, "read", racing_read)
+    sched._on_wakeup(sched._wake_read_fd, 0)
+    monkeypatch.setattr(service.os, "read", real_read)
+    assert calls
+
+    # 다음 wake() 는 반드시 fd 를 다시 읽을 수 있게 만들어야 한다
+    if not _readable(sched._wake_read_fd):
+        sched.wake()
+    assert _readable(sched._wake_read_fd)
@@ -0,0 +1,70 @@
+import struct
+
+import pytest
+
+from utils.codec import (
+    ATT_MAX_VALUE, IMU_AXIS_SCALES, decode_scale_descriptor, encode_scale_descriptor,
+)
+from utils.sensor_schema import Channel, SensorSchema
+
+UUID = "00000%03x-736c-4645-b520-7127aadf8c47"
+
+
+def imu(name, count, index=2, stream=False):
+    return Channel(name, (count, 9), uuid=UUID % index, description="IMU",
+                   scales=IMU_AXIS_SCALES, stream=stream)
+
+
+def test_16_imu_single_channel_rejected():
+    # (16, 9) float32 = 576 바이트 > 512
+    with pytest.raises(ValueError, match="attribute limit"):
+        imu("imu", 16)
+
+
+def test_16_imu_split_channels_need_frame_off():
+    channels = [imu("imu_a", 8, 2), imu("imu_b", 8, 3)]
+    # 통합 프레임 = 14 + 2 * 288 바이트
+    with pytest.raises(ValueError, match="combined frame"):
+        SensorSchema(channels)
+
+    schema = SensorSchema(channels, frame=False)
+    assert not schema.frame
+    assert schema.width == 144
+    assert all(c.size * 4 <= ATT_MAX_VALUE for c in schema)
+
+
+def test_16_imu_from_config():
+    config = {"frame": False, "channels": [
+        {"name": "imu_a", "shape": [8, 9], "uuid": UUID % 2, "description": "IMU A"},
+        {"name": "imu_b", "shape": [8, 9], "uuid": UUID % 3, "description": "IMU B"},
+    ]}
+    schema = SensorSchema.from_config(config)
+    assert schema.names == ("imu_a", "imu_b")
+    assert not schema.frame
+
+
+def test_8_imu_fits_with_frame():
+    schema = SensorSchema([imu("imu", 8, stream=True)])
+    assert schema.frame
+
+
+def test_16_imu_scale_descriptor_is_per_axis():
+    channel = imu("imu_a", 8, 2)
+    data = encode_scale_descriptor(channel.scales, channel.offsets)
+    # 원소 72 개, 항목은 축 9 개만
+    assert len(data) == 4 + 9 * 8
+    scales, offsets = decode_scale_descriptor(data)
+    assert len(scales) == 72
+    assert scales == tuple(struct.unpack("<72f", struct.pack("<72f", *channel.scales)))
+
+
+def test_scale_descriptor_count_does_not_wrap():
+    scales = (0.5,) * 300
+    data = encode_scale_descriptor(scales, (0.0,) * 300)
+    assert decode_scale_descriptor(data)[0] == scales
+
+
+def test_per_element_scales_over_attribute_limit_rejected():
+    scales = [0.001 * (i + 1) for i in range(64)]
+    with pytest.raises(ValueError, match="scale descriptor"):
+        Channel("load", (64,), uuid=UUID % 8, description="Load", dtype="h", scales=scales)
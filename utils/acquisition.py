@@ -0,0 +1,166 @@
+# acquisition.py
+import multiprocessing
+import threading
+
+from utils.rate_clock import RateClock
+from utils.shared_ring import SharedSensorData
+
+
+class AcquisitionManager:
+    """
+    드라이버(utils/drivers.py)마다 스레드 하나를 띄워 각자의 주기로 읽고
+    SensorData 에 게시한다.
+
+    - 드라이버끼리는 독립적이라 느린 센서(HX711 변환 대기, 시리얼 타임아웃
+      등)가 빠른 센서(IMU)의 주기를 늦추지 않는다. 공유하는 것은
+      SensorData.publish() 안의 짧은 쓰기 락뿐이다.
+    - 읽기 시각은 드라이버별 RateClock(utils/rate_clock.py)의 절대 마감으로
+      잡는다. 작업 시간만큼 주기가 늘어나는 sleep(주기) 방식과 달리 누적
+      지연(drift)이 없고, 밀린 주기는 policy(기본 SKIP)대로 처리한다.
+      주기 통계(jitter, overrun)는 get_stats() 로 볼 수 있다.
+    - 샘플 시각은 드라이버가 붙인 time.monotonic() 값을 그대로 게시한다.
+    - read() 예외는 드라이버의 errors 로 세고, ERROR_BACKOFF 초 쉰 뒤 계속한다.
+    - sensor_data 가 NumpySensorData 면 드라이버는 read_into() 로 자기 채널
+      float32 배열(한 번만 할당)에 직접 쓰고, 게시는 begin_frame() 으로 받은
+      버퍼에 배열 복사 한 번 + commit_frame() 이다. 튜플 변환이나 원소별
+      파이썬 반복이 없다. 센서 I/O 는 쓰기 락 밖에서 한다 (begin_frame() 부터
+      commit_frame() 까지는 다른 생산자가 기다리므로).
+
+    스레드는 I2C/시리얼/sleep 대기 중에 GIL 을 놓으므로 라즈베리파이의
+    센서 주기(수십~수백 Hz)에는 충분하다.
+    """
+    ERROR_BACKOFF = 1.0
+
+    def __init__(self, sensor_data, drivers=(), policy=RateClock.SKIP):
+        self.sensor_data = sensor_data
+        self.policy = policy
+        self.clocks = {}   # driver.name -> RateClock
+        self.drivers = []
+        self._threads = []
+        self._stop = threading.Event()
+        for driver in drivers:
+            self.add_driver(driver)
+
+    def add_driver(self, driver):
+        if driver.channel not in self.sensor_data.schema:
+            raise ValueError("unknown channel: %r" % driver.channel)
+        self.drivers.append(driver)
+        if self._threads:
+            self._start_driver(driver)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for driver in self.drivers:
+            self._start_driver(driver)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _start_driver(self, driver):
+        thread = threading.Thread(target=self._run, args=(driver,), name=driver.name)
+        thread.daemon = True
+        self._threads.append(thread)
+        thread.start()
+
+    def _run(self, driver):
+        try:
+            driver.open()
+        except Exception as e:
+            driver.errors += 1
+            print("%s: open failed: %s" % (driver.name, e))
+            return
+        clock = RateClock.from_rate(driver.rate, policy=self.policy)
+        self.clocks[driver.name] = clock
+        publish = self.sensor_data.publish
+        channel = driver.channel
+        # NumpySensorData: 드라이버가 직접 쓰는 채널 배열
+        out = None
+        if hasattr(self.sensor_data, "begin_frame"):
+            out = self.sensor_data.channel_buffer(channel)
+            bit = self.sensor_data.schema.bits[channel]
+        try:
+            while clock.wait(self._stop):
+                try:
+                    if out is None:
+                        timestamp, values = driver.sample()
+                    else:
+                        timestamp = driver.sample_into(out)
+                        values = None if timestamp is None else out
+                except Exception as e:
+                    driver.errors += 1
+                    print("%s: read failed: %s" % (driver.name, e))
+                    if self._stop.wait(self.ERROR_BACKOFF):
+                        break
+                    clock.reset()
+                    continue
+                if values is None:
+                    continue
+                try:
+                    if out is None:
+                        publish(timestamp, **{channel: values})
+                    else:
+                        self._publish_in_place(channel, bit, timestamp, out)
+                except Exception as e:
+                    # 값 검증이나 publish hook 의 예외로 수집 스레드가 끝나지 않게
+                    driver.errors += 1
+                    print("%s: publish failed: %s" % (driver.name, e))
+                    continue
+                driver.samples += 1
+        finally:
+            driver.close()
+
+    def _publish_in_place(self, channel, bit, timestamp, values):
+        sensor_data = self.sensor_data
+        buffers = sensor_data.begin_frame()
+        try:
+            getattr(buffers, channel)[...] = values
+        except Exception:
+            sensor_data.abort_frame()
+            raise
+        sensor_data.commit_frame(timestamp, bit)
+
+    def get_stats(self):
+        stats = {}
+        for driver in self.drivers:
+            stats[driver.name] = driver.get_stats()
+            clock = self.clocks.get(driver.name)
+            if clock is not None:
+                stats[driver.name]["clock"] = clock.get_stats()
+        return stats
+
+
+class ProcessAcquisitionManager(AcquisitionManager):
+    """
+    드라이버마다 스레드 대신 프로세스 하나를 띄우는 AcquisitionManager.
+    sensor_data 는 공유 메모리 링을 쓰는 SharedSensorData 여야 한다
+    (utils/shared_ring.py). 프로세스는 fork 로 만들며, 드라이버 open() 과
+    읽기 루프는 자식 프로세스에서 돈다.
+
+    드라이버의 samples/errors 와 RateClock 통계는 자식 프로세스에 있으므로
+    get_stats() 는 프로세스 상태(pid, alive, exitcode)만 돌려준다.
+    """
+
+    def __init__(self, sensor_data, drivers=(), policy=RateClock.SKIP):
+        if not isinstance(sensor_data, SharedSensorData):
+            raise TypeError("ProcessAcquisitionManager requires SharedSensorData")
+        self._ctx = multiprocessing.get_context("fork")
+        super().__init__(sensor_data, drivers, policy)
+        self._stop = self._ctx.Event()
+
+    def _start_driver(self, driver):
+        process = self._ctx.Process(target=self._run, args=(driver,), name=driver.name)
+        process.daemon = True
+        self._threads.append(process)
+        process.start()
+
+    def get_stats(self):
+        stats = {}
+        for driver, process in zip(self.drivers, self._threads):
+            stats[driver.name] = {"pid": process.pid, "alive": process.is_alive(),
+                                  "exitcode": process.exitcode}
+        return stats
@@ -0,0 +1,660 @@
+# aio_service.py
+import asyncio
+import inspect
+import socket
+import time
+
+from dbus_next import BusType, Message, MessageType, Variant
+from dbus_next.aio import MessageBus
+from dbus_next.errors import DBusError
+from dbus_next.service import ServiceInterface, method, dbus_property, PropertyAccess
+
+from utils.rate_clock import RateClock
+
+BLUEZ_SERVICE_NAME = "org.bluez"
+ADAPTER_IFACE = "org.bluez.Adapter1"
+GATT_MANAGER_IFACE = "org.bluez.GattManager1"
+LE_ADVERTISING_MANAGER_IFACE = "org.bluez.LEAdvertisingManager1"
+LE_ADVERTISEMENT_IFACE = "org.bluez.LEAdvertisement1"
+DBUS_OM_IFACE = "org.freedesktop.DBus.ObjectManager"
+GATT_SERVICE_IFACE = "org.bluez.GattService1"
+GATT_CHRC_IFACE = "org.bluez.GattCharacteristic1"
+GATT_DESC_IFACE = "org.bluez.GattDescriptor1"
+
+#
+# asyncio(dbus-next) 기반 GATT 서버 백엔드.
+#
+# utils/service.py (dbus-python + GLib) 와 같은 Application / Service /
+# Characteristic / Descriptor API 를 제공한다. 차이점:
+#   - D-Bus 연결과 등록은 코루틴이다: await app.register(), await app.run()
+#   - send_notification() 은 코루틴이다. AcquireNotify 소켓이 가득 차 있으면
+#     값을 버리지 않고 보낼 수 있을 때까지 기다린다.
+#   - ReadValue/WriteValue/StartNotify/StopNotify 는 일반 함수나 코루틴
+#     어느 쪽으로 오버라이드해도 된다.
+#   - add_timeout() 의 주기 작업은 같은 이벤트 루프의 태스크다 (RateClock).
+# 센서 드라이버, 로컬 웹 엔드포인트 등 다른 asyncio I/O 와 스레드 없이
+# 한 루프에서 함께 돌릴 수 있다.
+#
+
+
+class InvalidArgsException(DBusError):
+    def __init__(self, text="Invalid arguments"):
+        super().__init__("org.freedesktop.DBus.Error.InvalidArgs", text)
+
+
+class NotSupportedException(DBusError):
+    def __init__(self, text="Not supported"):
+        super().__init__("org.bluez.Error.NotSupported", text)
+
+
+class NotPermittedException(DBusError):
+    def __init__(self, text="Not permitted"):
+        super().__init__("org.bluez.Error.NotPermitted", text)
+
+
+def _unwrap(options):
+    """ a{sv} 인자의 Variant 를 벗겨 dbus-python 쪽과 같은 dict 로 """
+    return {key: value.value if isinstance(value, Variant) else value
+            for key, value in options.items()}
+
+
+async def _maybe_await(result):
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+_selected_adapter = None
+
+
+def select_adapter(name):
+    """ find_adapter() 가 고를 어댑터 지정 (BleTools.select_adapter 와 같음) """
+    global _selected_adapter
+    _selected_adapter = name
+
+
+async def find_adapter(bus, name=None):
+    """
+    LEAdvertisingManager1 을 가진 어댑터 경로 (BleTools.find_adapter 와 같음).
+    name 은 "hci1", 객체 경로 또는 주소. 없으면 첫 번째 어댑터.
+    """
+    if name is None:
+        name = _selected_adapter
+    reply = await bus.call(Message(
+        destination=BLUEZ_SERVICE_NAME, path="/", interface=DBUS_OM_IFACE,
+        member="GetManagedObjects"))
+    if reply.message_type == MessageType.ERROR:
+        raise DBusError._from_message(reply)
+    for path, interfaces in reply.body[0].items():
+        if LE_ADVERTISING_MANAGER_IFACE not in interfaces:
+            continue
+        if name is None:
+            return path
+        address = interfaces.get(ADAPTER_IFACE, {}).get("Address")
+        address = address.value if address is not None else ""
+        if name in (path, path.rsplit("/", 1)[-1]) or name.upper() == address.upper():
+            return path
+    return None
+
+
+async def _call(bus, path, interface, member, signature, body):
+    reply = await bus.call(Message(
+        destination=BLUEZ_SERVICE_NAME, path=path, interface=interface,
+        member=member, signature=signature, body=body))
+    if reply.message_type == MessageType.ERROR:
+        raise DBusError._from_message(reply)
+    return reply
+
+
+#
+# D-Bus 인터페이스 (dbus-next). 실제 동작은 owner 객체에 위임한다.
+#
+class _GattService1(ServiceInterface):
+    def __init__(self, owner):
+        super().__init__(GATT_SERVICE_IFACE)
+        self.owner = owner
+
+    @dbus_property(access=PropertyAccess.READ)
+    def UUID(self) -> "s":
+        return self.owner.uuid
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Primary(self) -> "b":
+        return self.owner.primary
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Characteristics(self) -> "ao":
+        return self.owner.get_characteristic_paths()
+
+
+class _GattCharacteristic1(ServiceInterface):
+    def __init__(self, owner):
+        super().__init__(GATT_CHRC_IFACE)
+        self.owner = owner
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Service(self) -> "o":
+        return self.owner.service.get_path()
+
+    @dbus_property(access=PropertyAccess.READ)
+    def UUID(self) -> "s":
+        return self.owner.uuid
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Flags(self) -> "as":
+        return self.owner.flags
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Descriptors(self) -> "ao":
+        return self.owner.get_descriptor_paths()
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Value(self) -> "ay":
+        # 마지막으로 PropertiesChanged 로 보낸 값
+        return self.owner.value
+
+    @method()
+    async def ReadValue(self, options: "a{sv}") -> "ay":
+        return bytes(await _maybe_await(self.owner.ReadValue(_unwrap(options))))
+
+    @method()
+    async def WriteValue(self, value: "ay", options: "a{sv}"):
+        await _maybe_await(self.owner.WriteValue(value, _unwrap(options)))
+
+    @method()
+    async def StartNotify(self):
+        await _maybe_await(self.owner.StartNotify())
+
+    @method()
+    async def StopNotify(self):
+        await _maybe_await(self.owner.StopNotify())
+
+
+class _NotifyAcquiredMixin:
+    @dbus_property(access=PropertyAccess.READ)
+    def NotifyAcquired(self) -> "b":
+        return self.owner.notify_sock is not None
+
+    @method()
+    def AcquireNotify(self, options: "a{sv}") -> "hq":
+        return self.owner.AcquireNotify(_unwrap(options))
+
+
+class _WriteAcquiredMixin:
+    @dbus_property(access=PropertyAccess.READ)
+    def WriteAcquired(self) -> "b":
+        return self.owner.write_sock is not None
+
+    @method()
+    def AcquireWrite(self, options: "a{sv}") -> "hq":
+        return self.owner.AcquireWrite(_unwrap(options))
+
+
+# (ACQUIRE_NOTIFY, ACQUIRE_WRITE) -> 인터페이스 클래스
+# dbus-next 의 속성/메서드 목록은 클래스 단위라서 조합마다 클래스를 만든다.
+_CHRC_INTERFACES = {}
+
+
+def _characteristic_interface(acquire_notify, acquire_write):
+    key = (acquire_notify, acquire_write)
+    cls = _CHRC_INTERFACES.get(key)
+    if cls is None:
+        bases = ()
+        if acquire_notify:
+            bases += (_NotifyAcquiredMixin,)
+        if acquire_write:
+            bases += (_WriteAcquiredMixin,)
+        cls = type("_GattCharacteristic1", bases + (_GattCharacteristic1,), {})
+        _CHRC_INTERFACES[key] = cls
+    return cls
+
+
+class _GattDescriptor1(ServiceInterface):
+    def __init__(self, owner):
+        super().__init__(GATT_DESC_IFACE)
+        self.owner = owner
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Characteristic(self) -> "o":
+        return self.owner.chrc.get_path()
+
+    @dbus_property(access=PropertyAccess.READ)
+    def UUID(self) -> "s":
+        return self.owner.uuid
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Flags(self) -> "as":
+        return self.owner.flags
+
+    @method()
+    async def ReadValue(self, options: "a{sv}") -> "ay":
+        return bytes(await _maybe_await(self.owner.ReadValue(_unwrap(options))))
+
+    @method()
+    async def WriteValue(self, value: "ay", options: "a{sv}"):
+        await _maybe_await(self.owner.WriteValue(value, _unwrap(options)))
+
+
+class _LEAdvertisement1(ServiceInterface):
+    def __init__(self, owner):
+        super().__init__(LE_ADVERTISEMENT_IFACE)
+        self.owner = owner
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Type(self) -> "s":
+        return self.owner.ad_type
+
+    @dbus_property(access=PropertyAccess.READ)
+    def LocalName(self) -> "s":
+        return self.owner.local_name or ""
+
+    @dbus_property(access=PropertyAccess.READ)
+    def ServiceUUIDs(self) -> "as":
+        return self.owner.service_uuids or []
+
+    @dbus_property(access=PropertyAccess.READ)
+    def IncludeTxPower(self) -> "b":
+        return bool(self.owner.include_tx_power)
+
+    @method()
+    def Release(self):
+        print("%s: Released!" % self.owner.path)
+
+
+#
+# 공개 API (utils/service.py 와 같은 이름)
+#
+class Application:
+    def __init__(self, bus=None):
+        self.bus = bus
+        self.path = "/"
+        self.services = []
+        self.next_index = 0
+        self._quit = None
+
+    def get_path(self):
+        return self.path
+
+    def add_service(self, service):
+        self.services.append(service)
+
+    async def connect(self):
+        """ 시스템 버스에 연결 (AcquireNotify 의 fd 전달을 위해 unix fd 협상) """
+        if self.bus is None:
+            self.bus = await MessageBus(bus_type=BusType.SYSTEM,
+                                        negotiate_unix_fd=True).connect()
+        return self.bus
+
+    def export(self):
+        """ 서비스/Characteristic/Descriptor 를 버스에 내보낸다 """
+        for service in self.services:
+            service.export(self.bus)
+
+    async def register(self):
+        await self.connect()
+        self.export()
+        adapter = await find_adapter(self.bus)
+        try:
+            await _call(self.bus, adapter, GATT_MANAGER_IFACE, "RegisterApplication",
+                        "oa{sv}", [self.path, {}])
+        except DBusError as error:
+            print("Failed to register application: " + str(error))
+            raise
+        print("GATT application registered")
+
+    async def run(self):
+        """ quit() 가 불리거나 버스 연결이 끊길 때까지 기다린다 """
+        self._quit = asyncio.Event()
+        quit_task = asyncio.ensure_future(self._quit.wait())
+        disconnect_task = asyncio.ensure_future(self.bus.wait_for_disconnect())
+        await asyncio.wait((quit_task, disconnect_task),
+                           return_when=asyncio.FIRST_COMPLETED)
+        quit_task.cancel()
+        disconnect_task.cancel()
+
+    def quit(self):
+        print("\nGATT application terminated")
+        if self._quit is not None:
+            self._quit.set()
+        if self.bus is not None:
+            self.bus.disconnect()
+
+
+class Service:
+    PATH_BASE = "/org/bluez/example/service"
+
+    def __init__(self, index, uuid, primary):
+        self.bus = None
+        self.path = self.PATH_BASE + str(index)
+        self.uuid = uuid
+        self.primary = primary
+        self.characteristics = []
+        self.next_index = 0
+        self.interface = _GattService1(self)
+
+    def export(self, bus):
+        self.bus = bus
+        bus.export(self.path, self.interface)
+        for chrc in self.characteristics:
+            chrc.export(bus)
+
+    def get_properties(self):
+        return {
+                GATT_SERVICE_IFACE: {
+                        'UUID': self.uuid,
+                        'Primary': self.primary,
+                        'Characteristics': self.get_characteristic_paths(),
+                }
+        }
+
+    def get_path(self):
+        return self.path
+
+    def add_characteristic(self, characteristic):
+        self.characteristics.append(characteristic)
+
+    def get_characteristic_paths(self):
+        return [chrc.get_path() for chrc in self.characteristics]
+
+    def get_characteristics(self):
+        return self.characteristics
+
+    def get_bus(self):
+        return self.bus
+
+    def get_next_index(self):
+        idx = self.next_index
+        self.next_index += 1
+
+        return idx
+
+
+class Characteristic:
+    """
+    org.bluez.GattCharacteristic1 (asyncio 버전).
+    상수와 메서드 이름은 utils/service.py 의 Characteristic 과 같다.
+    """
+    DEFAULT_MTU = 23
+    ATT_NOTIFY_OVERHEAD = 3
+
+    ACQUIRE_NOTIFY = False
+    ACQUIRE_WRITE = False
+
+    # bluetoothd 가 fd 를 받아 간 뒤 우리 쪽 사본을 닫기까지의 여유 (초)
+    FD_CLOSE_DELAY = 1.0
+
+    def __init__(self, uuid, flags, service):
+        index = service.get_next_index()
+        self.path = service.path + '/char' + str(index)
+        self.bus = None
+        self.uuid = uuid
+        self.service = service
+        self.flags = flags
+        self.descriptors = []
+        self.next_index = 0
+        self.mtu = None
+        self.notify_sock = None
+        self.write_sock = None
+        self.value = b""
+        self.interface = _characteristic_interface(
+            self.ACQUIRE_NOTIFY, self.ACQUIRE_WRITE)(self)
+
+    def export(self, bus):
+        self.bus = bus
+        bus.export(self.path, self.interface)
+        for desc in self.descriptors:
+            desc.export(bus)
+
+    def get_properties(self):
+        properties = {
+                'Service': self.service.get_path(),
+                'UUID': self.uuid,
+                'Flags': self.flags,
+                'Descriptors': self.get_descriptor_paths(),
+        }
+        if self.ACQUIRE_NOTIFY:
+            properties['NotifyAcquired'] = self.notify_sock is not None
+        if self.ACQUIRE_WRITE:
+            properties['WriteAcquired'] = self.write_sock is not None
+
+        return {GATT_CHRC_IFACE: properties}
+
+    def get_path(self):
+        return self.path
+
+    def add_descriptor(self, descriptor):
+        self.descriptors.append(descriptor)
+
+    def get_descriptor_paths(self):
+        return [desc.get_path() for desc in self.descriptors]
+
+    def get_descriptors(self):
+        return self.descriptors
+
+    def ReadValue(self, options):
+        print('Default ReadValue called, returning error')
+        raise NotSupportedException()
+
+    def WriteValue(self, value, options):
+        print('Default WriteValue called, returning error')
+        raise NotSupportedException()
+
+    def StartNotify(self):
+        print('Default StartNotify called, returning error')
+        raise NotSupportedException()
+
+    def StopNotify(self):
+        print('Default StopNotify called, returning error')
+        raise NotSupportedException()
+
+    def AcquireNotify(self, options):
+        """ utils/service.py 의 AcquireNotify 와 같다. 소켓 감시는 이벤트 루프로 """
+        if not self.ACQUIRE_NOTIFY:
+            raise NotSupportedException()
+        if self.notify_sock is not None:
+            raise NotPermittedException()
+
+        self.update_mtu(options)
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        ours.setblocking(False)
+        self.notify_sock = ours
+        # 알림 소켓으로는 아무것도 오지 않으므로 읽기 가능 = 상대가 닫음
+        asyncio.get_event_loop().add_reader(ours.fileno(), self.release_notify)
+        self._close_later(theirs)
+
+        result = self.on_notify_acquired()
+        if inspect.isawaitable(result):
+            asyncio.ensure_future(result)
+        return [theirs.fileno(), self.get_mtu()]
+
+    def AcquireWrite(self, options):
+        if not self.ACQUIRE_WRITE:
+            raise NotSupportedException()
+        if self.write_sock is not None:
+            raise NotPermittedException()
+
+        self.update_mtu(options)
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        ours.setblocking(False)
+        self.write_sock = ours
+        asyncio.get_event_loop().add_reader(ours.fileno(), self._write_sock_ready)
+        self._close_later(theirs)
+
+        return [theirs.fileno(), self.get_mtu()]
+
+    def _close_later(self, sock):
+        # 응답(SCM_RIGHTS 로 fd 전달)은 이벤트 루프가 나중에 보내므로,
+        # 응답이 실제로 나간 뒤에 우리 쪽 사본을 닫는다
+        asyncio.get_event_loop().call_later(self.FD_CLOSE_DELAY, sock.close)
+
+    async def send_notification(self, value):
+        """
+        값을 알림으로 보낸다. AcquireNotify 소켓이 있으면 소켓에 쓰고
+        (버퍼가 가득 차 있으면 빌 때까지 기다림), 없으면 PropertiesChanged
+        시그널을 보낸다. 보냈으면 True.
+        """
+        value = bytes(value)
+        sock = self.notify_sock
+        if sock is not None:
+            try:
+                await asyncio.get_event_loop().sock_sendall(sock, value)
+                return True
+            except OSError:
+                self.release_notify()
+                return False
+
+        self.value = value
+        self.interface.emit_properties_changed({"Value": value})
+        return True
+
+    def on_notify_acquired(self):
+        """ AcquireNotify 로 구독이 시작됨. 기본은 StartNotify 와 같다. """
+        return self.StartNotify()
+
+    def on_notify_released(self):
+        """ AcquireNotify 소켓이 닫힘. 기본은 StopNotify 와 같다. """
+        return self.StopNotify()
+
+    def release_notify(self):
+        if self.notify_sock is None:
+            return
+        asyncio.get_event_loop().remove_reader(self.notify_sock.fileno())
+        self.notify_sock.close()
+        self.notify_sock = None
+        result = self.on_notify_released()
+        if inspect.isawaitable(result):
+            asyncio.ensure_future(result)
+
+    def release_write(self):
+        if self.write_sock is None:
+            return
+        asyncio.get_event_loop().remove_reader(self.write_sock.fileno())
+        self.write_sock.close()
+        self.write_sock = None
+
+    def _write_sock_ready(self):
+        try:
+            data = self.write_sock.recv(self.get_mtu())
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            # bluetoothd 가 소켓을 닫음
+            self.release_write()
+            return
+        result = self.WriteValue(data, {})
+        if inspect.isawaitable(result):
+            asyncio.ensure_future(result)
+
+    def get_bus(self):
+        return self.bus
+
+    def get_next_index(self):
+        idx = self.next_index
+        self.next_index += 1
+
+        return idx
+
+    def add_timeout(self, timeout, callback):
+        """
+        timeout(ms) 주기로 callback 을 부른다 (일반 함수나 코루틴 함수).
+        False 를 돌려주면 멈춘다. 해제용 handle(Task)을 돌려준다.
+        """
+        return asyncio.ensure_future(_run_periodic(timeout / 1000.0, callback))
+
+    def remove_timeout(self, handle):
+        handle.cancel()
+
+    def update_mtu(self, options):
+        mtu = options.get("mtu")
+        if mtu:
+            self.mtu = int(mtu)
+
+    def get_mtu(self):
+        return self.mtu or self.DEFAULT_MTU
+
+    def get_max_notify_size(self):
+        """ 알림 하나에 실을 수 있는 최대 바이트 수 """
+        return self.get_mtu() - self.ATT_NOTIFY_OVERHEAD
+
+
+async def _run_periodic(period, callback):
+    clock = RateClock(period, start=time.monotonic() + period)
+    while True:
+        await asyncio.sleep(clock.delay())
+        clock.tick()
+        if not await _maybe_await(callback()):
+            break
+
+
+class Descriptor:
+    def __init__(self, uuid, flags, characteristic):
+        index = characteristic.get_next_index()
+        self.path = characteristic.path + '/desc' + str(index)
+        self.uuid = uuid
+        self.flags = flags
+        self.chrc = characteristic
+        self.bus = None
+        self.interface = _GattDescriptor1(self)
+
+    def export(self, bus):
+        self.bus = bus
+        bus.export(self.path, self.interface)
+
+    def get_properties(self):
+        return {
+                GATT_DESC_IFACE: {
+                        'Characteristic': self.chrc.get_path(),
+                        'UUID': self.uuid,
+                        'Flags': self.flags,
+                }
+        }
+
+    def get_path(self):
+        return self.path
+
+    def ReadValue(self, options):
+        print('Default ReadValue called, returning error')
+        raise NotSupportedException()
+
+    def WriteValue(self, value, options):
+        print('Default WriteValue called, returning error')
+        raise NotSupportedException()
+
+
+class Advertisement:
+    """ utils/advertisement.py 의 Advertisement (asyncio 버전, 주요 항목만) """
+    PATH_BASE = "/org/bluez/example/advertisement"
+
+    def __init__(self, index, advertising_type):
+        self.path = self.PATH_BASE + str(index)
+        self.bus = None
+        self.ad_type = advertising_type
+        self.local_name = None
+        self.service_uuids = None
+        self.include_tx_power = None
+        self.interface = _LEAdvertisement1(self)
+
+    def get_path(self):
+        return self.path
+
+    def add_service_uuid(self, uuid):
+        if not self.service_uuids:
+            self.service_uuids = []
+        self.service_uuids.append(uuid)
+
+    def add_local_name(self, name):
+        self.local_name = name
+
+    async def register(self, bus):
+        self.bus = bus
+        bus.export(self.path, self.interface)
+        adapter = await find_adapter(bus)
+        try:
+            await _call(bus, adapter, LE_ADVERTISING_MANAGER_IFACE,
+                        "RegisterAdvertisement", "oa{sv}", [self.path, {}])
+        except DBusError:
+            print("Failed to register GATT advertisement")
+            raise
+        print("GATT advertisement registered")
@@ -26,32 +26,112 @@ except ImportError:
     import gobject as GObject
 
 BLUEZ_SERVICE_NAME = "org.bluez"
+ADAPTER_IFACE = "org.bluez.Adapter1"
 LE_ADVERTISING_MANAGER_IFACE = "org.bluez.LEAdvertisingManager1"
 DBUS_OM_IFACE = "org.freedesktop.DBus.ObjectManager"
+DBUS_PROP_IFACE = "org.freedesktop.DBus.Properties"
 
 class BleTools(object):
+    """
+    시스템 버스 연결과 어댑터 목록을 프로세스 안에서 공유한다.
+
+    Application/Service/Advertisement 가 각자 get_bus()/find_adapter() 를
+    부르더라도 버스 연결은 하나, bluetoothd 에 대한 GetManagedObjects 는
+    처음 한 번만 한다. 어댑터가 빠지거나 붙으면(InterfacesRemoved/Added)
+    또는 bluetoothd 가 재시작되면(NameOwnerChanged) 목록을 버리고 다음
+    find_adapter() 때 다시 조회한다. 시그널은 GLib 메인 루프가 돌아야
+    받으므로 DBusGMainLoop 를 먼저 설정해야 한다 (Application 생성자).
+
+    어댑터가 여러 개면 select_adapter() 로 고른다 ("hci1", 객체 경로,
+    또는 "AA:BB:CC:DD:EE:FF" 주소). 고르지 않으면 첫 번째 어댑터.
+    """
+    _bus = None
+    _adapters = None      # 광고 가능한 어댑터 {경로: 인터페이스별 속성}, None 이면 미조회
+    _selected = None
+
     @classmethod
     def get_bus(self):
-         bus = dbus.SystemBus()
+        if self._bus is None:
+            self._bus = dbus.SystemBus()
+            self._watch_bluez(self._bus)
+
+        return self._bus
+
+    @classmethod
+    def _watch_bluez(self, bus):
+        bus.add_signal_receiver(self._on_interfaces_changed,
+                                dbus_interface=DBUS_OM_IFACE,
+                                signal_name="InterfacesRemoved",
+                                bus_name=BLUEZ_SERVICE_NAME)
+        bus.add_signal_receiver(self._on_interfaces_changed,
+                                dbus_interface=DBUS_OM_IFACE,
+                                signal_name="InterfacesAdded",
+                                bus_name=BLUEZ_SERVICE_NAME)
+        bus.add_signal_receiver(self._on_bluez_restarted,
+                                dbus_interface="org.freedesktop.DBus",
+                                signal_name="NameOwnerChanged",
+                                arg0=BLUEZ_SERVICE_NAME)
+
+    @classmethod
+    def _on_interfaces_changed(self, path, interfaces):
+        # InterfacesAdded 는 {인터페이스: 속성}, InterfacesRemoved 는 [인터페이스]
+        if ADAPTER_IFACE in interfaces or LE_ADVERTISING_MANAGER_IFACE in interfaces:
+            self.invalidate()
+
+    @classmethod
+    def _on_bluez_restarted(self, name, old_owner, new_owner):
+        self.invalidate()
 
-         return bus
+    @classmethod
+    def invalidate(self):
+        """ 어댑터 목록 캐시를 버린다 """
+        self._adapters = None
 
     @classmethod
-    def find_adapter(self, bus):
-        remote_om = dbus.Interface(bus.get_object(BLUEZ_SERVICE_NAME, "/"),
-                               DBUS_OM_IFACE)
-        objects = remote_om.GetManagedObjects()
+    def get_adapters(self, bus=None):
+        """ 광고 가능한 어댑터 {경로: 인터페이스별 속성} (캐시) """
+        if self._adapters is None:
+            if bus is None:
+                bus = self.get_bus()
+            remote_om = dbus.Interface(bus.get_object(BLUEZ_SERVICE_NAME, "/"),
+                                   DBUS_OM_IFACE)
+            objects = remote_om.GetManagedObjects()
+
+            adapters = {}
+            for o, props in objects.items():
+                if LE_ADVERTISING_MANAGER_IFACE in props:
+                    adapters[o] = props
+            self._adapters = adapters
 
-        for o, props in objects.items():
-            if LE_ADVERTISING_MANAGER_IFACE in props:
+        return self._adapters
+
+    @classmethod
+    def select_adapter(self, name):
+        """ find_adapter() 가 고를 어댑터 지정 (None 이면 첫 번째) """
+        self._selected = name
+
+    @classmethod
+    def find_adapter(self, bus=None, name=None):
+        if name is None:
+            name = self._selected
+        adapters = self.get_adapters(bus)
+
+        for o, props in adapters.items():
+            if name is None:
+                return o
+            address = props.get(ADAPTER_IFACE, {}).get("Address", "")
+            if name in (o, o.rsplit("/", 1)[-1]) or name.upper() == str(address).upper():
                 return o
 
         return None
 
     @classmethod
-    def power_adapter(self):
-        adapter = self.get_adapter()
+    def power_adapter(self, bus=None, adapter=None):
+        if bus is None:
+            bus = self.get_bus()
+        if adapter is None:
+            adapter = self.find_adapter(bus)
 
         adapter_props = dbus.Interface(bus.get_object(BLUEZ_SERVICE_NAME, adapter),
-                "org.freedesktop.DBus.Properties");
-        adapter_props.Set("org.bluez.Adapter1", "Powered", dbus.Boolean(1))
+                DBUS_PROP_IFACE)
+        adapter_props.Set(ADAPTER_IFACE, "Powered", dbus.Boolean(1))
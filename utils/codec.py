@@ -0,0 +1,429 @@
+# codec.py
+import math
+import struct
+
+# Characteristic 별 바이너리 레이아웃.
+# 라즈베리파이는 little-endian 이고 float 만 이어 붙이므로 패딩이 없어,
+# 기존 struct.pack("36f", ...) 과 바이트 단위로 동일하다.
+IMU_FORMAT = "<36f"     # 4 센서 x 9 값 (aX,aY,aZ,gX,gY,gZ,mX,mY,mZ)
+LASER_FORMAT = "<4f"    # 4 센서 거리값
+WEIGHT_FORMAT = "<f"    # 추정 무게
+
+# 통합 프레임(IMU + Laser + Weight) 레이아웃, 버전 1
+#   헤더: version(u8), field mask(u8), seq(u32), timestamp_us(u64) = 14 bytes
+#   본문: mask 에 켜진 항목을 필드 순서대로 이어 붙임
+# 필드 목록은 (mask bit, 이름, struct 포맷, shape) 이며 SensorSchema.frame_fields
+# 로 바꿀 수 있다. 아래는 기본 구성(IMU, Laser, Weight)이다.
+FRAME_VERSION = 1
+FRAME_HEADER_FORMAT = "<BBIQ"
+FRAME_MAX_FIELDS = 8    # field mask 가 u8
+FIELD_IMU = 0x01
+FIELD_LASER = 0x02
+FIELD_WEIGHT = 0x04
+FIELD_ALL = FIELD_IMU | FIELD_LASER | FIELD_WEIGHT
+DEFAULT_FRAME_FIELDS = (
+    (FIELD_IMU, "imu", IMU_FORMAT, (4, 9)),
+    (FIELD_LASER, "laser", LASER_FORMAT, (4,)),
+    (FIELD_WEIGHT, "weight", WEIGHT_FORMAT, (1,)),
+)
+
+
+def frame_format(mask=FIELD_ALL, fields=DEFAULT_FRAME_FIELDS):
+    """ field mask 에 해당하는 통합 프레임 struct 포맷 """
+    fmt = FRAME_HEADER_FORMAT
+    for bit, _, field_fmt, _ in fields:
+        if mask & bit:
+            fmt += field_fmt[1:]
+    return fmt
+
+
+def frame_size(mask=FIELD_ALL, fields=DEFAULT_FRAME_FIELDS):
+    """ field mask 에 해당하는 통합 프레임 바이트 수 """
+    return struct.calcsize(frame_format(mask, fields))
+
+
+FRAME_FORMAT = frame_format(FIELD_ALL)
+
+# ATT 속성 값 하나의 최대 길이. ReadValue 값도, 알림 하나의 값도 이보다 길 수 없다
+ATT_MAX_VALUE = 512
+
+# 알림 인코딩 모드 (ControlCharacteristic 로 선택)
+ENCODING_FLOAT32 = 0        # 기존 float32 배열
+ENCODING_DELTA_VARINT = 1   # 고정소수점 + 이전 샘플 대비 delta + zigzag varint
+ENCODING_INT16 = 2          # 채널별 scale/offset 을 적용한 int16 배열
+IMU_ENCODINGS = (ENCODING_FLOAT32, ENCODING_DELTA_VARINT, ENCODING_INT16)
+LASER_ENCODINGS = (ENCODING_FLOAT32, ENCODING_INT16)
+
+# 채널별 고정소수점 단위. 물리량 = 정수값 * scale + offset
+#   Accel: 0.001 m/s^2 (+-32 m/s^2), Gyro: 0.0001 rad/s (+-3.2 rad/s),
+#   Mag: 0.01 uT (+-327 uT), Laser: 0.2 mm (0 ~ 6.5 m)
+IMU_AXIS_SCALES = (0.001,) * 3 + (0.0001,) * 3 + (0.01,) * 3
+IMU_SCALES = IMU_AXIS_SCALES * 4
+IMU_OFFSETS = (0.0,) * len(IMU_SCALES)
+LASER_SCALES = (0.0002,) * 4
+LASER_OFFSETS = (0.0,) * 4
+
+# scale descriptor 값: [원소 수 (u16)] + [항목 수 k (u16)] + 항목마다 (scale f32, offset f32)
+# 원소 i 는 항목 i % k 를 쓴다. 축마다 같은 단위(예: IMU 9 축 반복)면 k 는 한
+# 주기 길이라서 원소가 많아도 descriptor 가 ATT 속성 길이를 넘지 않는다.
+SCALE_DESCRIPTOR_HEADER_FORMAT = "<HH"
+SCALE_DESCRIPTOR_ENTRY_FORMAT = "<ff"
+
+
+class StructCodec:
+    """
+    struct.Struct 를 한 번만 컴파일해 두고, 미리 할당한 bytearray 에
+    pack_into 로 인코딩하는 코덱.
+
+    encode() 가 돌려주는 memoryview 는 내부 버퍼를 그대로 가리키므로
+    다음 encode() 전에 사용(dbus.ByteArray 로 복사 등)해야 한다.
+    GLib 메인 루프처럼 한 스레드에서만 쓰는 것을 전제로 한다.
+    """
+
+    def __init__(self, fmt):
+        self._struct = struct.Struct(fmt)
+        self.format = fmt
+        self.size = self._struct.size
+        self._buffer = bytearray(self.size)
+        self._view = memoryview(self._buffer)
+
+    def encode(self, *values):
+        self._struct.pack_into(self._buffer, 0, *values)
+        return self._view
+
+    def encode_buffer(self, data):
+        """
+        이미 같은 바이트 레이아웃인 연속 버퍼(예: little-endian float32
+        NumPy 배열)는 패킹 없이 그 메모리를 memoryview 로 그대로 돌려준다.
+        """
+        view = memoryview(data).cast('B')
+        if view.nbytes != self.size:
+            raise ValueError("buffer size %d does not match %s" % (view.nbytes, self.format))
+        return view
+
+    def encode_into(self, buffer, offset, *values):
+        """ 외부 버퍼의 offset 위치에 인코딩하고 다음 offset 을 돌려준다 """
+        self._struct.pack_into(buffer, offset, *values)
+        return offset + self.size
+
+    def decode(self, data, offset=0):
+        """ 클라이언트 쪽 디코더: 바이트열 -> float 튜플 """
+        return self._struct.unpack_from(data, offset)
+
+
+class ScaledInt16Codec:
+    """
+    float 값을 채널별 (값 - offset) / scale 로 양자화해서 int16 배열로
+    pack_into 하는 코덱. 범위를 벗어난 값(+-inf 포함)은 int16 한계로
+    잘린다. float32 대비 페이로드가 절반이다.
+
+    INT16_INVALID(-32768)는 "값 없음"으로 예약되어 있어 NaN 을 이 값으로
+    보내고, 유효 범위는 -32767 ~ 32767 이다. decode() 는 이 값을 NaN 으로
+    되돌린다.
+    """
+    INT16_INVALID = -32768
+    INT16_MIN = -32767
+    INT16_MAX = 32767
+
+    def __init__(self, scales, offsets=None):
+        self.scales = tuple(scales)
+        self.offsets = tuple(offsets) if offsets is not None else (0.0,) * len(self.scales)
+        self._inv_scales = tuple(1.0 / s for s in self.scales)
+        self._struct = struct.Struct("<%dh" % len(self.scales))
+        self.size = self._struct.size
+        self._buffer = bytearray(self.size)
+        self._view = memoryview(self._buffer)
+
+    def encode(self, *values):
+        lo = self.INT16_MIN
+        hi = self.INT16_MAX
+        try:
+            q = [round((v - o) * k) for v, o, k in zip(values, self.offsets, self._inv_scales)]
+        except (ValueError, OverflowError):
+            # NaN/inf 가 섞인 드문 경우만 값마다 검사
+            q = self._quantize_checked(values)
+        else:
+            # 범위 검사는 보통 min/max 두 번으로 끝난다
+            if q and (min(q) < lo or max(q) > hi):
+                q = [lo if n < lo else hi if n > hi else n for n in q]
+        self._struct.pack_into(self._buffer, 0, *q)
+        return self._view
+
+    def _quantize_checked(self, values):
+        lo = self.INT16_MIN
+        hi = self.INT16_MAX
+        q = []
+        for v, o, k in zip(values, self.offsets, self._inv_scales):
+            n = (v - o) * k
+            if n != n:
+                q.append(self.INT16_INVALID)
+            elif n >= hi:
+                q.append(hi)
+            elif n <= lo:
+                q.append(lo)
+            else:
+                q.append(round(n))
+        return q
+
+    def decode(self, data, offset=0):
+        raw = self._struct.unpack_from(data, offset)
+        invalid = self.INT16_INVALID
+        return tuple(math.nan if r == invalid else r * s + o
+                     for r, s, o in zip(raw, self.scales, self.offsets))
+
+    def get_descriptor_value(self):
+        """ scale descriptor 로 내보낼 메타데이터 바이트열 """
+        return encode_scale_descriptor(self.scales, self.offsets)
+
+
+def encode_scale_descriptor(scales, offsets):
+    count = len(scales)
+    if count > 0xFFFF:
+        raise ValueError("too many values for a scale descriptor: %d" % count)
+    # float32 로 보낼 값 기준으로 가장 짧은 반복 주기를 찾는다
+    entry = struct.Struct(SCALE_DESCRIPTOR_ENTRY_FORMAT)
+    pairs = [entry.pack(scale, offset) for scale, offset in zip(scales, offsets)]
+    period = next((p for p in range(1, count)
+                   if count % p == 0 and pairs[p:] == pairs[:-p]), count)
+    return struct.pack(SCALE_DESCRIPTOR_HEADER_FORMAT, count, period) + b"".join(pairs[:period])
+
+
+def decode_scale_descriptor(data):
+    """ scale descriptor -> (scales, offsets), 원소 수 만큼 펼친 튜플 """
+    count, period = struct.unpack_from(SCALE_DESCRIPTOR_HEADER_FORMAT, data)
+    start = struct.calcsize(SCALE_DESCRIPTOR_HEADER_FORMAT)
+    entries = list(struct.iter_unpack(SCALE_DESCRIPTOR_ENTRY_FORMAT,
+                                      bytes(data[start:start + 8 * period])))
+    if not count:
+        return (), ()
+    scales, offsets = zip(*(entries[i % period] for i in range(count)))
+    return tuple(scales), tuple(offsets)
+
+
+def decode_imu(data):
+    """ IMU 페이로드를 4x9 리스트로 되돌린다 """
+    flat = struct.unpack_from(IMU_FORMAT, data)
+    return [list(flat[i:i + 9]) for i in range(0, len(flat), 9)]
+
+
+def decode_laser(data):
+    return list(struct.unpack_from(LASER_FORMAT, data))
+
+
+def decode_weight(data):
+    return struct.unpack_from(WEIGHT_FORMAT, data)[0]
+
+
+def reshape(flat, shape):
+    """ 평탄화된 값을 shape 에 맞는 중첩 리스트로 (원소 1개면 스칼라) """
+    if len(shape) <= 1:
+        return flat[0] if len(flat) == 1 and shape in ((), (1,)) else list(flat)
+    step = len(flat) // shape[0]
+    return [reshape(flat[i:i + step], shape[1:]) for i in range(0, len(flat), step)]
+
+
+def decode_frame(data, offset=0, fields=DEFAULT_FRAME_FIELDS):
+    """
+    통합 프레임 하나를 dict 로 되돌린다.
+    {"version", "mask", "seq", "timestamp_us", <필드 이름>...}
+    (mask 에 없는 항목은 None)
+    """
+    version, mask, seq, timestamp_us = struct.unpack_from(FRAME_HEADER_FORMAT, data, offset)
+    if version != FRAME_VERSION:
+        raise ValueError("unsupported frame version: %d" % version)
+    frame = {"version": version, "mask": mask, "seq": seq, "timestamp_us": timestamp_us}
+    offset += struct.calcsize(FRAME_HEADER_FORMAT)
+    for bit, name, field_fmt, shape in fields:
+        frame[name] = None
+        if mask & bit:
+            frame[name] = reshape(struct.unpack_from(field_fmt, data, offset), shape)
+            offset += struct.calcsize(field_fmt)
+    return frame
+
+
+def decode_frames(data, fields=DEFAULT_FRAME_FIELDS):
+    """
+    이어 붙은 통합 프레임들을 dict 목록으로 되돌린다. 프레임마다 field mask
+    (따라서 길이)가 다를 수 있다 (FrameCharacteristic 의 배치 알림).
+    """
+    frames = []
+    offset = 0
+    while offset < len(data):
+        frame = decode_frame(data, offset, fields)
+        frames.append(frame)
+        offset += frame_size(frame["mask"], fields)
+    return frames
+
+
+#
+# Delta + zigzag varint 스트림
+#
+# 패킷: [packet seq (u8)] + 샘플 레코드 N 개
+# 레코드: [tag (u8)] + 채널 수 만큼의 zigzag varint
+#   tag KEYFRAME : 양자화한 절대값
+#   tag DELTA    : 직전 샘플 대비 양자화 값의 차이
+#
+DELTA_TAG_KEYFRAME = 0x01
+DELTA_TAG_DELTA = 0x02
+DELTA_MAX_PACKET = 514     # 알림 하나의 최대 크기 (ATT MTU 517 - 3)
+
+
+def _zigzag(n):
+    return (n << 1) if n >= 0 else ((-n) << 1) - 1
+
+
+def _unzigzag(z):
+    return (z >> 1) if not (z & 1) else -((z + 1) >> 1)
+
+
+class DeltaVarintEncoder:
+    """
+    IMU 샘플을 고정소수점으로 양자화한 뒤 직전 샘플과의 차이를
+    zigzag varint 로 이어 붙이는 스트림 인코더.
+
+    연속 샘플 사이의 변화가 작으면 채널당 1~2 바이트면 되므로 float32
+    (4 바이트) 대비 한 알림에 3~5 배 많은 샘플을 실을 수 있다.
+    keyframe_interval 샘플마다, 그리고 force_keyframe() 이후에는 절대값
+    레코드를 보내서 중간에 알림을 놓친 클라이언트도 다시 맞춰진다.
+    모든 버퍼는 생성 시 할당하며 encode() 결과는 내부 버퍼의 memoryview 이다.
+
+    양자화 값은 int32 범위(+-QUANT_MAX)로 잘리고(+-inf 포함), NaN 은 직전
+    샘플 값을 그대로 쓴다(delta 0). 그래서 채널당 varint 는 최대 5 바이트
+    (delta 는 33 비트)이고, 레코드 하나는 record_size(channels) 를 넘지 않는다.
+    """
+    QUANT_MAX = 2 ** 31 - 1
+    VARINT_MAX = 5
+
+    @classmethod
+    def record_size(cls, channels):
+        """ 채널 수에 대한 레코드 최대 크기 (tag 포함) """
+        return 1 + cls.VARINT_MAX * channels
+
+    def __init__(self, scales, keyframe_interval=64, max_packet=DELTA_MAX_PACKET):
+        self.scales = tuple(scales)
+        self.keyframe_interval = keyframe_interval
+        channels = len(self.scales)
+        self._inv_scales = tuple(1.0 / s for s in self.scales)
+        self._prev = [0] * channels
+        self._next = [0] * channels
+        self._since_keyframe = None   # None 이면 다음 레코드는 keyframe
+        self._packet_seq = 0
+        self._record = bytearray(self.record_size(channels))
+        # 첫 레코드는 max_packet 을 넘어도 보내므로 레코드 하나는 늘 들어가야 한다
+        # (memoryview 가 잡혀 있어서 bytearray 를 키울 수 없다)
+        self._buffer = bytearray(max(max_packet, 1 + len(self._record)))
+        self._view = memoryview(self._buffer)
+
+    def force_keyframe(self):
+        self._since_keyframe = None
+
+    def encode(self, rows, max_size):
+        """
+        rows(오래된 것부터, 각 행은 채널 수 만큼의 float)를 max_size 안에
+        들어가는 만큼 인코딩한다. (패킷 memoryview, 인코딩한 행 수) 를 돌려준다.
+        """
+        buf = self._buffer
+        limit = min(max_size, len(buf))
+        buf[0] = self._packet_seq
+        offset = 1
+        count = 0
+        for values in rows:
+            length = self._encode_record(values)
+            # 첫 레코드는 MTU 를 넘더라도 보낸다 (스트림이 멈추지 않도록)
+            if count and offset + length > limit:
+                break
+            buf[offset:offset + length] = self._record[:length]
+            offset += length
+            count += 1
+            self._commit()
+        if count:
+            self._packet_seq = (self._packet_seq + 1) & 0xFF
+        return self._view[:offset], count
+
+    def _encode_record(self, values):
+        # 레코드를 _record 에 쓰고 길이를 돌려준다 (상태는 _commit 에서 반영)
+        record = self._record
+        keyframe = (self._since_keyframe is None
+                    or self._since_keyframe + 1 >= self.keyframe_interval)
+        record[0] = DELTA_TAG_KEYFRAME if keyframe else DELTA_TAG_DELTA
+        pos = 1
+        prev = self._prev
+        nxt = self._next
+        inv = self._inv_scales
+        limit = self.QUANT_MAX
+        for i, value in enumerate(values):
+            x = value * inv[i]
+            if -limit <= x <= limit:
+                q = round(x)
+            elif x != x:
+                # NaN: 직전 값 유지
+                q = prev[i]
+            else:
+                q = limit if x > 0 else -limit
+            nxt[i] = q
+            z = _zigzag(q if keyframe else q - prev[i])
+            while z >= 0x80:
+                record[pos] = (z & 0x7F) | 0x80
+                z >>= 7
+                pos += 1
+            record[pos] = z
+            pos += 1
+        return pos
+
+    def _commit(self):
+        self._prev, self._next = self._next, self._prev
+        if self._record[0] == DELTA_TAG_KEYFRAME:
+            self._since_keyframe = 0
+        else:
+            self._since_keyframe += 1
+
+
+class DeltaVarintDecoder:
+    """
+    클라이언트 쪽 디코더. decode() 는 패킷 안의 샘플들을 float 리스트로
+    돌려준다. 패킷 seq 가 끊기면 다음 keyframe 이 올 때까지 delta 레코드를
+    버린다.
+    """
+
+    def __init__(self, scales):
+        self.scales = tuple(scales)
+        self._prev = None
+        self._expected_seq = None
+
+    def decode(self, packet):
+        data = bytes(packet)
+        if not data:
+            return []
+        seq = data[0]
+        if self._expected_seq is not None and seq != self._expected_seq:
+            self._prev = None
+        self._expected_seq = (seq + 1) & 0xFF
+
+        samples = []
+        channels = len(self.scales)
+        pos = 1
+        while pos < len(data):
+            tag = data[pos]
+            pos += 1
+            q = [0] * channels
+            for i in range(channels):
+                z = 0
+                shift = 0
+                while True:
+                    b = data[pos]
+                    pos += 1
+                    z |= (b & 0x7F) << shift
+                    shift += 7
+                    if not (b & 0x80):
+                        break
+                q[i] = _unzigzag(z)
+            if tag == DELTA_TAG_KEYFRAME:
+                self._prev = q
+            elif tag == DELTA_TAG_DELTA:
+                if self._prev is None:
+                    continue
+                self._prev = [p + d for p, d in zip(self._prev, q)]
+            else:
+                raise ValueError("unknown record tag: %d" % tag)
+            samples.append([v * s for v, s in zip(self._prev, self.scales)])
+        return samples
@@ -0,0 +1,62 @@
+# deadband.py
+import time
+
+
+class Deadband:
+    """
+    센서 채널 하나의 알림 억제(deadband) 판정.
+
+    직전에 보낸 값과 비교해서 어느 한 값이라도
+        |새 값 - 보낸 값| > max(absolute, relative * |보낸 값|)
+    이면 보내고, 아니면 억제한다. 두 임계값이 모두 0 이면 값이 완전히 같을
+    때만 억제된다. max_silence(초)가 지나면 값이 그대로여도 한 번 보낸다.
+
+    인코딩 전에 스냅샷 값(튜플)으로 판정하므로, 억제된 알림은
+    인코딩/D-Bus/무선 구간 비용이 전혀 들지 않는다.
+    sent / suppressed 카운터는 임계값 튜닝용이다.
+    """
+
+    def __init__(self, absolute=0.0, relative=0.0, max_silence=None):
+        self.absolute = absolute
+        self.relative = relative
+        self.max_silence = max_silence
+
+        self.sent = 0
+        self.suppressed = 0
+        self._last_values = None
+        self._last_sent = None
+
+    def reset(self):
+        """ 다음 판정은 무조건 보내도록 기준값을 지운다 (구독 시작 등) """
+        self._last_values = None
+        self._last_sent = None
+
+    def should_send(self, values, now=None):
+        if now is None:
+            now = time.monotonic()
+        if self._changed(values) or self._silence_expired(now):
+            # NumPy 스냅샷은 버퍼가 재사용되므로 값을 복사해 둔다 (튜플은 그대로)
+            self._last_values = tuple(values)
+            self._last_sent = now
+            self.sent += 1
+            return True
+        self.suppressed += 1
+        return False
+
+    def _silence_expired(self, now):
+        return (self.max_silence is not None
+                and now - self._last_sent >= self.max_silence)
+
+    def _changed(self, values):
+        last = self._last_values
+        if last is None or len(last) != len(values):
+            return True
+        absolute = self.absolute
+        relative = self.relative
+        for value, ref in zip(values, last):
+            if abs(value - ref) > max(absolute, relative * abs(ref)):
+                return True
+        return False
+
+    def get_stats(self):
+        return {"sent": self.sent, "suppressed": self.suppressed}
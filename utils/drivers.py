@@ -0,0 +1,385 @@
+# drivers.py
+import math
+import random
+import time
+
+try:
+    import smbus2
+except ImportError:
+    smbus2 = None
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+try:
+    import RPi.GPIO as GPIO
+except ImportError:
+    GPIO = None
+
+
+class SensorDriver:
+    """
+    센서 하나(또는 같은 채널의 센서 묶음)를 읽는 드라이버의 공통 부분.
+
+      channel : 값을 게시할 SensorSchema 채널 이름
+      rate    : 읽기 주기 (Hz)
+      size    : read() 가 돌려주는 값 수 (채널 원소 수와 같아야 함, None 은 모름)
+
+    하위 클래스는 read() 에서 채널 원소 수 만큼의 값(평탄화하지 않아도 됨)을
+    돌려준다. 새 값이 아직 없으면 None 을 돌려주면 게시하지 않는다.
+    open()/close() 는 AcquisitionManager 가 드라이버 스레드 안에서 부른다.
+
+    sample() 은 read() 전후의 time.monotonic() 중간값을 샘플 시각으로 붙인다.
+    하드웨어가 자체 시각을 주면 sample() 을 오버라이드하면 된다.
+
+    NumpySensorData 로 돌릴 때는 read() 대신 read_into(out) 이 불린다. out 은
+    채널 shape 의 float32 배열(드라이버마다 한 번 할당)이고 드라이버가 값을
+    직접 써 넣는다. 기본 구현은 read() 결과를 복사하므로, 값이 많은
+    드라이버만 오버라이드하면 된다.
+    """
+
+    def __init__(self, channel, rate):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.channel = channel
+        self.rate = rate
+        self.name = "%s:%s" % (type(self).__name__, channel)
+        self.size = None
+
+        self.samples = 0
+        self.errors = 0
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def read(self):
+        raise NotImplementedError
+
+    def read_into(self, out):
+        """ out(채널 shape 의 float32 배열)에 값을 쓴다. 새 샘플이 없으면 False """
+        values = self.read()
+        if values is None:
+            return False
+        out[...] = values
+        return True
+
+    def sample(self):
+        """ (timestamp, values). values 가 None 이면 새 샘플 없음 """
+        start = time.monotonic()
+        values = self.read()
+        return (start + time.monotonic()) / 2, values
+
+    def sample_into(self, out):
+        """ read_into() 판 sample(). 샘플 시각, 새 샘플이 없으면 None """
+        start = time.monotonic()
+        if not self.read_into(out):
+            return None
+        return (start + time.monotonic()) / 2
+
+    def get_stats(self):
+        return {"samples": self.samples, "errors": self.errors, "rate": self.rate}
+
+
+#
+# 시뮬레이션 드라이버 (하드웨어 없이 테스트용)
+#
+class SimulatedDriver(SensorDriver):
+    """
+    random.uniform(low, high) 값 size 개를 만드는 드라이버.
+    read_delay(초)를 주면 읽을 때마다 그만큼 지연해서 느린 센서를 흉내 낸다.
+    """
+
+    def __init__(self, channel, rate, size, low=-1.0, high=1.0, read_delay=0.0):
+        super().__init__(channel, rate)
+        self.size = size
+        self.low = low
+        self.high = high
+        self.read_delay = read_delay
+
+    def read(self):
+        if self.read_delay:
+            time.sleep(self.read_delay)
+        return [random.uniform(self.low, self.high) for _ in range(self.size)]
+
+
+class SimulatedIMUDriver(SimulatedDriver):
+    """ IMU n 개, 각 9 값 (AccelX,Y,Z, GyroX,Y,Z, MagX,Y,Z) """
+
+    def __init__(self, channel="imu", rate=100, sensors=4, read_delay=0.0):
+        super().__init__(channel, rate, sensors * 9, read_delay=read_delay)
+        self.sensors = sensors
+
+    def read(self):
+        if self.read_delay:
+            time.sleep(self.read_delay)
+        return [
+            [
+                random.uniform(-1.0, 1.0),  # AccelX
+                random.uniform(-1.0, 1.0),  # AccelY
+                random.uniform(9.5, 9.8),   # AccelZ (중력가속도 근사값)
+                random.uniform(-0.1, 0.1),  # GyroX
+                random.uniform(-0.1, 0.1),  # GyroY
+                random.uniform(-0.1, 0.1),  # GyroZ
+                random.uniform(-50.0, 50.0),  # MagX
+                random.uniform(-50.0, 50.0),  # MagY
+                random.uniform(-50.0, 50.0),  # MagZ
+            ]
+            for _ in range(self.sensors)
+        ]
+
+
+class SimulatedLaserDriver(SimulatedDriver):
+    """ 거리 센서 n 개 (0.5 ~ 5.0 m) """
+
+    def __init__(self, channel="laser", rate=20, sensors=4, read_delay=0.0):
+        super().__init__(channel, rate, sensors, 0.5, 5.0, read_delay)
+
+
+class SimulatedWeightDriver(SensorDriver):
+    """ 천천히 변하는 무게 (50 ~ 100 kg) """
+
+    def __init__(self, channel="weight", rate=10, read_delay=0.0):
+        super().__init__(channel, rate)
+        self.size = 1
+        self.read_delay = read_delay
+        self._start = time.monotonic()
+
+    def read(self):
+        if self.read_delay:
+            time.sleep(self.read_delay)
+        t = time.monotonic() - self._start
+        return 75.0 + 25.0 * math.sin(t / 10.0) + random.uniform(-0.1, 0.1)
+
+
+def simulated_drivers(schema, read_delay=0.0):
+    """ 스키마 채널마다 시뮬레이션 드라이버 하나 (main.py 기본 구성) """
+    drivers = []
+    for channel in schema:
+        rate = channel.rate or 10
+        if channel.name == "imu" and channel.shape[-1:] == (9,):
+            drivers.append(SimulatedIMUDriver(channel.name, rate, channel.size // 9, read_delay))
+        elif channel.name == "laser":
+            drivers.append(SimulatedLaserDriver(channel.name, rate, channel.size, read_delay))
+        elif channel.name == "weight" and channel.size == 1:
+            drivers.append(SimulatedWeightDriver(channel.name, rate, read_delay))
+        else:
+            drivers.append(SimulatedDriver(channel.name, rate, channel.size, read_delay=read_delay))
+    return drivers
+
+
+def check_drivers(schema, drivers):
+    """
+    드라이버 구성이 스키마와 맞는지 확인한다. 스키마에 없는 채널에 쓰는
+    드라이버, 값 수가 채널 원소 수와 다른 드라이버, 드라이버가 없는 채널이
+    있으면 ValueError (첫 publish 에서야 실패하거나 엉뚱한 채널에 쓰지 않게).
+    """
+    problems = []
+    channels = set()
+    for driver in drivers:
+        if driver.channel not in schema:
+            problems.append("%s: schema has no channel %r" % (driver.name, driver.channel))
+            continue
+        channels.add(driver.channel)
+        size = schema[driver.channel].size
+        if driver.size is not None and driver.size != size:
+            problems.append("%s: reads %d values but channel %r has %d"
+                            % (driver.name, driver.size, driver.channel, size))
+    missing = [c.name for c in schema if c.name not in channels]
+    if missing:
+        problems.append("no driver for channel(s) %s" % ", ".join(missing))
+    if problems:
+        raise ValueError("; ".join(problems))
+
+
+#
+# I2C IMU (MPU-9250: 가속도/자이로 + AK8963 지자기)
+#
+class I2CIMUDriver(SensorDriver):
+    """
+    MPU-9250 여러 개를 I2C 로 읽는다 (smbus2 필요).
+    buses 는 IMU 마다 (I2C 버스 번호, MPU 주소). AK8963 지자기 센서는
+    MPU 의 bypass 모드로 같은 버스의 0x0C 에 보이므로, IMU 마다 버스를
+    따로 쓴다 (i2c-gpio overlay 등).
+
+    값 순서: aX,aY,aZ (m/s^2), gX,gY,gZ (rad/s), mX,mY,mZ (uT)
+    """
+    ACCEL_XOUT_H = 0x3B
+    PWR_MGMT_1 = 0x6B
+    INT_PIN_CFG = 0x37
+    AK8963_ADDRESS = 0x0C
+    AK8963_ST1 = 0x02
+    AK8963_CNTL1 = 0x0A
+
+    ACCEL_SCALE = 9.80665 / 16384.0          # +-2g
+    GYRO_SCALE = math.radians(1.0) / 131.0   # +-250 dps
+    MAG_SCALE = 0.15                         # uT/LSB (16bit)
+
+    def __init__(self, channel="imu", rate=100, buses=((1, 0x68),)):
+        super().__init__(channel, rate)
+        self.buses = tuple(buses)
+        self.size = len(self.buses) * 9
+        self._smbus = {}
+
+    def open(self):
+        if smbus2 is None:
+            raise ImportError("I2CIMUDriver requires smbus2")
+        for bus_number, address in self.buses:
+            bus = self._smbus.get(bus_number)
+            if bus is None:
+                bus = self._smbus[bus_number] = smbus2.SMBus(bus_number)
+            bus.write_byte_data(address, self.PWR_MGMT_1, 0x00)    # sleep 해제
+            bus.write_byte_data(address, self.INT_PIN_CFG, 0x02)   # bypass (AK8963 접근)
+            bus.write_byte_data(self.AK8963_ADDRESS, self.AK8963_CNTL1, 0x16)  # 16bit, 100Hz 연속
+
+    def close(self):
+        for bus in self._smbus.values():
+            bus.close()
+        self._smbus = {}
+
+    def read(self):
+        return [self._read_sensor(bus_number, address)
+                for bus_number, address in self.buses]
+
+    def read_into(self, out):
+        # IMU 마다 한 줄씩 바로 써 넣는다 (중첩 리스트를 만들지 않음)
+        rows = out.reshape(len(self.buses), 9)
+        for i, (bus_number, address) in enumerate(self.buses):
+            rows[i] = self._read_sensor(bus_number, address)
+        return True
+
+    def _read_sensor(self, bus_number, address):
+        bus = self._smbus[bus_number]
+        raw = bytes(bus.read_i2c_block_data(address, self.ACCEL_XOUT_H, 14))
+        ax, ay, az, _, gx, gy, gz = (
+            int.from_bytes(raw[i:i + 2], "big", signed=True) for i in range(0, 14, 2))
+        # ST1 부터 ST2 까지 읽어야 다음 측정값이 갱신된다
+        mag = bytes(bus.read_i2c_block_data(self.AK8963_ADDRESS, self.AK8963_ST1, 8))
+        mx, my, mz = (
+            int.from_bytes(mag[i:i + 2], "little", signed=True) for i in range(1, 7, 2))
+        return (
+            ax * self.ACCEL_SCALE, ay * self.ACCEL_SCALE, az * self.ACCEL_SCALE,
+            gx * self.GYRO_SCALE, gy * self.GYRO_SCALE, gz * self.GYRO_SCALE,
+            mx * self.MAG_SCALE, my * self.MAG_SCALE, mz * self.MAG_SCALE,
+        )
+
+
+#
+# Serial 레이저 거리 센서
+#
+class SerialLaserDriver(SensorDriver):
+    """
+    거리 센서 보드가 시리얼로 보내는 줄 단위 ASCII 를 읽는다 (pyserial 필요).
+    한 줄: "d1,d2,...,dn\\n" (mm).
+
+    받은 바이트는 수신 버퍼에 이어 붙이고 "\\n" 으로 끝난 완전한 줄만
+    해석한다 (타임아웃으로 잘린 줄 조각을 버리면 나머지 조각이 다음 줄처럼
+    읽혀서 값이 조용히 틀어진다). open() 직후 첫 줄은 중간부터 받았을 수
+    있으므로 버린다. 여러 줄이 쌓여 있으면 가장 최근 줄만 쓴다. 완전한 줄이
+    없으면 None (새 샘플 없음).
+    """
+    READ_TIMEOUT = 0.05   # 초, 바이트가 없을 때 read() 가 기다리는 최대 시간
+    MAX_LINE = 256        # 이보다 길게 줄바꿈이 없으면 버퍼를 버리고 다시 맞춘다
+
+    def __init__(self, channel="laser", rate=20, port="/dev/ttyS0",
+                 baudrate=115200, sensors=4):
+        super().__init__(channel, rate)
+        self.port = port
+        self.baudrate = baudrate
+        self.sensors = sensors
+        self.size = sensors
+        self._serial = None
+        self._rx = bytearray()
+        self._synced = False
+
+    def open(self):
+        if serial is None:
+            raise ImportError("SerialLaserDriver requires pyserial")
+        self._serial = serial.Serial(self.port, self.baudrate, timeout=self.READ_TIMEOUT)
+        self._serial.reset_input_buffer()
+        self._rx.clear()
+        self._synced = False
+
+    def close(self):
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+    def read(self):
+        rx = self._rx
+        rx += self._serial.read(self._serial.in_waiting or 1)
+        end = rx.rfind(b"\n")
+        if end < 0:
+            if len(rx) > self.MAX_LINE:
+                rx.clear()
+                self._synced = False
+            return None
+        lines = bytes(rx[:end]).split(b"\n")
+        del rx[:end + 1]
+        if not self._synced:
+            # 첫 줄바꿈 앞은 줄 중간부터 받은 조각일 수 있다
+            self._synced = True
+            lines = lines[1:]
+        line = next((l for l in reversed(lines) if l.strip()), None)
+        if line is None:
+            return None
+        fields = line.decode("ascii", "replace").strip().split(",")
+        if len(fields) != self.sensors:
+            raise ValueError("unexpected laser line: %r" % line)
+        return [float(v) / 1000.0 for v in fields]
+
+
+#
+# HX711 로드셀 ADC
+#
+class HX711Driver(SensorDriver):
+    """
+    HX711 을 GPIO 비트뱅잉으로 읽는다 (RPi.GPIO 필요). 채널 A, gain 128.
+    무게 = (raw - offset) * scale. offset/scale 은 영점/분동으로 보정한 값.
+    DOUT 이 아직 high(변환 중)면 None.
+    """
+
+    def __init__(self, channel="weight", rate=10, dout_pin=5, sck_pin=6,
+                 offset=0, scale=1.0):
+        super().__init__(channel, rate)
+        self.size = 1
+        self.dout_pin = dout_pin
+        self.sck_pin = sck_pin
+        self.offset = offset
+        self.scale = scale
+
+    def open(self):
+        if GPIO is None:
+            raise ImportError("HX711Driver requires RPi.GPIO")
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(self.sck_pin, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.setup(self.dout_pin, GPIO.IN)
+
+    def close(self):
+        if GPIO is not None:
+            GPIO.cleanup((self.sck_pin, self.dout_pin))
+
+    def read_raw(self):
+        if GPIO.input(self.dout_pin):
+            return None
+        value = 0
+        for _ in range(24):
+            GPIO.output(self.sck_pin, GPIO.HIGH)
+            GPIO.output(self.sck_pin, GPIO.LOW)
+            value = (value << 1) | GPIO.input(self.dout_pin)
+        # 25 번째 펄스: 다음 변환은 채널 A, gain 128
+        GPIO.output(self.sck_pin, GPIO.HIGH)
+        GPIO.output(self.sck_pin, GPIO.LOW)
+        if value & 0x800000:
+            value -= 0x1000000
+        return value
+
+    def read(self):
+        raw = self.read_raw()
+        if raw is None:
+            return None
+        return (raw - self.offset) * self.scale
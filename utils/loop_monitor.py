@@ -0,0 +1,151 @@
+# loop_monitor.py
+import collections
+import sys
+import threading
+import time
+import traceback
+
+try:
+    from gi.repository import GLib
+except ImportError:
+    import glib as GLib
+from utils.metrics import METRICS, Histogram
+
+
+class LoopMonitor:
+    """
+    GLib 메인 루프 지연 감시 + 워치독.
+
+    메인 루프에 PRIORITY_HIGH 하트비트 타이머(interval_ms)를 걸고, 예정
+    시각 대비 실제로 불린 시각의 차이(dispatch lag)를 히스토그램에 쌓는다.
+    루프가 콜백 하나(GetManagedObjects, GC, 무거운 알림 콜백 등)에 묶여
+    있으면 하트비트도 밀린다.
+
+    워치독 스레드는 마지막 하트비트 이후 threshold_ms 가 넘게 지나면 루프가
+    막힌 것으로 보고, sys._current_frames() 로 루프 스레드의 스택을 떠서
+    출력한다. 한 번 멈춘 동안에는 처음 한 번만 전체 스택을 찍고, 이후
+    샘플은 맨 안쪽 프레임별 횟수로만 센다 (get_stats() 의 top_blockers).
+    루프가 돌아오면 멈춘 시간을 한 줄 출력한다.
+
+    start() 는 루프를 돌릴 스레드(보통 메인 스레드)에서 부른다.
+    Application.run() 이 configure() 된 설정으로 자동으로 띄운다.
+    """
+    INTERVAL_MS = 100
+    THRESHOLD_MS = 250
+
+    enabled = False   # configure() 로 켜면 Application.run() 이 감시를 붙인다
+
+    def __init__(self, interval_ms=None, threshold_ms=None, registry=None):
+        self.interval_ms = interval_ms or self.INTERVAL_MS
+        self.threshold_ms = threshold_ms or self.THRESHOLD_MS
+        registry = registry or METRICS
+        # 레지스트리가 꺼져 있어도 get_stats() 를 위해 항상 기록한다 (초당 10 번)
+        self.lag = registry.histogram("ble_loop_lag_seconds",
+                                      "GLib main loop heartbeat dispatch lag")
+        self.stall_counter = registry.counter("ble_loop_stalls_total",
+                                              "GLib main loop stalls over the watchdog threshold")
+        self.stall_time = Histogram("ble_loop_stall_seconds", ())
+        self.blockers = collections.Counter()   # "file:line func" -> 샘플 수
+
+        self._timer = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._loop_ident = None
+        self._expected = None
+        self._last_beat = None     # monotonic_ns, 워치독 스레드가 읽는다
+        self._stall_start = None   # 워치독 스레드 전용
+
+    @classmethod
+    def configure(cls, threshold_ms=None, interval_ms=None):
+        """ Application.run() 에서 쓸 기본 설정 (main.py --watchdog) """
+        cls.enabled = True
+        if threshold_ms:
+            cls.THRESHOLD_MS = threshold_ms
+        if interval_ms:
+            cls.INTERVAL_MS = interval_ms
+
+    def start(self):
+        if self._timer is not None:
+            return
+        self._loop_ident = threading.get_ident()
+        self._last_beat = time.monotonic_ns()
+        self._expected = self._last_beat + self.interval_ms * 1000000
+        self._timer = GLib.timeout_add(self.interval_ms, self._heartbeat,
+                                       priority=GLib.PRIORITY_HIGH)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._timer is not None:
+            GLib.source_remove(self._timer)
+            self._timer = None
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+
+    #
+    # 루프 스레드
+    #
+    def _heartbeat(self):
+        now = time.monotonic_ns()
+        self.lag.observe(now - self._expected)
+        # GLib 타이머는 실제 호출 시각 기준으로 다시 걸리므로 예정 시각도 그렇게
+        self._expected = now + self.interval_ms * 1000000
+        self._last_beat = now
+        return True
+
+    #
+    # 워치독 스레드
+    #
+    def _watch(self):
+        threshold = self.threshold_ms * 1000000
+        # 멈춘 동안의 샘플 간격
+        period = max(self.threshold_ms / 4000.0, 0.01)
+        while not self._stop.wait(period):
+            now = time.monotonic_ns()
+            last = self._last_beat
+            blocked = now - last - self.interval_ms * 1000000
+            if blocked > threshold:
+                self._sample(last, blocked)
+            elif self._stall_start is not None:
+                self._end_stall(last)
+
+    def _sample(self, last, blocked):
+        frame = sys._current_frames().get(self._loop_ident)
+        if frame is None:
+            return
+        if self._stall_start != last:
+            if self._stall_start is not None:
+                self._end_stall(last)
+            self._stall_start = last
+            self.stall_counter.inc()
+            print("GLib main loop blocked for %.0f ms, stack:\n%s" % (
+                blocked / 1e6, "".join(traceback.format_stack(frame)).rstrip()))
+        code = frame.f_code
+        self.blockers["%s:%d %s" % (code.co_filename, frame.f_lineno, code.co_name)] += 1
+        del frame
+
+    def _end_stall(self, last):
+        start = self._stall_start
+        self._stall_start = None
+        stalled = last - start - self.interval_ms * 1000000
+        self.stall_time.observe(stalled)
+        print("GLib main loop recovered after %.0f ms" % (stalled / 1e6))
+
+    def get_stats(self):
+        lag = self.lag.summary()
+        stalls = self.stall_time.summary()
+        return {
+            "interval_ms": self.interval_ms,
+            "threshold_ms": self.threshold_ms,
+            "heartbeats": lag["count"],
+            "lag_p50_us": lag["p50_us"],
+            "lag_p99_us": lag["p99_us"],
+            "lag_max_us": lag["max_us"],
+            "stalls": self.stall_counter.value,
+            "stall_max_us": stalls["max_us"],
+            "top_blockers": self.blockers.most_common(5),
+        }
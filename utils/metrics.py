@@ -0,0 +1,297 @@
+# metrics.py
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Counter:
+    __slots__ = ("name", "labels", "value")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+
+class Histogram:
+    """
+    ns 단위 값의 log2 히스토그램. i 번째 버킷은 [2^(i-1), 2^i) ns.
+    observe() 는 int.bit_length() 한 번과 덧셈 세 번이라 핫패스에 둘 수 있다.
+    백분위수는 버킷 상한으로 근사한다 (최대 2 배 오차).
+    """
+    __slots__ = ("name", "labels", "buckets", "count", "sum", "max")
+
+    BUCKETS = 48   # 2^47 ns ~ 39 시간
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, ns):
+        if ns < 0:
+            ns = 0
+        self.buckets[min(ns.bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.sum += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p):
+        """ p(0~100) 백분위수의 근사값 (ns, 버킷 상한). 값이 없으면 None """
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(1 << i, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_us": self.sum / self.count / 1000.0 if self.count else None,
+            "p50_us": _us(self.percentile(50)),
+            "p99_us": _us(self.percentile(99)),
+            "max_us": self.max / 1000.0,
+        }
+
+
+def _us(ns):
+    return ns / 1000.0 if ns is not None else None
+
+
+class MetricsRegistry:
+    """
+    핫패스 계측용 카운터/히스토그램 모음.
+
+    기본은 꺼져 있다(enabled = False). 계측 지점은
+
+        if METRICS.enabled:
+            ...
+
+    처럼 속성 한 번만 보고 지나가므로 꺼져 있을 때의 비용은 거의 없다.
+    counter()/histogram() 는 같은 이름+labels 에 같은 객체를 돌려주므로
+    생성 시점에 한 번 받아 두고 쓴다. 값은 GLib 메인 루프(한 스레드)에서만
+    올리고, 내보내기(render_text/snapshot)는 다른 스레드에서 읽기만 한다.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._metrics = {}   # (name, labels) -> Counter/Histogram
+        self._help = {}
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def counter(self, name, help=None, **labels):
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name, help=None, **labels):
+        return self._get(Histogram, name, help, labels)
+
+    def _get(self, cls, name, help, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = cls(name, key[1])
+                    if help:
+                        self._help.setdefault(name, help)
+        if not isinstance(metric, cls):
+            raise TypeError("%s is not a %s" % (name, cls.__name__))
+        return metric
+
+    def reset(self):
+        for metric in list(self._metrics.values()):
+            if isinstance(metric, Counter):
+                metric.value = 0
+            else:
+                metric.__init__(metric.name, metric.labels)
+
+    # -----------------------
+    # 내보내기
+    # -----------------------
+    def render_text(self):
+        """ Prometheus text 형식 (히스토그램은 초 단위 le) """
+        lines = []
+        seen = set()
+        for metric in sorted(list(self._metrics.values()), key=lambda m: (m.name, m.labels)):
+            if metric.name not in seen:
+                seen.add(metric.name)
+                if metric.name in self._help:
+                    lines.append("# HELP %s %s" % (metric.name, self._help[metric.name]))
+                kind = "counter" if isinstance(metric, Counter) else "histogram"
+                lines.append("# TYPE %s %s" % (metric.name, kind))
+            if isinstance(metric, Counter):
+                lines.append("%s%s %d" % (metric.name, _labels(metric.labels), metric.value))
+                continue
+            buckets = list(metric.buckets)
+            last = max((i for i, n in enumerate(buckets) if n), default=0)
+            cumulative = 0
+            for i in range(last + 1):
+                cumulative += buckets[i]
+                le = "%.9g" % ((1 << i) / 1e9)
+                lines.append("%s_bucket%s %d" % (
+                    metric.name, _labels(metric.labels + (("le", le),)), cumulative))
+            lines.append("%s_bucket%s %d" % (
+                metric.name, _labels(metric.labels + (("le", "+Inf"),)), metric.count))
+            lines.append("%s_sum%s %.9f" % (metric.name, _labels(metric.labels), metric.sum / 1e9))
+            lines.append("%s_count%s %d" % (metric.name, _labels(metric.labels), metric.count))
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """ {이름{labels}: 값 또는 히스토그램 요약} """
+        result = {"enabled": self.enabled,
+                  "uptime_s": round(time.monotonic() - self.started, 1)}
+        for metric in list(self._metrics.values()):
+            key = metric.name + _labels(metric.labels)
+            if isinstance(metric, Counter):
+                result[key] = metric.value
+            elif metric.count:
+                result[key] = metric.summary()
+        return result
+
+    def render_compact(self, max_size=None):
+        """
+        GATT 진단 Characteristic 용 짧은 JSON (키 정렬, 공백 없음).
+        0 인 카운터와 빈 히스토그램은 빼고, 이름의 ble_ 접두사/단위 접미사를
+        떼고, labels 는 값만 (UUID 는 앞 32 비트 16진수) 붙인다.
+            {"notifications/2":120,"notify_emit/2":[120,4.1,16.4,30.2],...}
+        히스토그램은 [count, p50_us, p99_us, max_us].
+
+        max_size 를 주면 결과가 그 바이트 수를 넘지 않도록 들어가지 않는
+        항목을 통째로 빼고 "truncated":true 를 붙인다 (항상 올바른 JSON).
+        """
+        entries = {}
+        for metric in list(self._metrics.values()):
+            name = _short_name(metric.name)
+            if metric.labels:
+                name += "/" + ",".join(_short_label(v) for _, v in metric.labels)
+            if isinstance(metric, Counter):
+                if metric.value:
+                    entries[name] = metric.value
+            elif metric.count:
+                summary = metric.summary()
+                entries[name] = [metric.count, _round(summary["p50_us"]),
+                                 _round(summary["p99_us"]), _round(summary["max_us"])]
+        entries["enabled"] = self.enabled
+        entries["uptime_s"] = round(time.monotonic() - self.started, 1)
+
+        # ensure_ascii 라 항목마다 바이트 수 = 문자 수
+        parts = ["%s:%s" % (json.dumps(key), json.dumps(entries[key], separators=(",", ":")))
+                 for key in sorted(entries)]
+        if max_size is None:
+            return ("{" + ",".join(parts) + "}").encode()
+        budget = max_size - len('{,"truncated":true}')
+        kept = []
+        size = 0
+        for part in parts:
+            # enabled/uptime_s 는 짧으니 거의 항상 남는다
+            if size + len(part) + 1 <= budget:
+                kept.append(part)
+                size += len(part) + 1
+        if len(kept) < len(parts):
+            kept.append('"truncated":true')
+        return ("{" + ",".join(kept) + "}").encode()
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
+
+
+def _short_name(name):
+    if name.startswith("ble_"):
+        name = name[4:]
+    for suffix in ("_total", "_seconds"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+
+def _short_label(value):
+    value = str(value)
+    if len(value) == 36 and value[8] == "-":
+        try:
+            return "%x" % int(value[:8], 16)
+        except ValueError:
+            pass
+    return value
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (k, str(v).replace('"', '\\"')) for k, v in labels)
+
+
+# 프로세스 공용 레지스트리
+METRICS = MetricsRegistry(enabled=os.environ.get("BLE_METRICS", "") not in ("", "0"))
+
+
+#
+# 내보내기 서버
+#
+class _HTTPHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UnixHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.request.sendall(self.server.registry.render_text().encode())
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_metrics(address, registry=None):
+    """
+    레지스트리를 text 형식으로 내보내는 서버를 데몬 스레드로 띄운다.
+      "/run/neuraload.sock"   : Unix 소켓, 연결하면 text 를 보내고 닫는다
+      "127.0.0.1:9100" / 9100 : HTTP, GET /metrics
+    레지스트리를 켜고(enable) 서버 객체를 돌려준다 (shutdown() 으로 정지).
+    """
+    registry = registry or METRICS
+    registry.enable()
+    address = str(address)
+    if address.startswith("/") or address.startswith("."):
+        if os.path.exists(address):
+            os.unlink(address)
+        server = _UnixServer(address, _UnixHandler)
+    else:
+        host, _, port = address.rpartition(":")
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), _HTTPHandler)
+        server.daemon_threads = True
+    server.registry = registry
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server")
+    thread.daemon = True
+    thread.start()
+    return server
@@ -0,0 +1,143 @@
+# rate_clock.py
+import math
+import time
+
+
+class RateClock:
+    """
+    고정 주기 실행용 시계. 마감 시각을 "시작 시각 + k * 주기" 의 절대값으로
+    잡으므로(clock_nanosleep(TIMER_ABSTIME) 방식) 작업 시간이나 sleep 오차가
+    다음 주기로 누적되지 않는다. 시계는 time.monotonic().
+
+    주기를 놓쳤을 때(overrun: 작업이 주기보다 오래 걸렸거나 늦게 깨어남)의
+    처리 방법:
+      SKIP     : 놓친 주기는 건너뛰고 원래 위상의 다음 마감으로 (기본)
+      CATCH_UP : 놓친 주기를 바로바로 실행해서 따라잡는다. max_catch_up 개를
+                 넘게 밀리면 나머지는 건너뛴다.
+
+    사용법은 두 가지.
+      - 스레드: while clock.wait(stop_event): 작업()
+      - 이벤트 루프: clock.delay() 뒤에 타이머를 걸고, 깨어나면 clock.tick()
+        (utils/service.py 의 NotifyScheduler)
+
+    통계(get_stats): 실행 횟수, overrun 횟수, 건너뛴 주기 수, 마감 대비
+    실제 실행 시각의 지연(jitter) 평균/최대/표준편차 (us).
+    """
+    SKIP = "skip"
+    CATCH_UP = "catch_up"
+
+    def __init__(self, period, policy=SKIP, max_catch_up=10, start=None):
+        if period <= 0:
+            raise ValueError("period must be > 0")
+        if policy not in (self.SKIP, self.CATCH_UP):
+            raise ValueError("unknown policy: %r" % policy)
+        self.period = period
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.deadline = time.monotonic() if start is None else start
+        self.reset_stats()
+
+    @classmethod
+    def from_rate(cls, rate, **kwargs):
+        """ rate(Hz) 로 만들기 """
+        return cls(1.0 / rate, **kwargs)
+
+    def reset(self, start=None):
+        """ 다음 마감을 start(기본: 지금)로 다시 잡는다 """
+        self.deadline = time.monotonic() if start is None else start
+
+    def set_period(self, period):
+        """ 주기 변경. 이미 잡힌 다음 마감도 새 주기 기준으로 옮긴다. """
+        if period <= 0:
+            raise ValueError("period must be > 0")
+        self.deadline += period - self.period
+        self.period = period
+
+    def delay(self, now=None):
+        """ 다음 마감까지 남은 시간(초, 0 이상) """
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, self.deadline - now)
+
+    def wait(self, stop_event=None):
+        """
+        다음 마감까지 잔 뒤 tick() 한다. stop_event(threading.Event)가
+        set 되면 바로 False 를 돌려준다.
+        """
+        now = time.monotonic()
+        # 작업이 이미 마감을 넘겼으면 overrun (tick() 에서 다시 세지 않는다)
+        overrun = now > self.deadline
+        if not overrun:
+            delay = self.deadline - now
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+            now = time.monotonic()
+        if stop_event is not None and stop_event.is_set():
+            return False
+        self._tick(now, overrun)
+        return True
+
+    def tick(self, now=None):
+        """
+        이번 주기를 실행했음을 기록하고 다음 마감으로 넘어간다.
+        건너뛴 주기 수를 돌려준다. 마감보다 한 주기 이상 늦었으면(다음
+        마감도 지났으면) overrun 으로 센다.
+        """
+        if now is None:
+            now = time.monotonic()
+        return self._tick(now, None)
+
+    def _tick(self, now, overrun):
+        # 마감보다 조금 일찍 실행된 경우(이벤트 루프의 타이머 합치기)는 0
+        lateness = max(0.0, now - self.deadline)
+        if overrun is None:
+            overrun = lateness >= self.period
+        if overrun:
+            self.overruns += 1
+        self.ticks += 1
+        self._late_sum += lateness
+        self._late_sq_sum += lateness * lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+
+        self.deadline += self.period
+        missed = 0
+        if now >= self.deadline:
+            # 다음 마감도 이미 지났다: 놓친 주기 수
+            behind = int((now - self.deadline) // self.period) + 1
+            if self.policy == self.SKIP:
+                missed = behind
+            else:
+                missed = max(0, behind - self.max_catch_up)
+            self.deadline += missed * self.period
+            self.skipped += missed
+        return missed
+
+    # -----------------------
+    # 통계
+    # -----------------------
+    def reset_stats(self):
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.max_lateness = 0.0
+        self._late_sum = 0.0
+        self._late_sq_sum = 0.0
+
+    def get_stats(self):
+        n = self.ticks
+        mean = self._late_sum / n if n else 0.0
+        var = self._late_sq_sum / n - mean * mean if n else 0.0
+        return {
+            "period_us": self.period * 1e6,
+            "ticks": n,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "jitter_mean_us": mean * 1e6,
+            "jitter_max_us": self.max_lateness * 1e6,
+            "jitter_std_us": math.sqrt(max(0.0, var)) * 1e6,
+        }
+
@@ -1,26 +1,151 @@
 # sensor_data.py
+import threading
+import time
+
+from utils.sensor_history import FrameHistory
+from utils.sensor_schema import DEFAULT_SCHEMA
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 한 시점의 센서 값 전체를 묶은 불변(immutable) 프레임 (기본 구성).
+# 필드는 seq, timestamp 와 스키마의 채널 이름들이고, 채널 값은 모두
+# 평탄화(flat)된 float 튜플이다.
+#   imu    : 36 floats (센서1 aX..mZ, 센서2 aX..mZ, ...)
+#   laser  : 4 floats
+#   weight : 1 float
+# 다른 구성은 SensorSchema.frame_type 을 쓴다 (utils/sensor_schema.py).
+SensorFrame = DEFAULT_SCHEMA.frame_type
+
 
 class SensorData:
     """
     실제 센서에서 얻은 데이터를 임시로 저장해 두고,
     BLE 서버가 필요 시 가져갈 수 있도록 관리하는 클래스.
-    아래 예시에서는 IMU, Laser, Weight 데이터를
-    각각 set/get 메서드로 업데이트할 수 있게 했습니다.
+
+    생산자(드라이버 스레드들)는 publish() 로 한 프레임 전체를 올리고,
+    BLE 쪽(GLib 메인 루프)은 get_snapshot() 으로 일관된 스냅샷을 읽는다.
+    새 프레임은 항상 새 SensorFrame 객체로 만들어지고 참조 하나만
+    교체되므로(참조 대입은 원자적) 락 없이도 읽는 쪽이 IMU 는 N 번째,
+    Laser 는 N+1 번째 프레임을 섞어 보는 일이 없다.
+    생산자는 여러 스레드일 수 있다(utils/acquisition.py 의 드라이버별 스레드).
+    쓰는 쪽끼리만 _write_lock 으로 직렬화해서 seq/history 순서를 지키고,
+    읽는 쪽은 여전히 락을 쓰지 않는다. 프레임 timestamp 는 직전 프레임보다
+    작아지지 않게 맞춘다 (history 는 시간 순 정렬을 전제로 한다).
+
+    add_publish_hook() 로 등록한 함수는 publish() 직후 생산자 스레드에서
+    hook(frame) 으로 불린다. BLE 서버는 여기서 GLib 메인 루프를 깨워
+    새 프레임이 들어오자마자 알림을 보낸다. (hook 은 가볍게 유지할 것)
+
+    게시된 프레임은 history(FrameHistory 링 버퍼)에도 타임스탬프와 함께
+    쌓이므로, BLE 알림 주기 사이에 들어온 샘플도 나중에 꺼내 볼 수 있다.
+    history 는 "publish 한 번 = 한 행(모든 채널의 그 시점 값)" 이고, 그
+    publish 가 실제로 쓴 채널은 행의 mask(schema.bits)로 남는다. 채널별
+    샘플만 필요하면 mask 로 거른다.
+
+    채널 구성은 schema(SensorSchema)로 정한다. 생략하면 기본 구성
+    (utils/sensor_schema.py 의 DEFAULT_SCHEMA)이다.
+
+    기존 set_*/get_* 메서드는 호환을 위해 남겨 두었다.
     """
 
-    def __init__(self):
-        # IMU: 4개의 센서 * 9개 float (AccelX,Y,Z + GyroX,Y,Z + MagX,Y,Z) 
+    def __init__(self, history_size=1024, schema=None):
+        # 센서 구성 (기본: IMU 4개 x 9축, Laser 4개, Weight 1개)
+        self.schema = DEFAULT_SCHEMA if schema is None else schema
+        self._frame_type = self.schema.frame_type
         # 기본값(0.0)으로 초기화
-        self._imu_data = [[0.0]*9 for _ in range(4)]
+        self._snapshot = self._frame_type(
+            seq=0,
+            timestamp=time.monotonic(),
+            **self.schema.zeros()
+        )
 
-        # Laser: 4개 센서 (거리값) 
-        self._laser_data = [0.0]*4
+        # 타임스탬프가 붙은 최근 프레임 기록 (100Hz 기준 약 10초)
+        self.history = self._create_history(history_size)
 
-        # Weight: 단일 float
-        self._weight_data = 0.0
+        # publish() 후 호출할 함수들 (통째로 교체해서 락 없이 순회)
+        self._publish_hooks = ()
+        # 생산자 스레드끼리의 직렬화 (읽는 쪽은 사용하지 않음)
+        self._write_lock = threading.Lock()
 
         # 장치 식별자
-        self._device_id = "NEURALOAD-1234"  # 기본 값 
+        self._device_id = "NEURALOAD-1234"  # 기본 값
+
+    def _create_history(self, history_size):
+        return FrameHistory(self.schema.width, history_size)
+
+    # -----------------------
+    # Snapshot
+    # -----------------------
+    def publish(self, timestamp=None, **channels):
+        """
+        한 프레임을 통째로 게시한다. 채널 값은 이름으로 넘기고
+        (예: imu=4x9 리스트, laser=길이 4 리스트, weight=단일 float),
+        생략한 채널은 직전 프레임 값을 유지한다.
+        """
+        schema = self.schema
+        values = self._flatten_channels(channels)
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        with self._write_lock:
+            prev = self._snapshot
+            frame = prev._replace(
+                seq=prev.seq + 1,
+                timestamp=max(timestamp, prev.timestamp),
+                **values
+            )
+            row = ()
+            for name in schema.names:
+                row += getattr(frame, name)
+            self.history.append(row, frame.timestamp, frame.seq, schema.mask_of(values))
+            # 참조 교체 한 번으로 게시 (읽는 쪽은 이전 또는 새 프레임 중 하나만 본다)
+            self._snapshot = frame
+        for hook in self._publish_hooks:
+            hook(frame)
+        return frame
+
+    def _flatten_channels(self, channels):
+        """ 채널 이름 -> 평탄화된 float 튜플 (None 은 생략) """
+        schema = self.schema
+        values = {}
+        for name, value in channels.items():
+            if name not in schema:
+                raise ValueError("unknown channel: %r" % name)
+            if value is not None:
+                values[name] = schema.flatten(schema[name], value)
+        return values
+
+    def add_publish_hook(self, hook):
+        self._publish_hooks = self._publish_hooks + (hook,)
+
+    def remove_publish_hook(self, hook):
+        self._publish_hooks = tuple(h for h in self._publish_hooks if h != hook)
+
+    def get_snapshot(self):
+        """ 가장 최근에 게시된 SensorFrame (불변) """
+        return self._snapshot
+
+    def snapshot_valid(self, snapshot):
+        """
+        스냅샷 내용이 아직 유효한지. 튜플 스냅샷은 불변이라 항상 True.
+        (NumpySensorData 는 버퍼를 재사용하므로 인코딩 후 확인이 필요하다)
+        """
+        return True
+
+    def get_generation(self):
+        """
+        데이터 세대(버전) 번호. publish() 될 때마다 1씩 증가하므로
+        인코딩 결과 캐시의 무효화 키로 쓸 수 있다. (= 스냅샷의 seq)
+        """
+        return self._snapshot.seq
+
+    def get_channel(self, name):
+        """ 채널 값을 스키마의 shape 대로 (예: imu 는 4x9 리스트, weight 는 float) """
+        return self.schema.shape_values(name, getattr(self.get_snapshot(), name))
+
     # -----------------------
     # IMU
     # -----------------------
@@ -33,10 +158,10 @@ class SensorData:
           ...
         ]
         """
-        self._imu_data = new_data
+        self.publish(imu=new_data)
 
     def get_imu_data(self):
-        return self._imu_data
+        return self.get_channel("imu")
 
     # -----------------------
     # Laser
@@ -45,20 +170,20 @@ class SensorData:
         """
         new_data 형식 예시(길이 4 리스트): [값1, 값2, 값3, 값4]
         """
-        self._laser_data = new_data
+        self.publish(laser=new_data)
 
     def get_laser_data(self):
-        return self._laser_data
+        return self.get_channel("laser")
 
     # -----------------------
     # Weight
     # -----------------------
     def set_weight_data(self, weight):
         """ weight는 단일 float """
-        self._weight_data = weight
+        self.publish(weight=weight)
 
     def get_weight_data(self):
-        return self._weight_data
+        return self.get_channel("weight")
 
     # -----------------------
     # Device ID
@@ -67,4 +192,135 @@ class SensorData:
         self._device_id = device_id
 
     def get_device_id(self):
-        return self._device_id
\ No newline at end of file
+        return self._device_id
+
+
+
+# 생산자가 값을 직접 써 넣는 NumPy 버퍼 묶음 (NumpySensorData.begin_frame, 기본 구성)
+FrameBuffers = DEFAULT_SCHEMA.buffers_type
+
+
+class NumpySensorData(SensorData):
+    """
+    NumPy 배열에 값을 보관하는 SensorData (numpy 가 있을 때만 사용 가능).
+
+    한 프레임은 float32 (schema.width,) 연속 배열 한 줄이고, 채널 값은 그
+    줄을 가리키는 view 이다. 이런 줄 두 개를 번갈아 쓰는 더블 버퍼로,
+    생산자는 begin_frame() 이 돌려준 뒤쪽 버퍼의 채널 배열(채널 shape,
+    기본 구성은 imu (4,9) / laser (4,) / weight (1,))에 직접 값을 쓰고
+    commit_frame() 으로 앞뒤를 바꾼다. publish() 도 그대로 쓸 수 있다.
+
+    스냅샷의 채널 값은 읽기 전용 평탄 view 라서 인코더가
+    .tobytes() 나 memoryview 로 바로 바이트를 얻을 수 있고, history 에도
+    한 번의 메모리 복사로 들어간다. 채널이 늘어도 파이썬 레벨 반복이 없다.
+
+    스냅샷이 가리키는 버퍼는 두 번 뒤의 프레임에서 재사용되므로, 읽는 쪽은
+    값을 쓴(복사한) 뒤 snapshot_valid() 로 확인하고 아니면 다시 읽는다.
+
+    생산자가 여럿이면 begin_frame() 부터 commit_frame() (또는 abort_frame())
+    까지 쓰기 락을 잡고 있으므로, 그 사이는 짧게 유지할 것.
+    """
+
+    def __init__(self, history_size=1024, schema=None):
+        if np is None:
+            raise ImportError("NumpySensorData requires numpy")
+        super().__init__(history_size, schema)
+
+        self._rows = np.zeros((2, self.schema.width), dtype="<f4")
+        self._writers = [self._make_buffers(slot) for slot in (0, 1)]
+        self._readers = [self._make_views(slot) for slot in (0, 1)]
+        # 슬롯별로 담고 있는 프레임 seq (쓰는 중이면 -1)
+        self._slot_seqs = [0, -1]
+        self._front = 0
+        self._writing = None
+
+        self._snapshot = self._frame_type(
+            0, self._snapshot.timestamp, *self._readers[0])
+
+    def _make_buffers(self, slot):
+        row = self._rows[slot]
+        columns = self.schema.columns
+        return self.schema.buffers_type(*[
+            row[columns[channel.name]].reshape(channel.shape)
+            for channel in self.schema
+        ])
+
+    def _make_views(self, slot):
+        row = self._rows[slot].view()
+        row.flags.writeable = False
+        columns = self.schema.columns
+        return tuple(row[columns[name]] for name in self.schema.names)
+
+    # -----------------------
+    # 생산자
+    # -----------------------
+    def begin_frame(self):
+        """
+        다음 프레임을 쓸 버퍼(schema.buffers_type)를 돌려준다. 직전 프레임
+        값으로 채워져 있으므로 바뀐 채널만 쓰면 된다.
+        commit_frame() / abort_frame() 까지 다른 생산자는 기다린다.
+        """
+        self._write_lock.acquire()
+        back = 1 - self._front
+        self._slot_seqs[back] = -1
+        np.copyto(self._rows[back], self._rows[self._front])
+        self._writing = back
+        return self._writers[back]
+
+    def commit_frame(self, timestamp=None, mask=None):
+        """ mask: 이번에 쓴 채널 (history 행에 기록, 생략하면 전체) """
+        back = self._writing
+        if back is None:
+            raise RuntimeError("commit_frame() without begin_frame()")
+        self._writing = None
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        try:
+            frame = self._frame_type(
+                self._snapshot.seq + 1,
+                max(timestamp, self._snapshot.timestamp),
+                *self._readers[back]
+            )
+            self.history.append_buffer(self._rows[back], frame.timestamp, frame.seq,
+                                       self.schema.field_all if mask is None else mask)
+            self._slot_seqs[back] = frame.seq
+            self._front = back
+            self._snapshot = frame
+        finally:
+            self._write_lock.release()
+        for hook in self._publish_hooks:
+            hook(frame)
+        return frame
+
+    def channel_buffer(self, name):
+        """ 채널 shape 의 새 float32 배열 (드라이버가 read_into() 로 쓸 버퍼) """
+        return np.zeros(self.schema[name].shape, dtype="<f4")
+
+    def abort_frame(self):
+        """ begin_frame() 으로 받은 버퍼를 버린다 (게시하지 않음) """
+        if self._writing is None:
+            raise RuntimeError("abort_frame() without begin_frame()")
+        self._writing = None
+        self._write_lock.release()
+
+    def publish(self, timestamp=None, **channels):
+        for name in channels:
+            if name not in self.schema:
+                raise ValueError("unknown channel: %r" % name)
+        buffers = self.begin_frame()
+        try:
+            for name, value in channels.items():
+                if value is not None:
+                    getattr(buffers, name)[...] = value
+        except Exception:
+            self.abort_frame()
+            raise
+        return self.commit_frame(
+            timestamp, self.schema.mask_of(n for n, v in channels.items() if v is not None))
+
+    # -----------------------
+    # 읽는 쪽
+    # -----------------------
+    def snapshot_valid(self, snapshot):
+        return snapshot.seq in self._slot_seqs
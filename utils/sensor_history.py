@@ -0,0 +1,183 @@
+# sensor_history.py
+import struct
+import time
+from array import array
+
+
+class FrameHistory:
+    """
+    타임스탬프가 붙은 센서 프레임을 고정 크기로 보관하는 링 버퍼.
+
+    모든 저장 공간은 생성 시 한 번만 할당한다.
+      - 값      : array('f'), capacity x width (행 단위 연속 배치)
+      - 타임스탬프: array('d'), time.monotonic() 초
+      - 시퀀스   : array('Q'), SensorFrame.seq
+      - 바뀐 채널: array('B'), 그 행을 만든 publish 가 실제로 쓴 채널의
+                   field mask (SensorSchema.bits). 0xFF 면 전체
+
+    한 행은 publish 한 번이다. 드라이버마다 따로 게시하면 행마다 나머지
+    채널은 직전 값의 복사본이므로, 채널별 샘플만 필요한 쪽(스트림 알림 등)은
+    mask 로 그 채널이 바뀐 행만 골라 쓴다.
+
+    쓰는 쪽(append)은 하나라고 가정하고, 읽는 쪽은 락 없이 복사한다.
+    복사 도중 쓰는 쪽이 해당 슬롯을 덮어썼으면 다시 복사한다(seqlock 방식).
+    그래서 한 번에 읽을 수 있는 최대 행 수는 capacity - 1 이다.
+
+    window()/since() 는 out(및 ts_out/seq_out/mask_out) 버퍼를 넘겨주면
+    추가 할당 없이 그 안에 시간 순서대로 복사하고, 복사한 행 수를 돌려준다.
+    """
+    ALL_CHANNELS = 0xFF
+
+    def __init__(self, width, capacity=1024):
+        if capacity < 2:
+            raise ValueError("capacity must be >= 2")
+        self.width = width
+        self.capacity = capacity
+
+        self._values = array('f', bytes(4 * width * capacity))
+        self._timestamps = array('d', bytes(8 * capacity))
+        self._seqs = array('Q', bytes(8 * capacity))
+        self._masks = array('B', bytes(capacity))
+
+        self._values_mv = memoryview(self._values)
+        self._values_bytes = self._values_mv.cast('B')
+        self._timestamps_mv = memoryview(self._timestamps)
+        self._seqs_mv = memoryview(self._seqs)
+        self._masks_mv = memoryview(self._masks)
+        self._row = struct.Struct(f"{width}f")
+
+        # 지금까지 기록된 프레임 수 (다음에 쓸 논리 인덱스)
+        self._written = 0
+
+    def __len__(self):
+        return min(self._written, self.capacity - 1)
+
+    # -----------------------
+    # 쓰기
+    # -----------------------
+    def append(self, values, timestamp=None, seq=0, mask=ALL_CHANNELS):
+        """ values: width 개의 float (iterable), mask: 바뀐 채널 """
+        slot = self._written % self.capacity
+        self._row.pack_into(self._values_bytes, slot * self._row.size, *values)
+        self._timestamps[slot] = time.monotonic() if timestamp is None else timestamp
+        self._seqs[slot] = seq
+        self._masks[slot] = mask
+        # 행을 다 쓴 뒤에 공개
+        self._written += 1
+
+    def append_buffer(self, buffer, timestamp=None, seq=0, mask=ALL_CHANNELS):
+        """
+        행 하나와 같은 레이아웃의 연속 버퍼(예: float32 NumPy 배열)를
+        패킹 없이 그대로 복사해 넣는다.
+        """
+        slot = self._written % self.capacity
+        size = self._row.size
+        self._values_bytes[slot * size:(slot + 1) * size] = memoryview(buffer).cast('B')
+        self._timestamps[slot] = time.monotonic() if timestamp is None else timestamp
+        self._seqs[slot] = seq
+        self._masks[slot] = mask
+        self._written += 1
+
+    # -----------------------
+    # 읽기
+    # -----------------------
+    def latest(self):
+        """
+        (seq, timestamp, values) 를 돌려준다. 비어 있으면 None.
+        values 는 내부 버퍼의 memoryview 이므로 다음 append 전에 사용할 것.
+        """
+        written = self._written
+        if written == 0:
+            return None
+        slot = (written - 1) % self.capacity
+        w = self.width
+        return (self._seqs[slot], self._timestamps[slot],
+                self._values_mv[slot * w:(slot + 1) * w])
+
+    def window(self, n, out=None, ts_out=None, seq_out=None, mask_out=None):
+        """
+        가장 최근 n 개 행을 오래된 것부터 out 에 복사한다.
+        out 은 array('f') (또는 float memoryview), ts_out 은 array('d'),
+        seq_out 은 array('Q'), mask_out 은 array('B').
+        out 을 생략하면 새 array('f') 를 만들어 (count, out) 을 돌려준다.
+        """
+        return self._copy_last(n, None, out, ts_out, seq_out, mask_out)
+
+    def since(self, t, out=None, ts_out=None, seq_out=None, limit=None, mask_out=None):
+        """
+        timestamp > t 인 행들을 오래된 것부터 out 에 복사한다.
+        limit 을 주면 그중 가장 최근 limit 개만 복사한다.
+        """
+        return self._copy_last(limit, t, out, ts_out, seq_out, mask_out)
+
+    def count_since(self, t, mask=None):
+        """
+        timestamp > t 인 행 수 (복사하지 않음).
+        mask 를 주면 그 채널이 바뀐 행만 센다 (해당 행 수만큼 훑는다).
+        """
+        written = self._written
+        count = self._count_after(t, written, min(written, self.capacity - 1))
+        if mask is None:
+            return count
+        masks = self._masks
+        cap = self.capacity
+        return sum(1 for i in range(written - count, written) if masks[i % cap] & mask)
+
+    def _count_after(self, t, written, avail):
+        # 타임스탬프는 단조 증가하므로 이진 탐색
+        lo, hi = written - avail, written
+        ts = self._timestamps
+        cap = self.capacity
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ts[mid % cap] <= t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return written - lo
+
+    def _copy_last(self, n, t, out, ts_out, seq_out, mask_out):
+        allocate = out is None
+        while True:
+            written = self._written
+            avail = min(written, self.capacity - 1)
+            count = avail if t is None else self._count_after(t, written, avail)
+            if n is not None:
+                count = min(n, count)
+            if allocate:
+                out = array('f', bytes(4 * self.width * count))
+            self._copy_rows(written - count, count, out, ts_out, seq_out, mask_out)
+            # 복사하는 동안 가장 오래된 행이 덮어써지지 않았는지 확인
+            if self._written - (written - count) < self.capacity:
+                break
+        if allocate:
+            return count, out
+        return count
+
+    def _copy_rows(self, start, n, out, ts_out, seq_out, mask_out=None):
+        if n == 0:
+            return
+        cap = self.capacity
+        w = self.width
+        dst = memoryview(out)
+        first = start % cap
+        # 링 끝에서 잘리는 경우 두 구간으로 나누어 복사
+        head = min(n, cap - first)
+        dst[:head * w] = self._values_mv[first * w:(first + head) * w]
+        if head < n:
+            dst[head * w:n * w] = self._values_mv[:(n - head) * w]
+        if ts_out is not None:
+            tdst = memoryview(ts_out)
+            tdst[:head] = self._timestamps_mv[first:first + head]
+            if head < n:
+                tdst[head:n] = self._timestamps_mv[:n - head]
+        if seq_out is not None:
+            qdst = memoryview(seq_out)
+            qdst[:head] = self._seqs_mv[first:first + head]
+            if head < n:
+                qdst[head:n] = self._seqs_mv[:n - head]
+        if mask_out is not None:
+            mdst = memoryview(mask_out)
+            mdst[:head] = self._masks_mv[first:first + head]
+            if head < n:
+                mdst[head:n] = self._masks_mv[:n - head]
@@ -0,0 +1,245 @@
+# sensor_schema.py
+import json
+from collections import namedtuple
+
+from utils.codec import (
+    ENCODING_FLOAT32, ENCODING_DELTA_VARINT, ENCODING_INT16,
+    FRAME_MAX_FIELDS, IMU_AXIS_SCALES, LASER_SCALES, DELTA_MAX_PACKET, ATT_MAX_VALUE,
+    DeltaVarintEncoder, encode_scale_descriptor, frame_format, frame_size, reshape,
+)
+
+# SensorFrame 에서 채널 이름으로 쓸 수 없는 필드
+_RESERVED_NAMES = ("seq", "timestamp")
+
+
+class Channel:
+    """
+    센서 채널 하나의 선언.
+
+      name        : SensorData/SensorFrame 의 필드 이름 (예: "imu")
+      shape       : 값 배열 모양 (예: (4, 9)). 원소 수가 size. float32 값이
+                    ATT 속성 하나(512 바이트)에 들어가야 하므로 최대 128 개
+      uuid        : 이 채널을 내보낼 Characteristic UUID
+      description : 2901 descriptor 에 들어갈 설명
+      dtype       : 기본 알림 인코딩. "f" = float32, "h" = scale 적용 int16
+      rate        : 최대 알림 속도(Hz). None 이면 서버 기본값
+      scales      : 고정소수점 단위. 원소 수 만큼, 또는 마지막 축 길이(나 1개)
+                    만큼 주면 반복해서 채운다. None 이면 int16/delta 모드 미지원.
+                    원소마다 다른 값은 scale descriptor 가 512 바이트를 넘지 않게
+                    63 개까지 (반복되는 축 단위는 한 주기만 보낸다)
+      offsets     : 고정소수점 offset (scales 와 같은 규칙, 기본 0)
+      deadband    : Deadband 인자 dict (absolute, relative, max_silence)
+      stream      : True 면 delta + varint 스트림 모드 지원 (scales 필요)
+    """
+
+    def __init__(self, name, shape, uuid, description, dtype="f", rate=None,
+                 scales=None, offsets=None, deadband=None, stream=False):
+        if name in _RESERVED_NAMES or not name.isidentifier():
+            raise ValueError("invalid channel name: %r" % name)
+        if dtype not in ("f", "h"):
+            raise ValueError("unsupported dtype: %r" % dtype)
+        self.name = name
+        self.shape = tuple(shape)
+        self.size = 1
+        for dim in self.shape:
+            self.size *= dim
+        self.uuid = uuid
+        self.description = description
+        self.dtype = dtype
+        self.rate = rate
+        self.scales = self._expand(scales)
+        self.offsets = self._expand(offsets) if offsets is not None else (
+            (0.0,) * self.size if self.scales is not None else None)
+        self.deadband = deadband
+        self.stream = stream
+
+        if self.scales is None and (dtype == "h" or stream):
+            raise ValueError("channel %r needs scales for int16/stream" % name)
+        # float32 값 전체가 ReadValue/알림 하나에 들어가야 한다 (잘리면 BlueZ 가 거절)
+        if self.size * 4 > ATT_MAX_VALUE:
+            raise ValueError("channel %r: %d values are %d bytes as float32, over the "
+                             "%d-byte attribute limit (max %d values, split the channel)"
+                             % (name, self.size, self.size * 4, ATT_MAX_VALUE,
+                                ATT_MAX_VALUE // 4))
+        # 스트림 패킷(packet seq + 레코드)은 최악의 경우에도 알림 하나에 들어가야 한다
+        if stream and 1 + DeltaVarintEncoder.record_size(self.size) > DELTA_MAX_PACKET:
+            raise ValueError("channel %r: %d values are too wide for stream mode (max %d)"
+                             % (name, self.size,
+                                (DELTA_MAX_PACKET - 2) // DeltaVarintEncoder.VARINT_MAX))
+
+        # int16 모드의 scale descriptor 도 속성 하나에 들어가야 한다
+        if self.scales is not None:
+            descriptor = len(encode_scale_descriptor(self.scales, self.offsets))
+            if descriptor > ATT_MAX_VALUE:
+                raise ValueError("channel %r: scale descriptor is %d bytes, over the %d-byte "
+                                 "attribute limit (use per-axis scales)"
+                                 % (name, descriptor, ATT_MAX_VALUE))
+
+        # float32 레이아웃 (history 한 행에서의 배치와 같다)
+        self.format = "<%df" % self.size
+
+        self.encodings = (ENCODING_FLOAT32,)
+        if self.scales is not None:
+            self.encodings += (ENCODING_INT16,)
+        if stream:
+            self.encodings += (ENCODING_DELTA_VARINT,)
+        self.default_encoding = ENCODING_INT16 if dtype == "h" else ENCODING_FLOAT32
+
+    def _expand(self, values):
+        if values is None:
+            return None
+        values = tuple(float(v) for v in values)
+        if len(values) == self.size:
+            return values
+        if len(values) == 1 or (self.shape and len(values) == self.shape[-1]):
+            return values * (self.size // len(values))
+        raise ValueError("channel %r: expected %d values, got %d"
+                         % (self.name, self.size, len(values)))
+
+    @classmethod
+    def from_config(cls, config):
+        config = dict(config)
+        config["shape"] = tuple(config["shape"])
+        return cls(**config)
+
+
+class SensorSchema:
+    """
+    센서 구성(채널 목록)의 선언. SensorData 버퍼, history 한 행의 열 배치,
+    통합 프레임 레이아웃, Characteristic/descriptor 가 모두 여기서 만들어진다.
+
+    채널들은 선언 순서대로 float32 한 행에 이어 붙는다. 채널이 넓어져도
+    각 채널은 연속 구간(columns[name])이므로 복사/인코딩 비용은 원소 수에
+    비례하고, 실행 중 추가 할당이 없다. 통합 프레임의 field mask 가 u8 이라
+    채널은 최대 8 개까지.
+
+    값은 ATT 속성 하나(ATT_MAX_VALUE = 512 바이트)에 들어가야 해서, 만들 때
+    채널 하나의 float32 값과 통합 프레임(헤더 + 모든 채널) 크기를 검사한다.
+    IMU 16 개 같은 넓은 구성은 채널을 나누고(예: imu_a, imu_b 각 (8, 9)),
+    통합 프레임이 넘치면 frame=False 로 Frame Characteristic 을 뺀다.
+    """
+
+    def __init__(self, channels, frame=True):
+        self.channels = tuple(channels)
+        names = [c.name for c in self.channels]
+        if len(set(names)) != len(names):
+            raise ValueError("duplicate channel names: %r" % names)
+        if not 0 < len(self.channels) <= FRAME_MAX_FIELDS:
+            raise ValueError("schema needs 1..%d channels" % FRAME_MAX_FIELDS)
+        self.names = tuple(names)
+        self._by_name = {c.name: c for c in self.channels}
+
+        self.columns = {}
+        start = 0
+        for channel in self.channels:
+            self.columns[channel.name] = slice(start, start + channel.size)
+            start += channel.size
+        self.width = start
+
+        self.frame_type = _make_frame_type(self.names)
+        self.buffers_type = namedtuple("FrameBuffers", self.names)
+        self.frame_fields = tuple(
+            (1 << i, c.name, c.format, c.shape) for i, c in enumerate(self.channels))
+        self.field_all = (1 << len(self.channels)) - 1
+        # 채널 이름 -> field mask 비트 (history 행의 바뀐 채널 mask 에도 쓴다)
+        self.bits = {name: 1 << i for i, name in enumerate(self.names)}
+        self.frame_format = frame_format(self.field_all, self.frame_fields)
+        # 통합 Frame Characteristic 을 둘지 (전체 프레임이 속성 하나에 들어갈 때만)
+        self.frame = frame
+        size = frame_size(self.field_all, self.frame_fields)
+        if frame and size > ATT_MAX_VALUE:
+            raise ValueError("combined frame is %d bytes, over the %d-byte attribute limit "
+                             "(set \"frame\": false to drop the Frame characteristic)"
+                             % (size, ATT_MAX_VALUE))
+
+    def __getitem__(self, name):
+        return self._by_name[name]
+
+    def mask_of(self, names):
+        """ 채널 이름들 -> field mask """
+        mask = 0
+        for name in names:
+            mask |= self.bits[name]
+        return mask
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def __iter__(self):
+        return iter(self.channels)
+
+    def zeros(self):
+        """ 채널 이름 -> 0.0 튜플 """
+        return {c.name: (0.0,) * c.size for c in self.channels}
+
+    def flatten(self, channel, values):
+        """ 스칼라 / 1차원 / 2차원 리스트, NumPy 배열을 float 튜플로 """
+        if hasattr(values, "ravel"):
+            flat = tuple(values.ravel().tolist())
+        elif isinstance(values, (int, float)):
+            flat = (float(values),)
+        else:
+            flat = tuple(float(v)
+                         for item in values
+                         for v in (item if hasattr(item, "__iter__") else (item,)))
+        if len(flat) != channel.size:
+            raise ValueError("channel %r: expected %d values, got %d"
+                             % (channel.name, channel.size, len(flat)))
+        return flat
+
+    def shape_values(self, name, flat):
+        """ 평탄화된 값을 채널 shape 의 중첩 리스트로 (원소 1개면 스칼라) """
+        flat = flat.tolist() if hasattr(flat, "tolist") else list(flat)
+        return reshape(flat, self._by_name[name].shape)
+
+    @classmethod
+    def from_config(cls, config):
+        """ {"channels": [{"name": ..., "shape": [...], ...}, ...], "frame": true} """
+        return cls([Channel.from_config(c) for c in config["channels"]],
+                   frame=config.get("frame", True))
+
+    @classmethod
+    def load(cls, path):
+        """ JSON 설정 파일에서 읽기 """
+        with open(path) as f:
+            return cls.from_config(json.load(f))
+
+
+def _make_frame_type(names):
+    base = namedtuple("SensorFrame", ("seq", "timestamp") + tuple(names))
+
+    class SensorFrame(base):
+        """
+        SensorData.publish() 한 번으로 만들어지는 스냅샷.
+        튜플이므로 읽는 쪽에서 값을 바꿀 수 없고, 한 프레임 안의
+        채널 값들은 항상 같은 시점의 값이다. 채널 값은 평탄화된 튜플.
+        """
+        __slots__ = ()
+
+    return SensorFrame
+
+
+# 기본 구성: IMU 4개(각 9축), Laser 4개, Weight 1개
+DEFAULT_SCHEMA = SensorSchema([
+    Channel(
+        "imu", (4, 9),
+        uuid="00000002-736c-4645-b520-7127aadf8c47",
+        description="IMU Sensor Data",
+        scales=IMU_AXIS_SCALES,
+        deadband=dict(absolute=0.0, relative=0.0, max_silence=5.0),      # 값이 같을 때만 억제
+        stream=True,
+    ),
+    Channel(
+        "laser", (4,),
+        uuid="00000003-736c-4645-b520-7127aadf8c47",
+        description="Laser Sensor Data",
+        scales=LASER_SCALES,
+        deadband=dict(absolute=0.005, relative=0.0, max_silence=5.0),    # 5 mm
+    ),
+    Channel(
+        "weight", (1,),
+        uuid="00000004-736c-4645-b520-7127aadf8c47",
+        description="Estimated Weight",
+        deadband=dict(absolute=0.05, relative=0.0, max_silence=5.0),     # 50 g
+    ),
+])
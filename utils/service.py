@@ -19,14 +19,23 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import math
+import os
+import socket
+import time
+
 import dbus
 import dbus.mainloop.glib
 import dbus.exceptions
 try:
-  from gi.repository import GObject
+  from gi.repository import GObject, GLib
 except ImportError:
     import gobject as GObject
+    import glib as GLib
 from utils.bletools import BleTools
+from utils.loop_monitor import LoopMonitor
+from utils.metrics import METRICS
+from utils.rate_clock import RateClock
 
 BLUEZ_SERVICE_NAME = "org.bluez"
 GATT_MANAGER_IFACE = "org.bluez.GattManager1"
@@ -45,6 +54,259 @@ class NotSupportedException(dbus.exceptions.DBusException):
 class NotPermittedException(dbus.exceptions.DBusException):
     _dbus_error_name = "org.bluez.Error.NotPermitted"
 
+class _ScheduledCallback(object):
+    __slots__ = ("deadline", "interval", "callback", "owner", "event", "last_run", "clock",
+                 "metric", "errors")
+
+    def __init__(self, deadline, interval, callback, owner, event, clock=None):
+        self.deadline = deadline    # 다음 실행 시각 (event 항목은 깨어나기 전까지 None)
+        self.interval = interval    # 주기, event 항목은 최소 간격 (초)
+        self.callback = callback
+        self.owner = owner
+        self.event = event
+        self.last_run = None
+        self.clock = clock          # 주기 항목의 RateClock (event 항목은 None)
+        self.metric = None          # 콜백 시간 히스토그램 (계측이 켜져 있을 때 만듦)
+        self.errors = 0             # 연속으로 예외를 낸 횟수
+
+
+class NotifyScheduler(object):
+    """
+    모든 Characteristic 의 알림을 GLib 타이머 하나로 처리하는 스케줄러.
+
+    Characteristic 마다 GObject.timeout_add 를 따로 걸면 타이머가 제각각
+    흘러가고 CPU 도 따로 깨어난다. 여기서는 등록된 항목 중 가장 이른
+    마감 시각에 한 번만 깨어나, COALESCE_MS 안에 마감이 도래하는 항목을
+    한 번에 처리한다. 콜백은 GLib 과 같이 False 를 돌려주면 해제된다.
+
+    add_event() 로 등록한 항목은 주기 대신 wake() 가 불릴 때 실행된다.
+    wake() 는 다른 스레드(센서 생산자)에서 불러도 되며, eventfd(없으면 pipe)
+    로 GLib 메인 루프를 깨운다. 여러 번 불려도 한 번으로 합쳐지고,
+    항목별 최소 간격보다 자주 실행되지 않는다.
+
+    주기 항목의 마감은 RateClock(utils/rate_clock.py)으로 관리한다.
+    절대 마감이라 GLib 타이머의 ms 반올림/지연이 누적되지 않고, 밀린 주기는
+    건너뛴다(SKIP). 항목별 jitter/overrun 통계는 get_stats() 로 본다.
+
+    콜백이 예외를 내면 그 항목만 간격을 두 배씩 늘려(최대 MAX_BACKOFF 초)
+    다시 시도하고, 다른 항목과 타이머는 그대로 돈다. 한 번 성공하면 원래
+    주기로 돌아온다.
+    """
+    COALESCE_MS = 5
+    MAX_BACKOFF = 5.0   # 초
+
+    _default = None
+
+    def __init__(self):
+        self._entries = {}   # handle -> _ScheduledCallback
+        self._next_handle = 1
+        self._timer = None
+        self._timer_deadline = None
+
+        self._wake_read_fd = None
+        self._wake_write_fd = None
+        self._wake_pending = False
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def add(self, interval_ms, callback, owner=None):
+        """ interval_ms 주기로 callback 실행 """
+        interval = interval_ms / 1000.0
+        clock = RateClock(interval, start=time.monotonic() + interval)
+        entry = _ScheduledCallback(clock.deadline, interval,
+                                   callback, owner, False, clock)
+        return self._add_entry(entry)
+
+    def add_event(self, min_interval_ms, callback, owner=None):
+        """ wake() 때마다 callback 실행 (min_interval_ms 로 속도 제한) """
+        self._open_wakeup()
+        entry = _ScheduledCallback(None, min_interval_ms / 1000.0,
+                                   callback, owner, True)
+        return self._add_entry(entry)
+
+    def _add_entry(self, entry):
+        handle = self._next_handle
+        self._next_handle += 1
+        self._entries[handle] = entry
+        self._reschedule()
+        return handle
+
+    def remove(self, handle):
+        if self._entries.pop(handle, None) is not None:
+            self._reschedule()
+
+    def set_interval(self, handle, interval_ms):
+        entry = self._entries.get(handle)
+        if entry is None:
+            return
+        interval = interval_ms / 1000.0
+        if entry.clock is not None:
+            entry.clock.set_period(interval)
+            entry.deadline = entry.clock.deadline
+        entry.interval = interval
+        self._reschedule()
+
+    def get_subscribers(self):
+        """ 현재 등록된 (owner, interval_ms, event 여부) 목록 """
+        return [(e.owner, e.interval * 1000.0, e.event) for e in self._entries.values()]
+
+    def get_stats(self):
+        """ 주기 항목별 RateClock 통계 (owner, stats) 목록 """
+        return [(e.owner, e.clock.get_stats())
+                for e in self._entries.values() if e.clock is not None]
+
+    # -----------------------
+    # 이벤트 깨우기
+    # -----------------------
+    def wake(self):
+        """ 스레드 안전. 새 데이터가 있음을 메인 루프에 알린다. """
+        if self._wake_write_fd is None or self._wake_pending:
+            return
+        self._wake_pending = True
+        try:
+            if self._wake_read_fd == self._wake_write_fd:
+                os.eventfd_write(self._wake_write_fd, 1)
+            else:
+                os.write(self._wake_write_fd, b"\x01")
+        except BlockingIOError:
+            pass
+
+    def _open_wakeup(self):
+        if self._wake_read_fd is not None:
+            return
+        if hasattr(os, "eventfd"):
+            fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            self._wake_read_fd = self._wake_write_fd = fd
+        else:
+            self._wake_read_fd, self._wake_write_fd = os.pipe()
+            os.set_blocking(self._wake_read_fd, False)
+            os.set_blocking(self._wake_write_fd, False)
+        GLib.io_add_watch(self._wake_read_fd, GLib.PRIORITY_DEFAULT,
+                          GLib.IO_IN, self._on_wakeup)
+
+    def _on_wakeup(self, fd, condition):
+        # fd 를 먼저 비우고 나서 플래그를 내린다. 순서가 반대면 그 사이에 들어온
+        # wake() 의 쓰기가 여기서 같이 읽혀 사라지고 플래그만 남아, 이후 wake()
+        # 가 전부 일찍 돌아가 다시는 깨어나지 못한다. 이 순서에서는 비운 뒤에
+        # 온 wake() 가 플래그를 보고 돌아가도 아래 _dispatch() 가 그 데이터를 본다.
+        try:
+            os.read(self._wake_read_fd, 4096)
+        except BlockingIOError:
+            pass
+        self._wake_pending = False
+
+        now = time.monotonic()
+        for entry in self._entries.values():
+            if entry.event and entry.deadline is None:
+                if entry.last_run is None:
+                    entry.deadline = now
+                else:
+                    entry.deadline = max(now, entry.last_run + entry.interval)
+        # False 를 돌려주거나 예외가 나면 GLib 이 이 watch 를 지워서 이후로는
+        # 깨어나지 못한다. 무슨 일이 있어도 True.
+        try:
+            self._dispatch()
+        except Exception as e:
+            print("Notify wakeup dispatch failed: %r" % (e,))
+        return True
+
+    # -----------------------
+    # 타이머
+    # -----------------------
+    def _reschedule(self):
+        deadlines = [e.deadline for e in self._entries.values() if e.deadline is not None]
+        if not deadlines:
+            self._cancel_timer()
+            return
+        deadline = min(deadlines)
+        if self._timer is not None and self._timer_deadline <= deadline:
+            return
+        self._cancel_timer()
+        delay_ms = max(0, int(math.ceil((deadline - time.monotonic()) * 1000)))
+        self._timer_deadline = deadline
+        self._timer = GObject.timeout_add(delay_ms, self._on_timer)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            GObject.source_remove(self._timer)
+            self._timer = None
+            self._timer_deadline = None
+
+    def _on_timer(self):
+        self._timer = None
+        self._timer_deadline = None
+        self._dispatch()
+        return False
+
+    def _dispatch(self):
+        now = time.monotonic()
+        horizon = now + self.COALESCE_MS / 1000.0
+        try:
+            for handle, entry in list(self._entries.items()):
+                if entry.deadline is None or entry.deadline > horizon:
+                    continue
+                if handle not in self._entries:
+                    continue
+                entry.last_run = now
+                try:
+                    if METRICS.enabled:
+                        keep = self._run_measured(entry, now)
+                    else:
+                        keep = entry.callback()
+                except Exception as e:
+                    self._callback_failed(entry, now, e)
+                    continue
+                entry.errors = 0
+                if not keep:
+                    self._entries.pop(handle, None)
+                    continue
+                if entry.event:
+                    entry.deadline = None
+                    continue
+                # 밀린 주기는 몰아서 보내지 않고 건너뛴다 (RateClock.SKIP)
+                entry.clock.tick(now)
+                entry.deadline = entry.clock.deadline
+        finally:
+            # 타이머는 _on_timer 에서 이미 풀렸으니 무슨 일이 있어도 다시 건다
+            self._reschedule()
+
+    def _callback_failed(self, entry, now, error):
+        entry.errors += 1
+        uuid = getattr(entry.owner, "uuid", "-")
+        METRICS.counter("ble_notify_errors_total", "notify callback exceptions",
+                        uuid=uuid).inc()
+        backoff = min(entry.interval * (1 << min(entry.errors, 16)), self.MAX_BACKOFF)
+        # 같은 에러로 로그가 넘치지 않게 1, 2, 4, 8... 번째만 출력
+        if entry.errors & (entry.errors - 1) == 0:
+            print("Notify callback for %s failed (%d in a row, retry in %.2f s): %r"
+                  % (uuid, entry.errors, backoff, error))
+        if entry.event:
+            # 다음 wake() 때 last_run + interval 이후로 잡히므로 last_run 을 미룬다
+            entry.deadline = None
+            entry.last_run = now + backoff - entry.interval
+        else:
+            entry.clock.reset(now + backoff)
+            entry.deadline = entry.clock.deadline
+
+    def _run_measured(self, entry, now):
+        # 마감 대비 늦게 실행된 정도(메인 루프 지연)와 콜백 실행 시간
+        METRICS.histogram("ble_timer_lag_seconds",
+                          "notify timer dispatch delay").observe(
+                              int((now - entry.deadline) * 1e9))
+        if entry.metric is None:
+            entry.metric = METRICS.histogram(
+                "ble_notify_callback_seconds", "notify callback run time",
+                uuid=getattr(entry.owner, "uuid", "-"))
+        start = time.monotonic_ns()
+        try:
+            return entry.callback()
+        finally:
+            entry.metric.observe(time.monotonic_ns() - start)
+
 class Application(dbus.service.Object):
     def __init__(self):
         dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
@@ -53,6 +315,11 @@ class Application(dbus.service.Object):
         self.path = "/"
         self.services = []
         self.next_index = 0
+        # GetManagedObjects 응답 캐시. bluetoothd 는 등록/재연결 때마다 트리
+        # 전체를 다시 묻는데, 트리는 서비스/Characteristic/Descriptor 가
+        # 추가될 때(또는 Acquired 속성이 바뀔 때)만 바뀐다.
+        self._managed_objects = None
+        self.loop_monitor = None   # run() 중 LoopMonitor (LoopMonitor.configure() 때)
         dbus.service.Object.__init__(self, self.bus, self.path)
 
     def get_path(self):
@@ -60,9 +327,17 @@ class Application(dbus.service.Object):
 
     def add_service(self, service):
         self.services.append(service)
+        service.application = self
+        self.invalidate_managed_objects()
+
+    def invalidate_managed_objects(self):
+        self._managed_objects = None
 
     @dbus.service.method(DBUS_OM_IFACE, out_signature = "a{oa{sa{sv}}}")
     def GetManagedObjects(self):
+        response = self._managed_objects
+        if response is not None:
+            return response
         response = {}
 
         for service in self.services:
@@ -74,6 +349,7 @@ class Application(dbus.service.Object):
                 for desc in descs:
                     response[desc.get_path()] = desc.get_properties()
 
+        self._managed_objects = response
         return response
 
     def register_app_callback(self):
@@ -94,7 +370,15 @@ class Application(dbus.service.Object):
                 error_handler=self.register_app_error_callback)
 
     def run(self):
-        self.mainloop.run()
+        if LoopMonitor.enabled and self.loop_monitor is None:
+            self.loop_monitor = LoopMonitor()
+        if self.loop_monitor is not None:
+            self.loop_monitor.start()
+        try:
+            self.mainloop.run()
+        finally:
+            if self.loop_monitor is not None:
+                self.loop_monitor.stop()
 
     def quit(self):
         print("\nGATT application terminated")
@@ -110,24 +394,38 @@ class Service(dbus.service.Object):
         self.primary = primary
         self.characteristics = []
         self.next_index = 0
+        self.application = None
+        self._properties = None
         dbus.service.Object.__init__(self, self.bus, self.path)
 
     def get_properties(self):
-        return {
-                GATT_SERVICE_IFACE: {
-                        'UUID': self.uuid,
-                        'Primary': self.primary,
-                        'Characteristics': dbus.Array(
-                                self.get_characteristic_paths(),
-                                signature='o')
-                }
-        }
+        # 한 번 만든 dict 를 재사용한다 (invalidate_properties 로 다시 만듦)
+        if self._properties is None:
+            self._properties = {
+                    GATT_SERVICE_IFACE: {
+                            'UUID': self.uuid,
+                            'Primary': self.primary,
+                            'Characteristics': dbus.Array(
+                                    self.get_characteristic_paths(),
+                                    signature='o')
+                    }
+            }
+        return self._properties
+
+    def invalidate_properties(self):
+        self._properties = None
+        self.invalidate_managed_objects()
+
+    def invalidate_managed_objects(self):
+        if self.application is not None:
+            self.application.invalidate_managed_objects()
 
     def get_path(self):
         return dbus.ObjectPath(self.path)
 
     def add_characteristic(self, characteristic):
         self.characteristics.append(characteristic)
+        self.invalidate_properties()
 
     def get_characteristic_paths(self):
         result = []
@@ -160,6 +458,15 @@ class Characteristic(dbus.service.Object):
     """
     org.bluez.GattCharacteristic1 interface implementation
     """
+    # 협상 전 기본 ATT MTU. 알림 한 번에 실을 수 있는 값은 MTU - 3 바이트.
+    DEFAULT_MTU = 23
+    ATT_NOTIFY_OVERHEAD = 3
+
+    # True 이면 NotifyAcquired/WriteAcquired 속성을 노출해서 bluetoothd 가
+    # StartNotify/WriteValue 대신 AcquireNotify/AcquireWrite 로 소켓을 받아 가게 한다.
+    ACQUIRE_NOTIFY = False
+    ACQUIRE_WRITE = False
+
     def __init__(self, uuid, flags, service):
         index = service.get_next_index()
         self.path = service.path + '/char' + str(index)
@@ -169,25 +476,55 @@ class Characteristic(dbus.service.Object):
         self.flags = flags
         self.descriptors = []
         self.next_index = 0
+        self.mtu = None
+        self.notify_sock = None
+        self.write_sock = None
+        # 소켓 fd 에 건 GLib io watch. 소켓을 닫을 때 같이 지워야 재사용된
+        # fd 번호의 다음 소켓에 엉뚱하게 불리지 않는다.
+        self._notify_watch = None
+        self._write_watch = None
+        self._properties = None
+        self._metric_sent = METRICS.counter(
+            "ble_notifications_total", "notifications sent", uuid=uuid)
+        self._metric_dropped = METRICS.counter(
+            "ble_notifications_dropped_total", "notifications dropped (socket full or closed)",
+            uuid=uuid)
+        self._metric_suppressed = METRICS.counter(
+            "ble_notifications_suppressed_total", "samples not notified (deadband)", uuid=uuid)
+        self._metric_emit = METRICS.histogram(
+            "ble_notify_emit_seconds", "send_notification run time", uuid=uuid)
         dbus.service.Object.__init__(self, self.bus, self.path)
 
     def get_properties(self):
-        return {
-                GATT_CHRC_IFACE: {
-                        'Service': self.service.get_path(),
-                        'UUID': self.uuid,
-                        'Flags': self.flags,
-                        'Descriptors': dbus.Array(
-                                self.get_descriptor_paths(),
-                                signature='o')
-                }
+        if self._properties is not None:
+            return self._properties
+        properties = {
+                'Service': self.service.get_path(),
+                'UUID': self.uuid,
+                'Flags': self.flags,
+                'Descriptors': dbus.Array(
+                        self.get_descriptor_paths(),
+                        signature='o')
         }
+        if self.ACQUIRE_NOTIFY:
+            properties['NotifyAcquired'] = dbus.Boolean(self.notify_sock is not None)
+        if self.ACQUIRE_WRITE:
+            properties['WriteAcquired'] = dbus.Boolean(self.write_sock is not None)
+
+        self._properties = {GATT_CHRC_IFACE: properties}
+        return self._properties
+
+    def invalidate_properties(self):
+        """ 속성(Descriptors, NotifyAcquired, WriteAcquired 등)이 바뀌었을 때 """
+        self._properties = None
+        self.service.invalidate_managed_objects()
 
     def get_path(self):
         return dbus.ObjectPath(self.path)
 
     def add_descriptor(self, descriptor):
         self.descriptors.append(descriptor)
+        self.invalidate_properties()
 
     def get_descriptor_paths(self):
         result = []
@@ -229,11 +566,169 @@ class Characteristic(dbus.service.Object):
         print('Default StopNotify called, returning error')
         raise NotSupportedException()
 
+    @dbus.service.method(GATT_CHRC_IFACE,
+                         in_signature='a{sv}',
+                         out_signature='hq')
+    def AcquireNotify(self, options):
+        """
+        알림용 SOCK_SEQPACKET 소켓 한쪽을 bluetoothd 에 넘겨준다.
+        이후 send_notification() 은 D-Bus 시그널 대신 이 소켓에 바로 쓴다.
+        bluetoothd 가 소켓을 닫으면(구독 해제) on_notify_released() 가 불린다.
+        """
+        if not self.ACQUIRE_NOTIFY:
+            raise NotSupportedException()
+        if self.notify_sock is not None:
+            raise NotPermittedException()
+
+        self.update_mtu(options)
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        ours.setblocking(False)
+        self.notify_sock = ours
+        self.invalidate_properties()
+        self._notify_watch = GLib.io_add_watch(
+            ours.fileno(), GLib.PRIORITY_DEFAULT,
+            GLib.IO_HUP | GLib.IO_ERR, self._notify_sock_closed)
+        # UnixFd 가 fd 를 dup 하므로 우리 쪽 사본은 바로 닫는다
+        fd = dbus.types.UnixFd(theirs.fileno())
+        theirs.close()
+
+        self.on_notify_acquired()
+        return (fd, dbus.UInt16(self.get_mtu()))
+
+    @dbus.service.method(GATT_CHRC_IFACE,
+                         in_signature='a{sv}',
+                         out_signature='hq')
+    def AcquireWrite(self, options):
+        """
+        쓰기용 소켓을 bluetoothd 에 넘겨준다. 소켓으로 들어온 값은
+        WriteValue(value, {}) 로 그대로 전달된다.
+        """
+        if not self.ACQUIRE_WRITE:
+            raise NotSupportedException()
+        if self.write_sock is not None:
+            raise NotPermittedException()
+
+        self.update_mtu(options)
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        ours.setblocking(False)
+        self.write_sock = ours
+        self.invalidate_properties()
+        self._write_watch = GLib.io_add_watch(
+            ours.fileno(), GLib.PRIORITY_DEFAULT,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self._write_sock_ready)
+        fd = dbus.types.UnixFd(theirs.fileno())
+        theirs.close()
+
+        return (fd, dbus.UInt16(self.get_mtu()))
+
     @dbus.service.signal(DBUS_PROP_IFACE,
                          signature='sa{sv}as')
     def PropertiesChanged(self, interface, changed, invalidated):
         pass
 
+    def send_notification(self, value):
+        """
+        값을 알림으로 보낸다. AcquireNotify 소켓이 있으면 소켓에 바로 쓰고,
+        없으면 기존처럼 PropertiesChanged 시그널을 보낸다.
+        소켓 버퍼가 가득 차 있으면 이번 값은 버리고 False 를 돌려준다.
+        """
+        if not METRICS.enabled:
+            return self._send_notification(value)
+        start = time.monotonic_ns()
+        sent = self._send_notification(value)
+        self._metric_emit.observe(time.monotonic_ns() - start)
+        if sent:
+            self._metric_sent.inc()
+        else:
+            self._metric_dropped.inc()
+        return sent
+
+    def note_suppressed(self):
+        """ deadband 등으로 이번 샘플을 알리지 않았음 (계측용) """
+        if METRICS.enabled:
+            self._metric_suppressed.inc()
+
+    def _message_cb(self, connection, message):
+        # 계측이 켜져 있으면 D-Bus 메서드(ReadValue, WriteValue, StartNotify,
+        # GetAll 등) 처리 시간을 메서드별로 기록한다
+        if not METRICS.enabled:
+            return dbus.service.Object._message_cb(self, connection, message)
+        start = time.monotonic_ns()
+        try:
+            return dbus.service.Object._message_cb(self, connection, message)
+        finally:
+            METRICS.histogram("ble_method_seconds", "D-Bus method handling time",
+                              uuid=self.uuid, method=message.get_member()).observe(
+                                  time.monotonic_ns() - start)
+
+    def _send_notification(self, value):
+        if self.notify_sock is not None:
+            try:
+                self.notify_sock.send(value)
+                return True
+            except BlockingIOError:
+                return False
+            except OSError:
+                self.release_notify()
+                return False
+
+        self.PropertiesChanged(GATT_CHRC_IFACE, {"Value": value}, [])
+        return True
+
+    def on_notify_acquired(self):
+        """ AcquireNotify 로 구독이 시작됨. 기본은 StartNotify 와 같다. """
+        self.StartNotify()
+
+    def on_notify_released(self):
+        """ AcquireNotify 소켓이 닫힘. 기본은 StopNotify 와 같다. """
+        self.StopNotify()
+
+    def release_notify(self):
+        if self._notify_watch is not None:
+            GLib.source_remove(self._notify_watch)
+            self._notify_watch = None
+        if self.notify_sock is None:
+            return
+        self.notify_sock.close()
+        self.notify_sock = None
+        self.invalidate_properties()
+        self.on_notify_released()
+
+    def release_write(self):
+        if self._write_watch is not None:
+            GLib.source_remove(self._write_watch)
+            self._write_watch = None
+        if self.write_sock is None:
+            return
+        self.write_sock.close()
+        self.write_sock = None
+        self.invalidate_properties()
+
+    def _notify_sock_closed(self, fd, condition):
+        # False 를 돌려주면 GLib 이 이 watch 를 지운다
+        self._notify_watch = None
+        self.release_notify()
+        return False
+
+    def _write_sock_ready(self, fd, condition):
+        if self.write_sock is None:
+            self._write_watch = None
+            return False
+        if condition & GLib.IO_IN:
+            try:
+                data = self.write_sock.recv(self.get_mtu())
+            except BlockingIOError:
+                return True
+            except OSError:
+                data = b""
+            if data:
+                self.WriteValue([dbus.Byte(b) for b in data], {})
+                return True
+        # HUP/ERR 또는 빈 읽기: bluetoothd 가 소켓을 닫음
+        self._write_watch = None
+        self.release_write()
+        return False
+
     def get_bus(self):
         bus = self.bus
 
@@ -246,7 +741,30 @@ class Characteristic(dbus.service.Object):
         return idx
 
     def add_timeout(self, timeout, callback):
-        GObject.timeout_add(timeout, callback)
+        """
+        timeout(ms) 주기로 callback 을 부른다. 공용 NotifyScheduler 에
+        등록되며, 해제용 handle 을 돌려준다 (remove_timeout).
+        """
+        return NotifyScheduler.default().add(timeout, callback, self)
+
+    def remove_timeout(self, handle):
+        NotifyScheduler.default().remove(handle)
+
+    def update_mtu(self, options):
+        """
+        bluetoothd 가 ReadValue/WriteValue/AcquireNotify 의 options 로
+        넘겨주는 협상된 ATT MTU 를 기록한다.
+        """
+        mtu = options.get("mtu")
+        if mtu:
+            self.mtu = int(mtu)
+
+    def get_mtu(self):
+        return self.mtu or self.DEFAULT_MTU
+
+    def get_max_notify_size(self):
+        """ 알림 하나에 실을 수 있는 최대 바이트 수 """
+        return self.get_mtu() - self.ATT_NOTIFY_OVERHEAD
 
 
 class Descriptor(dbus.service.Object):
@@ -257,16 +775,23 @@ class Descriptor(dbus.service.Object):
         self.flags = flags
         self.chrc = characteristic
         self.bus = characteristic.get_bus()
+        self._properties = None
         dbus.service.Object.__init__(self, self.bus, self.path)
 
     def get_properties(self):
-        return {
-                GATT_DESC_IFACE: {
-                        'Characteristic': self.chrc.get_path(),
-                        'UUID': self.uuid,
-                        'Flags': self.flags,
-                }
-        }
+        if self._properties is None:
+            self._properties = {
+                    GATT_DESC_IFACE: {
+                            'Characteristic': self.chrc.get_path(),
+                            'UUID': self.uuid,
+                            'Flags': self.flags,
+                    }
+            }
+        return self._properties
+
+    def invalidate_properties(self):
+        self._properties = None
+        self.chrc.service.invalidate_managed_objects()
 
     def get_path(self):
         return dbus.ObjectPath(self.path)
@@ -0,0 +1,287 @@
+# shared_ring.py
+import multiprocessing
+import os
+import select
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from utils.sensor_data import SensorData
+from utils.sensor_history import FrameHistory
+
+
+class SharedFrameHistory(FrameHistory):
+    """
+    multiprocessing.shared_memory 위에 놓인 FrameHistory.
+    읽기 API(window/since/count_since/latest)는 FrameHistory 와 같고, 저장
+    공간과 기록 카운터(_written)만 공유 메모리에 있다.
+
+    공유 메모리 레이아웃 (little-endian, 모두 8 바이트 정렬)
+      헤더 64 bytes : magic "SNSR", version(u32), width(u32), capacity(u32),
+                      written(u64, offset 16) - 지금까지 기록된 프레임 수
+      timestamps    : capacity x f64
+      seqs          : capacity x u64
+      masks         : capacity x u8 (바뀐 채널), 8 바이트 배수로 패딩
+      values        : capacity x width x f32
+
+    FrameHistory 의 락 없는 seqlock 읽기는 "행을 다 쓴 뒤 written 을 올린다"
+    는 쓰기 순서가 다른 쪽에서도 그 순서로 보인다는 가정에 기대는데, 다른
+    프로세스(다른 코어)에서는 그렇지 않다. 파이썬에서는 공유 메모리 쓰기
+    사이에 메모리 배리어를 넣을 수 없고, 라즈베리파이의 ARM 은 약한 메모리
+    모델이라 읽는 쪽이 새 written 을 행 데이터보다 먼저 보고 찢어진 행을
+    받아들일 수 있다. 그래서 여기서는 읽기도 프로세스 간 락(lock) 안에서
+    한다. 락(POSIX 세마포어)을 잡고 놓는 것이 배리어 역할을 하므로, 락 안에서
+    본 written 까지의 행은 다 쓰여 있다. 락 안에서는 memcpy 만 하므로
+    쓰는 쪽이 기다리는 시간은 짧다.
+
+    append()/append_buffer() 는 부르는 쪽이 lock 을 잡고 있어야 한다
+    (SharedSensorData.publish). lock 은 fork 로 물려받으므로 이름으로 붙는
+    쪽(create=False)도 같은 락을 넘겨야 한다.
+    """
+    MAGIC = b"SNSR"
+    VERSION = 2
+    HEADER = struct.Struct("<4sIII")
+    HEADER_SIZE = 64
+    WRITTEN_OFFSET = 16
+
+    def __init__(self, width=None, capacity=1024, name=None, create=True, lock=None):
+        if create:
+            if capacity < 2:
+                raise ValueError("capacity must be >= 2")
+            size = self.HEADER_SIZE + capacity * (16 + 4 * width) + _mask_size(capacity)
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.HEADER.pack_into(self._shm.buf, 0, self.MAGIC, self.VERSION, width, capacity)
+        else:
+            self._shm = _attach(name)
+            magic, version, width, capacity = self.HEADER.unpack_from(self._shm.buf, 0)
+            if magic != self.MAGIC or version != self.VERSION:
+                self._shm.close()
+                raise ValueError("not a sensor ring: %r" % name)
+        self.name = self._shm.name
+        self.owner = create
+        self.lock = lock if lock is not None else multiprocessing.get_context("fork").Lock()
+        self.width = width
+        self.capacity = capacity
+
+        buf = self._shm.buf
+        ts_start = self.HEADER_SIZE
+        seq_start = ts_start + 8 * capacity
+        mask_start = seq_start + 8 * capacity
+        values_start = mask_start + _mask_size(capacity)
+        values_end = values_start + 4 * width * capacity
+
+        self._counter = buf[self.WRITTEN_OFFSET:self.WRITTEN_OFFSET + 8].cast('Q')
+        self._timestamps = self._timestamps_mv = buf[ts_start:seq_start].cast('d')
+        self._seqs = self._seqs_mv = buf[seq_start:mask_start].cast('Q')
+        self._masks = self._masks_mv = buf[mask_start:mask_start + capacity]
+        self._values_bytes = buf[values_start:values_end]
+        self._values = self._values_mv = self._values_bytes.cast('f')
+        self._row = struct.Struct(f"{width}f")
+
+    @property
+    def _written(self):
+        return self._counter[0]
+
+    @_written.setter
+    def _written(self, value):
+        self._counter[0] = value
+
+    def __len__(self):
+        with self.lock:
+            return min(self._written, self.capacity - 1)
+
+    def latest(self):
+        with self.lock:
+            return super().latest()
+
+    def count_since(self, t, mask=None):
+        with self.lock:
+            return super().count_since(t, mask)
+
+    def _copy_last(self, n, t, out, ts_out, seq_out, mask_out):
+        # 락 안이라 복사 중에 덮어써지지 않는다 (재시도 검사는 그대로 통과)
+        with self.lock:
+            return super()._copy_last(n, t, out, ts_out, seq_out, mask_out)
+
+    def close(self):
+        """ 매핑 해제. 만든 쪽이면 공유 메모리도 지운다. """
+        if self._shm is None:
+            return
+        for view in (self._counter, self._timestamps, self._seqs, self._masks,
+                     self._values_mv, self._values_bytes):
+            view.release()
+        try:
+            self._shm.close()
+        except BufferError:
+            # 아직 살아 있는 스냅샷이 행을 가리키고 있다 (GC 때 해제됨)
+            pass
+        if self.owner:
+            self._shm.unlink()
+        self._shm = None
+
+
+def _mask_size(capacity):
+    return (capacity + 7) & ~7
+
+
+def _attach(name):
+    try:
+        # Python 3.13+: 붙기만 하는 쪽은 resource tracker 에 등록하지 않는다
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedSensorData(SensorData):
+    """
+    공유 메모리 링(SharedFrameHistory)을 저장소로 쓰는 SensorData.
+
+    센서 드라이버를 별도 프로세스에서 돌리는 모드용이다
+    (utils/acquisition.py 의 ProcessAcquisitionManager). 생산자 프로세스와
+    BLE(GLib/D-Bus) 프로세스가 GIL 을 나눠 쓰지 않으므로 수집이 여러
+    코어로 퍼지고 메인 루프의 응답성이 유지된다.
+
+    - 쓰기: publish() 는 프로세스 간 락 안에서 링의 최신 행을 읽어 바뀐
+      채널만 덮어쓴 새 행을 추가한다. 락과 알림 fd 는 fork 로 물려받으므로
+      생산자 프로세스는 fork 로 만들어야 한다.
+    - 읽기: get_snapshot() 은 링의 최신 행을 가리키는 memoryview 로 프레임을
+      만든다 (복사 없음). 그 행은 capacity 번 뒤에 재사용되므로 NumPy
+      백엔드처럼 인코딩 후 snapshot_valid() 로 확인한다.
+      프레임 seq 는 링의 논리 인덱스 + 1 이다. written 카운터와 행 메타데이터는
+      쓰기와 같은 락 안에서 읽는다 (SharedFrameHistory 의 순서 가정 참고).
+    - 알림: 쓸 때마다 eventfd(없으면 pipe)에 신호를 보내고, 읽는 프로세스의
+      알림 스레드가 이를 모아 publish hook 을 최신 스냅샷으로 부른다.
+      (hook 은 항상 읽는 프로세스에서 불린다)
+
+    close() 는 만든 프로세스에서 한 번 부른다.
+    """
+
+    def __init__(self, history_size=1024, schema=None, name=None):
+        self._ring_name = name
+        super().__init__(history_size, schema)
+        # 쓰기 직렬화와 읽기의 메모리 순서를 같은 프로세스 간 락으로
+        self._write_lock = self.history.lock
+        self._columns = tuple(self.schema.columns[n] for n in self.schema.names)
+        self._latest = (0, self._snapshot)   # (written, frame) 읽는 쪽 캐시
+
+        if hasattr(os, "eventfd"):
+            fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            self._notify_read_fd = self._notify_write_fd = fd
+        else:
+            self._notify_read_fd, self._notify_write_fd = os.pipe()
+            os.set_blocking(self._notify_read_fd, False)
+            os.set_blocking(self._notify_write_fd, False)
+        self._notify_thread = None
+        self._closed = False
+
+    def _create_history(self, history_size):
+        return SharedFrameHistory(self.schema.width, history_size, self._ring_name)
+
+    # -----------------------
+    # 쓰기 (생산자 프로세스)
+    # -----------------------
+    def publish(self, timestamp=None, **channels):
+        values = self._flatten_channels(channels)
+        if timestamp is None:
+            timestamp = time.monotonic()
+        history = self.history
+        columns = self.schema.columns
+        width = history.width
+
+        with self._write_lock:
+            written = history._written
+            if written:
+                slot = (written - 1) % history.capacity
+                row = list(history._values_mv[slot * width:(slot + 1) * width])
+                timestamp = max(timestamp, history._timestamps[slot])
+            else:
+                row = [0.0] * width
+            for name, value in values.items():
+                row[columns[name]] = value
+            history.append(row, timestamp, written + 1, self.schema.mask_of(values))
+
+        self._signal()
+        return self._frame_type(written + 1, timestamp,
+                                *[tuple(row[c]) for c in self._columns])
+
+    def _signal(self):
+        try:
+            if self._notify_read_fd == self._notify_write_fd:
+                os.eventfd_write(self._notify_write_fd, 1)
+            else:
+                os.write(self._notify_write_fd, b"\x01")
+        except BlockingIOError:
+            pass
+
+    # -----------------------
+    # 읽기 (BLE 프로세스)
+    # -----------------------
+    def get_snapshot(self):
+        history = self.history
+        with self._write_lock:
+            written = history._written
+            latest = self._latest
+            if written == latest[0]:
+                return latest[1]
+            slot = (written - 1) % history.capacity
+            seq = history._seqs[slot]
+            timestamp = history._timestamps[slot]
+        width = history.width
+        row = history._values_mv[slot * width:(slot + 1) * width]
+        frame = self._frame_type(seq, timestamp, *[row[c] for c in self._columns])
+        self._latest = (written, frame)
+        return frame
+
+    def snapshot_valid(self, snapshot):
+        if snapshot.seq == 0:
+            return True
+        with self._write_lock:
+            written = self.history._written
+        return written - snapshot.seq < self.history.capacity - 1
+
+    def get_generation(self):
+        # u64 읽기는 32 비트 ARM 에서 원자적이지 않다
+        with self._write_lock:
+            return self.history._written
+
+    def add_publish_hook(self, hook):
+        super().add_publish_hook(hook)
+        if self._notify_thread is None:
+            self._notify_thread = threading.Thread(
+                target=self._notify_loop, name="SharedSensorData-notify")
+            self._notify_thread.daemon = True
+            self._notify_thread.start()
+
+    def _notify_loop(self):
+        fd = self._notify_read_fd
+        while not self._closed:
+            select.select([fd], [], [])
+            try:
+                os.read(fd, 4096)
+            except BlockingIOError:
+                continue
+            except OSError:
+                break
+            if self._closed:
+                break
+            frame = self.get_snapshot()
+            for hook in self._publish_hooks:
+                # hook 하나의 예외로 알림 스레드가 끝나지 않게
+                try:
+                    hook(frame)
+                except Exception as e:
+                    print("Publish hook %r failed: %r" % (hook, e))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._signal()
+        if self._notify_thread is not None:
+            self._notify_thread.join(1.0)
+        self._latest = (0, None)
+        self.history.close()
+        os.close(self._notify_read_fd)
+        if self._notify_write_fd != self._notify_read_fd:
+            os.close(self._notify_write_fd)